@@ -0,0 +1,78 @@
+import os
+import django
+import sys
+import time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from django.core.files import File
+from django.db import transaction
+from dining.models import Image, Restaurant
+from dining.bulk import bulkUpdateById
+from dining.storage import contentAddressedStorage, contentHash
+from dining.thumbnails import variantNames
+from dining import listcache
+
+# 한 번에 옮길 이미지 수
+chunkSize = 500
+# 옮긴 뒤 기존 날짜 폴더의 파일을 삭제할지 여부
+deleteOld = "--delete-old" in sys.argv
+
+# 날짜 폴더(dining/%Y/%m/%d)에 저장된 기존 이미지를 hash 이름으로 옮기고 Image.image와 대표이미지 URL을 바꿉니다.
+# 같은 내용의 파일은 하나만 남으며, 이미 hash 이름인 이미지는 건너뛰므로 여러 번 실행해도 됩니다.
+# 옮긴 뒤에는 새 이름의 크기/형식 별 파일(thumbnail 등)이 없으므로 batchThumbnailSetting.py를 다시 실행합니다.
+# (실행하기 전까지는 처음 요청될 때 serveMedia에서 만듭니다.)
+# 삭제된 Image의 hash 이름 파일은 자동으로 지워지지 않으므로 batchContentAddressSweep.py로 정리합니다.
+start = time.time()
+lastId, moved, missing, files = 0, 0, 0, set()
+while True:
+    rows = list(Image.objects.filter(id__gt=lastId).order_by("id").values_list("id", "restaurant_id", "review_id", "image")[:chunkSize])
+    if not rows:
+        break
+    lastId = rows[-1][0]
+
+    names, renamed = {}, {}
+    for imageId, restaurantId, reviewId, name in rows:
+        if contentHash(name):
+            continue
+        if name not in names:
+            if not contentAddressedStorage.exists(name):
+                missing += 1
+                continue
+            with contentAddressedStorage.open(name) as f:
+                newName = contentAddressedStorage.save(name, File(f))
+            names[name] = newName
+        renamed[imageId] = names[name]
+    if not renamed:
+        continue
+
+    # 대표이미지 URL은 "<base url>/media/<파일 이름>" 형태이므로 뒷부분만 바꿉니다.
+    oldUrls = {contentAddressedStorage.url(old): contentAddressedStorage.url(new) for old, new in names.items()}
+    representativeImages = {}
+    restaurantIds = {row[1] for row in rows if row[0] in renamed}
+    for restaurantId, url in Restaurant.objects.filter(id__in=restaurantIds).exclude(representativeImage="") \
+            .values_list("id", "representativeImage"):
+        for oldUrl, newUrl in oldUrls.items():
+            if url.endswith(oldUrl):
+                representativeImages[restaurantId] = url[:-len(oldUrl)] + newUrl
+                break
+
+    with transaction.atomic():
+        bulkUpdateById(Image, "image", renamed)
+        bulkUpdateById(Restaurant, "representativeImage", representativeImages)
+    listcache.bumpImages([row[:3] for row in rows if row[0] in renamed])
+    listcache.bumpRestaurantIds(representativeImages)
+
+    if deleteOld:
+        # 기존 이름으로 만들어 둔 크기/형식 별 파일도 함께 지웁니다.
+        for old in names:
+            for name in [old] + list(variantNames(old).values()):
+                contentAddressedStorage.delete(name)
+
+    moved += len(renamed)
+    files.update(names.values())
+    print("moved %d images (%d files), %d missing files" % (moved, len(files), missing))
+
+print("done in %.1f sec" % (time.time() - start))
+if moved:
+    print("run batchThumbnailSetting.py to create thumbnail variants for the moved images")
@@ -0,0 +1,31 @@
+import os
+import django
+import sys
+import time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from dining.models import Image
+from dining.storage import contentAddressedStorage, contentHash
+
+# 수정된 지 이 시간(초)이 지나지 않은 파일은 지우지 않습니다. (저장 중인 업로드의 파일 보호)
+minAge = 24 * 60 * 60
+# 지울 파일 목록만 출력하고 지우지 않을지 여부
+dryRun = "--dry-run" in sys.argv
+
+# hash 이름의 파일은 여러 Image가 공유하므로 Image를 삭제해도 파일을 지우지 않습니다.
+# 어떤 Image도 참조하지 않는 hash 이름 파일과 그 크기/형식 별 파일을 찾아 삭제합니다.
+start = time.time()
+digests = {contentHash(name) for name in Image.objects.values_list("image", flat=True).iterator()}
+digests.discard(None)
+
+deleted = 0
+for name in contentAddressedStorage.unreferencedNames(digests, minAge):
+    if dryRun:
+        print(name)
+    else:
+        contentAddressedStorage.delete(name)
+    deleted += 1
+
+print("%s %d unreferenced files (%d referenced hashes) in %.1f sec"
+      % ("found" if dryRun else "deleted", deleted, len(digests), time.time() - start))
@@ -1,4 +1,5 @@
 import os
+import argparse
 import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings') # FIXME: check path
 django.setup()
@@ -24,51 +25,66 @@ from django.urls import reverse
 
 from PIL import Image as PIL_Image
 import keras
-import cv2
 from keras.models import load_model
-import numpy as np
+from dining.classifier import BatchClassifier, Checkpoint, pendingImages, runIncremental, runReclassify, modelVersion
+from dining.tensorcache import TensorCache
 
 # 파라미터
 textSize = 20
+# predict에 한 번에 입력할 이미지 수
+batchSize = 64
+# 이미지를 읽고 resize 하는 thread 수
+readerNum = 4
 
-# 학습된 모델을 불러 옵니다.
-model = load_model('/home/bluemen/djangoserver/resources/MobileNet2Weights.h5')
-baseUrl = "http://bluemen.pythonanywhere.com"
+# 실행 옵션
+parser = argparse.ArgumentParser(description="미분류 이미지를 분류합니다.")
+parser.add_argument("--incremental", action="store_true",
+                    help="checkpoint 이후에 등록된 이미지만 id 순 chunk 단위로 분류하고 진행 상태를 저장합니다.")
+parser.add_argument("--checkpoint", default="/home/bluemen/djangoserver/resources/imageClassifierCheckpoint.json",
+                    help="incremental 분류의 checkpoint 파일 경로")
+parser.add_argument("--chunk-size", type=int, default=1000, help="checkpoint를 저장할 chunk 크기")
+parser.add_argument("--retry-failed", action="store_true", help="이전에 읽지 못한 이미지를 다시 분류합니다.")
+parser.add_argument("--tensor-cache", default="/home/bluemen/djangoserver/resources/tensorCache",
+                    help="--reclassify에서 resize 한 이미지를 저장해 두는 폴더, 다음 재분류부터는 JPEG을 다시 읽지 않습니다.")
+parser.add_argument("--no-tensor-cache", action="store_true", help="--reclassify에서 tensor cache를 사용하지 않습니다.")
+parser.add_argument("--reclassify", action="store_true",
+                    help="새로 학습한 모델로 전체 이미지를 다시 분류하여 category가 바뀐 이미지만 저장하고, 대표이미지를 다시 계산합니다.")
+parser.add_argument("--reclassify-checkpoint", default="/home/bluemen/djangoserver/resources/imageReclassify-%s.json",
+                    help="재분류 checkpoint 파일 경로, %%s는 모델 version으로 바뀝니다.")
+args = parser.parse_args()
 
-# 미분류된 이미지만 불러옵니다.
-images = Image.objects.filter(category=-1).select_related("restaurant")
+# 학습된 모델을 불러 옵니다. 분류 결과에는 모델 파일의 hash로 만든 version을 함께 저장합니다.
+modelPath = '/home/bluemen/djangoserver/resources/MobileNet2Weights.h5'
+model = load_model(modelPath)
+version = modelVersion(modelPath)
+baseUrl = "http://bluemen.pythonanywhere.com"
 
-# 미분류된 이미지를 순회하면서 이미지 분류 처리를 합니다.
+# 미분류된 이미지를 batch 단위로 분류 처리를 합니다.
 # 만약 식당의 대표이미지가 없다면 첫 등록된 음식 이미지를 식당 대표이미지로 지정합니다.
-for image in images:
-    # 저장된 이미의 경로를 가져옵니다.
-    fname = '/home/bluemen/djangoserver/media/' + image.image.name
-    # opencv로 이미지를 읽어 옵니다.
-    img = cv2.imread(fname)
-    # 만약 img가 불러오지 못한다면 무시합니다.
-    if img is None:
-        continue
-    # 학습할 때 적용된 normalize 처리와 BGR을 RGB 타입으로 바꾸어 줍니다.
-    img = img[:,:,::-1]/255.
-    # 학습된 사이즈에 맞게 이미지를 resize 해줍니다.
-    resizedImg = cv2.resize(img, (224, 224))
-    # 학습된 shape에 맞게 reshape을 해줍니다.
-    target = np.reshape(resizedImg, (1, 224, 224, 3))
-    # 학습된 모델에 입력하여 분류를 합니다.
-    resultVector = model.predict(target)
-    # 결과 벡터에서 가장 큰값의 index를 받아 옵니다.
-    resultIndex = np.argmax(resultVector)
-    # index를 category에 저장합니다.
-    image.category = resultIndex
-    # 작업한 내용을 db에 저장합니다.
-    image.save()
+# 이미지를 불러오지 못한 경우는 무시합니다.
+# tensor cache는 같은 이미지를 모델마다 다시 읽는 재분류에서만 사용합니다.
+# 새 이미지 분류(기본/incremental)는 이미지를 한 번만 읽으므로 cache에 저장해도 다시 사용하지 않습니다.
+tensorCache = TensorCache(args.tensor_cache) if args.reclassify and not args.no_tensor_cache else None
+classifier = BatchClassifier(model, baseUrl, batchSize=batchSize, workers=readerNum, tensorCache=tensorCache,
+                             version=version, reclassify=args.reclassify)
+if args.reclassify:
+    # 전체 이미지를 다시 분류합니다. 모델 version 별 checkpoint로 중단된 지점부터 이어서 분류합니다.
+    checkpoint = Checkpoint(args.reclassify_checkpoint.replace("%s", version))
+    runReclassify(classifier, checkpoint, chunkSize=args.chunk_size)
+    print("model %s : %d images changed, %d failed images" % (version, classifier.changed, len(checkpoint.failed)))
+elif args.incremental:
+    # 마지막 checkpoint 이후의 이미지만 분류하며, 읽지 못한 이미지는 checkpoint에 기록해 두고 다시 시도하지 않습니다.
+    checkpoint = Checkpoint(args.checkpoint)
+    runIncremental(classifier, checkpoint, chunkSize=args.chunk_size, retryFailed=args.retry_failed)
+    print("checkpoint : high-water mark %d, %d failed images" % (checkpoint.highWaterMark, len(checkpoint.failed)))
+else:
+    classifier.run(pendingImages())
 
-    # 분류한 이미지가 음식(0)이고 식당의 대표이미지가 없다면 대표이미지로 설정합니다.
-    restaurantInstance = image.restaurant
-    if resultIndex==0 and restaurantInstance.representativeImage == "":
-        restaurantInstance.representativeImage = baseUrl + image.image.url
-        # 작업한 내용을 db에 저장합니다.
-        restaurantInstance.save()        
+print("done : %d images classified, %d failed in %.1f sec (%.1f images/sec)"
+      % (classifier.classified, len(classifier.failed), classifier.elapsed,
+         classifier.classified / max(classifier.elapsed, 1e-9)))
+if tensorCache is not None:
+    print("tensor cache : %d hits, %d misses, %d images stored" % (tensorCache.hits, tensorCache.misses, len(tensorCache)))
 
 
 # # 미분류된 이미지를 분류합니다.
@@ -23,14 +23,15 @@ from django.db import transaction
 from django.db.models import Avg, Case, Count, F, Max, Min, Prefetch, Q, Sum, When, Exists, OuterRef, Subquery
 from django.utils import timezone
 from django.urls import reverse
-# RestaurantViewSet Import
-from dining.views import RestaurantViewSet
+from dining.recount import recountLikeReviewNum, formatDriftReport
 
-# RestaurantViewSet 객체 생성
-rv = RestaurantViewSet()
-# like, review 테이블을 prefetch_related로 모든 객체 불러옵니다.
-qs = Restaurant.objects.all().prefetch_related("like_set", "review_set")
+# 한 번에 확인할 식당 수
+chunkSize = 1000
 
-# likeNum과 reviewNum 갱신합니다.
-for q in qs:    
-    rv.saveLikeReviewNum(q)
\ No newline at end of file
+# 식당을 chunk 단위로 읽고, like/review 갯수를 GROUP BY 쿼리로 구하여 값이 다른 식당의 likeNum과 reviewNum만 갱신합니다.
+start = time.time()
+report = recountLikeReviewNum(chunkSize=chunkSize)
+
+# drift report를 출력합니다.
+print(formatDriftReport(report))
+print("done in %.1f sec" % (time.time() - start))
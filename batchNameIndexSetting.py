@@ -0,0 +1,17 @@
+import os
+import django
+import sys
+import time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from dining.namesearch import rebuildIndex
+
+# 한 번에 다시 만들 식당 수
+chunkSize = 1000
+
+# 식당 이름 검색용 n-gram 테이블을 식당 테이블 기준으로 다시 만듭니다.
+# (식당 이름이 signal을 거치지 않고 QuerySet.update 등으로 바뀐 경우 사용합니다.)
+start = time.time()
+indexed = rebuildIndex(chunkSize=chunkSize)
+print("indexed %d restaurants in %.1f sec" % (indexed, time.time() - start))
@@ -0,0 +1,17 @@
+import os
+import django
+import sys
+import time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from dining.nearby import rebuildNearbyStations, NEARBY_STATION_NUM
+
+# 한 번에 계산할 식당 수
+chunkSize = 1000
+
+# 식당마다 가장 가까운 역 NEARBY_STATION_NUM개와 거리를 다시 구하여 저장합니다.
+# chunk 단위로 식당 x 역 거리 행렬을 한 번에 계산합니다. 역 정보가 바뀐 뒤에도 실행합니다.
+start = time.time()
+updated = rebuildNearbyStations(chunkSize=chunkSize, k=NEARBY_STATION_NUM)
+print("updated %d restaurants in %.1f sec" % (updated, time.time() - start))
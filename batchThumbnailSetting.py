@@ -0,0 +1,32 @@
+import os
+import django
+import sys
+import time
+from itertools import chain
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from dining.models import Image, Users
+from dining.classifier import chunked
+from dining.thumbnails import thumbnailPool
+
+# 한 번에 pool에 넘길 이미지 수
+chunkSize = 500
+
+# 이미지/프로필 사진 중 크기/형식 별 파일이 없는 것을 process pool에서 만듭니다.
+# 이미 만들어진 파일은 건너뛰므로 여러 번 실행해도 됩니다.
+start = time.time()
+names = Image.objects.order_by("id").values_list("image", flat=True).iterator()
+profileNames = Users.objects.exclude(profileImageLink="").values_list("profileImageLink", flat=True).distinct()
+
+created, failed = 0, 0
+for chunk in chunked(chain(names, profileNames), chunkSize):
+    for result in thumbnailPool.map(chunk):
+        if isinstance(result, Exception):
+            failed += 1
+        else:
+            created += len(result)
+    print("created %d files, %d failed images" % (created, failed))
+
+thumbnailPool.shutdown()
+print("done in %.1f sec" % (time.time() - start))
@@ -0,0 +1,38 @@
+import os
+import django
+import sys
+import time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+# django_extensions의 shell_plus 실행 시 참조되는 전체 library 호출
+from allauth.account.models import EmailAddress, EmailConfirmation
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from dining.models import Image, Like, Restaurant, Review
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.admin.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.contrib.sites.models import Site
+from rest_framework.authtoken.models import Token
+# Shell Plus Django Imports
+from django.core.cache import cache
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Avg, Case, Count, F, Max, Min, Prefetch, Q, Sum, When, Exists, OuterRef, Subquery
+from django.utils import timezone
+from django.urls import reverse
+from dining.recount import recountUserStats, formatDriftReport
+
+# 한 번에 확인할 사용자 수
+chunkSize = 1000
+
+# 사용자를 chunk 단위로 읽고, 등록한 like/review/restaurant 갯수를 GROUP BY 쿼리로 구하여
+# 값이 다른 사용자의 createdLikeNum/createdReviewNum/createdRestaurantNum만 갱신합니다.
+start = time.time()
+report = recountUserStats(chunkSize=chunkSize)
+
+# drift report를 출력합니다.
+print(formatDriftReport(report))
+print("done in %.1f sec" % (time.time() - start))
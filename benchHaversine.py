@@ -0,0 +1,53 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+from haversine import haversine
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dining.distance import distancesFromPoint, pairwiseDistances
+from dining.utils import stationDict
+
+# 파라미터
+restaurantNum = 10000
+repeat = 5
+
+# 역 좌표와 역 주변에 흩어진 임의의 식당 좌표를 만듭니다.
+stations = np.array(list(stationDict.values()))
+rng = np.random.RandomState(0)
+restaurants = stations[rng.randint(len(stations), size=restaurantNum)] + rng.uniform(-0.01, 0.01, (restaurantNum, 2))
+latitude, longitude = stations[0]
+
+
+def loopStationRanking():
+    # 기존 방식 : 역 하나당 haversine 한 번 호출
+    return [haversine((latitude, longitude), tuple(s)) * 1000 for s in stations]
+
+
+def loopRestaurantBackfill():
+    # 기존 방식 : 식당 하나당 haversine 한 번 호출
+    return [haversine(tuple(r), (latitude, longitude)) * 1000 for r in restaurants]
+
+
+def loopStationMatrix():
+    return [[haversine(tuple(r), tuple(s)) * 1000 for s in stations] for r in restaurants[:1000]]
+
+
+cases = [
+    ("station ranking (%d stations)" % len(stations),
+     loopStationRanking, lambda: distancesFromPoint(latitude, longitude, stations)),
+    ("restaurant backfill (%d restaurants)" % restaurantNum,
+     loopRestaurantBackfill, lambda: distancesFromPoint(latitude, longitude, restaurants)),
+    ("restaurant x station matrix (1000 x %d)" % len(stations),
+     loopStationMatrix, lambda: pairwiseDistances(restaurants[:1000], stations)),
+]
+
+for name, loop, vectorized in cases:
+    # 두 방식의 결과가 같은지 먼저 확인합니다.
+    assert np.allclose(np.asarray(loop()), vectorized())
+
+    loopTime = min(timeit.repeat(loop, number=1, repeat=repeat))
+    vectorizedTime = min(timeit.repeat(vectorized, number=1, repeat=repeat))
+    print("%-42s loop %9.3f ms  numpy %8.3f ms  x%.1f"
+          % (name, loopTime * 1000, vectorizedTime * 1000, loopTime / vectorizedTime))
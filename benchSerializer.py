@@ -0,0 +1,73 @@
+import os
+import sys
+import timeit
+
+import django
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from django.db import transaction
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from dining.fastserializer import CompiledSerializer
+from dining.models import Users, Restaurant, Review, Image
+from dining.serializers import RestaurantSerializer, RestaurantListSerializer, ReviewSerializer
+
+# 파라미터
+restaurantNum = 200
+imageNum = 5
+repeat = 5
+
+# 목록 조회와 같이 request를 context로 넣어 이미지 URL을 절대 경로로 만듭니다.
+context = {"request": APIRequestFactory().get("/dining/v1/restaurant/")}
+
+
+def createRows():
+    # 측정용 식당/리뷰/이미지를 만듭니다. 측정이 끝나면 rollback 합니다.
+    user = Users.objects.create(uid="bench-user", nickname="bench")
+    restaurants = Restaurant.objects.bulk_create([
+        Restaurant(restaurantName="식당%d" % i, foodCategory="곱창", station="사당", uid=user,
+                   latitude=37.47, longitude=126.98, distFromStation=i, likeNum=i)
+        for i in range(restaurantNum)])
+    restaurants = list(Restaurant.objects.filter(uid=user))
+    reviews = Review.objects.bulk_create([Review(restaurant=r, uid=user, content="리뷰") for r in restaurants])
+    reviews = list(Review.objects.filter(uid=user))
+    Image.objects.bulk_create([Image(restaurant_id=review.restaurant_id, review=review, uid=user,
+                                     image="dining/bench/%d_%d.jpg" % (review.id, i))
+                               for review in reviews for i in range(imageNum)])
+
+
+def bench(name, serializerClass, queryset):
+    rows = list(queryset)
+
+    def drf():
+        return serializerClass(rows, many=True, context=context).data
+
+    def compiled():
+        return CompiledSerializer(serializerClass(context=context)).many(rows)
+
+    # 두 방식의 JSON 결과가 같은지 먼저 확인합니다.
+    assert JSONRenderer().render(drf()) == JSONRenderer().render(compiled())
+
+    drfTime = min(timeit.repeat(drf, number=1, repeat=repeat))
+    compiledTime = min(timeit.repeat(compiled, number=1, repeat=repeat))
+    print("%-36s DRF %8.1f us/row  compiled %8.1f us/row  x%.1f"
+          % ("%s (%d rows)" % (name, len(rows)), drfTime / len(rows) * 1e6,
+             compiledTime / len(rows) * 1e6, drfTime / compiledTime))
+
+
+with transaction.atomic():
+    createRows()
+    user = Users.objects.get(uid="bench-user")
+
+    bench("restaurant list", RestaurantSerializer,
+          Restaurant.objects.filter(uid=user).prefetch_related("images"))
+    bench("restaurant list (compact)", RestaurantListSerializer,
+          Restaurant.objects.filter(uid=user).annotate(imageNum=Count("images")))
+    bench("review list", ReviewSerializer,
+          Review.objects.filter(uid=user).select_related("uid").prefetch_related("reviewImages"))
+
+    transaction.set_rollback(True)
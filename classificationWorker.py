@@ -0,0 +1,27 @@
+import os
+import django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
+django.setup()
+
+from keras.models import load_model
+from dining.classifier import BatchClassifier, modelVersion
+from dining.worker import ClassificationWorker
+
+# 파라미터
+# predict에 한 번에 입력할 최대 이미지 수
+batchSize = 32
+# batch가 다 차지 않았을 때 이미지를 더 모으는 최대 시간(초)
+maxWait = 1.0
+# 대기열이 비어 있을 때 다시 확인하는 주기(초)
+pollInterval = 0.5
+
+# 학습된 모델은 worker 시작 시 한 번만 불러 옵니다.
+modelPath = '/home/bluemen/djangoserver/resources/MobileNet2Weights.h5'
+model = load_model(modelPath)
+baseUrl = "http://bluemen.pythonanywhere.com"
+
+# 이미지 등록 시(ImageViewSet.create) 대기열에 추가된 이미지를 몇 초 이내에 분류합니다.
+# 분류한 이미지가 음식이고 식당의 대표이미지가 없다면 대표이미지로 설정합니다.
+classifier = BatchClassifier(model, baseUrl, batchSize=batchSize, log=lambda message: None,
+                             version=modelVersion(modelPath))
+ClassificationWorker(classifier, batchSize=batchSize, maxWait=maxWait, pollInterval=pollInterval).runForever()
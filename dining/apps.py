@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class DiningConfig(AppConfig):
     name = 'dining'
+
+    def ready(self):
+        # signal handler 등록
+        from . import signals
@@ -0,0 +1,149 @@
+# dining/autocomplete.py
+import re
+import threading
+
+from .spatial import stationIndex
+from .utils import stationDict
+
+# 한글 음절의 초성 (유니코드 순서)
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+HANGUL_START, HANGUL_END = 0xAC00, 0xD7A3
+# 초성 하나에 해당하는 음절 수 (중성 21개 x 종성 28개)
+SYLLABLES_PER_CHOSEONG = 21 * 28
+
+# "총신대입구(이수)"의 괄호 안 이름
+ALIAS_PATTERN = re.compile(r"\(([^)]*)\)")
+
+# 자동완성으로 반환할 역의 기본/최대 갯수
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def choseong(c):
+    # 한글 음절이면 초성을, 그 외의 글자는 그대로 반환합니다. (사 -> ㅅ)
+    code = ord(c)
+    if HANGUL_START <= code <= HANGUL_END:
+        return CHOSEONG[(code - HANGUL_START) // SYLLABLES_PER_CHOSEONG]
+    return c
+
+
+class TrieNode:
+    __slots__ = ("children", "entries", "ordered", "byChoseong")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+        # freeze() 이후 사용 : key 순서의 자식 node 목록 / 초성 별 자식 node 목록
+        self.ordered = []
+        self.byChoseong = {}
+
+
+class Trie:
+    '''
+    문자열 key의 prefix로 payload를 찾는 trie
+
+    ---
+    + insert(key, payload) : key 위치에 payload를 저장합니다.
+    + freeze() : 모든 key를 저장한 뒤 한 번 호출하여 자식 node의 순서와 초성 별 목록을 미리 만들어 둡니다.
+    + walk(prefix) : prefix로 시작하는 key의 payload를 key 순서대로 반환하는 generator
+        + prefix의 글자가 초성(ㄱ, ㄴ, ...)이면 그 초성으로 시작하는 모든 음절과 같은 글자로 봅니다.
+    '''
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, key, payload):
+        node = self.root
+        for c in key:
+            node = node.children.setdefault(c, TrieNode())
+        node.entries.append(payload)
+
+    def freeze(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            node.ordered = [node.children[c] for c in sorted(node.children)]
+            node.byChoseong = {}
+            for c in sorted(node.children):
+                node.byChoseong.setdefault(choseong(c), []).append(node.children[c])
+            stack.extend(node.ordered)
+
+    def walk(self, prefix):
+        # prefix에 해당하는 node들을 key 순서대로 찾습니다.
+        nodes = [self.root]
+        for q in prefix:
+            if q in CHOSEONG:
+                nodes = [child for node in nodes for child in node.byChoseong.get(q, ())]
+            else:
+                nodes = [node.children[q] for node in nodes if q in node.children]
+            if not nodes:
+                return
+
+        # 각 node 아래의 payload를 key 순서대로 꺼냅니다.
+        stack = nodes[::-1]
+        while stack:
+            node = stack.pop()
+            yield from node.entries
+            # key 순서대로 꺼내도록 역순으로 넣습니다.
+            stack.extend(reversed(node.ordered))
+
+
+class StationAutocomplete:
+    '''
+    역 이름 자동완성용 메모리 인덱스
+
+    ---
+    + Station 테이블(최근접 역 인덱스에 올라와 있는 역)과 stationDict의 역 이름을 trie로 보관합니다.
+        + "총신대입구(이수)"처럼 괄호 안의 이름("이수")으로도 찾을 수 있도록 함께 저장합니다.
+    + 검색어의 초성은 그 초성으로 시작하는 음절과 같은 글자로 보므로 "ㅅㄷ", "사ㄷ", "사당" 모두 "사당"을 찾습니다.
+    + 최근접 역 인덱스가 다시 만들어지면(Station 변경 시) 다음 조회 때 trie도 다시 만듭니다. 조회 시 DB를 사용하지 않습니다.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._trie = None
+        self._source = None
+
+    def build(self, stations):
+        # (역 이름, 위도, 경도) : Station 테이블 값이 stationDict보다 우선합니다.
+        coordinates = {name: (lat, long) for name, (lat, long) in stationDict.items()}
+        coordinates.update({name: (lat, long) for _, name, lat, long in stations})
+
+        trie = Trie()
+        for name in sorted(coordinates):
+            entry = (name,) + tuple(coordinates[name])
+            for key in [name] + ALIAS_PATTERN.findall(name):
+                trie.insert(key.lower(), entry)
+        trie.freeze()
+
+        with self._lock:
+            self._trie, self._source = trie, stations
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        '''
+        query로 시작하는 역을 [(역 이름, 위도, 경도), ...] 형태로 최대 limit개 반환합니다.
+        '''
+        self._ensureFresh()
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+
+        results, seen = [], set()
+        for entry in self._trie.walk(query):
+            if entry[0] in seen:
+                continue
+            seen.add(entry[0])
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+    def _ensureFresh(self):
+        # 최근접 역 인덱스가 다시 만들어졌다면 같은 역 목록으로 trie를 다시 만듭니다.
+        stations = stationIndex.stations()
+        if self._trie is None or self._source is not stations:
+            self.build(stations)
+
+
+# 프로세스 당 하나의 인덱스를 공유합니다.
+stationAutocomplete = StationAutocomplete()
@@ -0,0 +1,48 @@
+# dining/bulk.py
+from django.db.models import Case, When, Value, F
+
+
+def bulkUpdateById(model, field, valuesById, batchSize=500):
+    '''
+    id 별로 서로 다른 값을 한 field에 UPDATE ... SET field = CASE id WHEN ... END 형태로 한 번에 저장합니다.
+
+    ---
+    + model : 갱신할 Model class
+    + field : 갱신할 field 이름
+    + valuesById : {id: 값} dict
+    + batchSize : UPDATE 한 번에 포함할 최대 row 수
+    + 갱신된 row 수를 반환합니다.
+    '''
+    items = list(valuesById.items())
+    outputField = model._meta.get_field(field)
+    updated = 0
+
+    for start in range(0, len(items), batchSize):
+        batch = items[start:start + batchSize]
+        value = Case(*[When(pk=pk, then=Value(v)) for pk, v in batch], output_field=outputField)
+        updated += model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{field: value})
+
+    return updated
+
+
+def bulkIncrementById(model, field, deltasById, batchSize=500):
+    '''
+    id 별로 서로 다른 증감값을 UPDATE ... SET field = field + CASE id WHEN ... END 형태로 한 번에 더합니다.
+
+    ---
+    + model : 갱신할 Model class
+    + field : 갱신할 field 이름
+    + deltasById : {id: 증감값} dict
+    + batchSize : UPDATE 한 번에 포함할 최대 row 수
+    + 갱신된 row 수를 반환합니다.
+    '''
+    items = [(pk, n) for pk, n in deltasById.items() if n]
+    outputField = model._meta.get_field(field)
+    updated = 0
+
+    for start in range(0, len(items), batchSize):
+        batch = items[start:start + batchSize]
+        delta = Case(*[When(pk=pk, then=Value(n)) for pk, n in batch], default=Value(0), output_field=outputField)
+        updated += model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{field: F(field) + delta})
+
+    return updated
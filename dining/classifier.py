@@ -0,0 +1,412 @@
+# dining/classifier.py
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .bulk import bulkUpdateById
+from . import listcache
+from .models import Image, Restaurant
+from .storage import contentHash
+
+# 학습된 모델의 입력 크기
+IMAGE_SIZE = 224
+# category : 0이면 food, 1이면 menu, 2이면 restaurant, -1이면 미분류
+FOOD_CATEGORY = 0
+UNCLASSIFIED = -1
+
+# incremental 분류를 이어서 할 때 checkpoint 아래에서 다시 확인하는 image id 범위
+# id는 INSERT 순서로 정해지지만 commit 순서는 다를 수 있으므로, checkpoint를 저장한 뒤 commit 된 더 작은 id의 이미지를 찾습니다.
+RESCAN_WINDOW = 1000
+
+
+def loadImage(name):
+    '''
+    media에 저장된 이미지를 읽어 학습된 크기의 RGB uint8 배열(224 x 224 x 3)로 반환합니다.
+
+    ---
+    + 이미지를 읽지 못하면 None을 반환합니다.
+    + resize를 uint8 상태에서 먼저 하여 float64로 변환한 뒤 resize 하는 것보다 메모리/연산량을 줄입니다.
+    '''
+    img = cv2.imread(default_storage.path(name))
+    if img is None:
+        return None
+    # BGR을 RGB 타입으로 바꾸어 줍니다.
+    return cv2.resize(img, (IMAGE_SIZE, IMAGE_SIZE))[:, :, ::-1]
+
+
+def normalize(images):
+    # 학습할 때 적용된 normalize 처리를 float32로 합니다.
+    return np.stack(images).astype(np.float32) / 255.
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def pendingImages():
+    # 미분류된 이미지의 (id, restaurant id, 파일 이름)을 id 순으로 가져옵니다.
+    return (Image.objects.filter(category=UNCLASSIFIED).order_by("id")
+            .values_list("id", "restaurant_id", "image").iterator(chunk_size=2000))
+
+
+def pendingChunks(highWaterMark=0, chunkSize=1000, exclude=()):
+    '''
+    highWaterMark 이후의 미분류 이미지를 id 순으로 chunkSize 개씩 가져옵니다.
+
+    ---
+    + id 범위 조건(id > 마지막 id)으로 다음 chunk를 조회하므로 이미 지나간 이미지는 다시 읽지 않습니다.
+    + exclude : 제외할 image id 목록
+    '''
+    queryset = Image.objects.filter(category=UNCLASSIFIED)
+    if exclude:
+        queryset = queryset.exclude(id__in=list(exclude))
+    return imageChunks(queryset, highWaterMark, chunkSize)
+
+
+def imageChunks(queryset, highWaterMark=0, chunkSize=1000):
+    # queryset 중 highWaterMark 이후의 이미지를 (id, restaurant id, 파일 이름)으로 id 순 chunkSize 개씩 가져옵니다.
+    while True:
+        chunk = list(queryset.filter(id__gt=highWaterMark).order_by("id")
+                     .values_list("id", "restaurant_id", "image")[:chunkSize])
+        if not chunk:
+            return
+        yield chunk
+        highWaterMark = chunk[-1][0]
+
+
+def modelVersion(path, length=12):
+    # 모델 파일 내용의 sha256 hash 앞부분을 모델 version으로 사용합니다. 다시 학습하면 version이 바뀝니다.
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def formatConfidences(vector):
+    # category 별 확률을 JSON 배열로 저장합니다.
+    return json.dumps([round(float(p), 4) for p in vector])
+
+
+def knownLabels(names, version=None):
+    '''
+    이미 분류된 같은 파일(hash 이름)의 분류 결과를 {파일 이름: (category, confidences, model version)}으로 반환합니다.
+
+    ---
+    + hash 이름은 파일 내용이 같으면 같으므로, 같은 이름의 분류 결과를 그대로 사용할 수 있습니다.
+    + version을 입력하면 해당 모델이 분류한 결과만 사용합니다.
+    '''
+    names = {name for name in names if contentHash(name)}
+    if not names:
+        return {}
+    images = Image.objects.filter(image__in=names).exclude(category=UNCLASSIFIED)
+    if version is not None:
+        images = images.filter(modelVersion=version)
+    return {name: (category, confidences, labelVersion) for name, category, confidences, labelVersion
+            in images.order_by("id").values_list("image", "category", "confidences", "modelVersion")}
+
+
+def saveLabels(labelsById):
+    '''
+    {image id: (category, confidences, model version)}를 저장합니다.
+
+    ---
+    + category/model version은 같은 값끼리 UPDATE 한 번씩, confidences는 bulk UPDATE 한 번으로 저장합니다.
+    '''
+    idsByLabel = defaultdict(list)
+    for imageId, (category, _, version) in labelsById.items():
+        idsByLabel[(category, version)].append(imageId)
+    for (category, version), ids in idsByLabel.items():
+        Image.objects.filter(id__in=ids).update(category=category, modelVersion=version)
+    bulkUpdateById(Image, "confidences", {imageId: label[1] for imageId, label in labelsById.items()})
+
+    # 분류된 이미지가 포함된 이미지/식당 응답의 ETag를 바꿉니다.
+    listcache.bumpImages(Image.objects.filter(id__in=list(labelsById))
+                         .values_list("id", "restaurant_id", "review_id"))
+
+
+def saveRepresentativeImages(foodImages, baseUrl):
+    '''
+    대표이미지가 없는 식당에 가장 먼저 등록된 음식 이미지를 대표이미지로 저장합니다.
+
+    ---
+    + foodImages : [(image id, restaurant id, 파일 이름), ...]
+    '''
+    firstImages = {}
+    for imageId, restaurantId, name in sorted(foodImages):
+        firstImages.setdefault(restaurantId, name)
+
+    restaurantIds = Restaurant.objects.filter(id__in=list(firstImages), representativeImage="") \
+        .values_list("id", flat=True)
+    representativeImages = {rid: baseUrl + default_storage.url(firstImages[rid]) for rid in restaurantIds}
+    bulkUpdateById(Restaurant, "representativeImage", representativeImages)
+    # 대표이미지가 바뀐 식당이 포함된 식당 리스트 cache를 사용하지 않도록 합니다.
+    listcache.bumpRestaurantIds(representativeImages)
+
+
+def mediaName(url):
+    # "<base url>/media/<파일 이름>" 형태의 URL에서 파일 이름을, media URL이 아니면 None을 반환합니다.
+    index = url.find(default_storage.base_url)
+    return url[index + len(default_storage.base_url):] if index >= 0 else None
+
+
+def recomputeRepresentativeImages(baseUrl, chunkSize=1000):
+    '''
+    재분류 후 전체 식당의 대표이미지를 식당 id 순 chunk 단위로 다시 정하고, 바뀐 식당 수를 반환합니다.
+
+    ---
+    + 대표이미지가 없거나, 그 식당의 이미지 중 음식이 아닌 것으로 분류된 이미지이면 가장 먼저 등록된 음식 이미지로 바꿉니다.
+        + 음식 이미지가 없다면 대표이미지를 비웁니다.
+    + 사용자가 지정한 다른 URL이나 음식 이미지인 대표이미지는 그대로 둡니다.
+    + chunk 마다 식당/이미지 조회 한 번씩과 bulk UPDATE 한 번으로 처리합니다.
+    '''
+    lastId, changed = 0, 0
+    while True:
+        restaurants = list(Restaurant.objects.filter(id__gt=lastId).order_by("id")
+                           .values_list("id", "representativeImage")[:chunkSize])
+        if not restaurants:
+            return changed
+        lastId = restaurants[-1][0]
+
+        # 식당 별 음식 이미지 파일 / 음식이 아닌 이미지 파일 / 가장 먼저 등록된 음식 이미지
+        foodNames, otherNames, firstFood = defaultdict(set), defaultdict(set), {}
+        for restaurantId, name, category in Image.objects.filter(restaurant_id__in=[r[0] for r in restaurants]) \
+                .order_by("id").values_list("restaurant_id", "image", "category"):
+            if category == FOOD_CATEGORY:
+                foodNames[restaurantId].add(name)
+                firstFood.setdefault(restaurantId, name)
+            else:
+                otherNames[restaurantId].add(name)
+
+        representativeImages = {}
+        for restaurantId, url in restaurants:
+            name = mediaName(url) if url else None
+            if url and (name is None or name in foodNames[restaurantId] or name not in otherNames[restaurantId]):
+                continue
+            newUrl = baseUrl + default_storage.url(firstFood[restaurantId]) if restaurantId in firstFood else ""
+            if newUrl != url:
+                representativeImages[restaurantId] = newUrl
+
+        bulkUpdateById(Restaurant, "representativeImage", representativeImages)
+        listcache.bumpRestaurantIds(representativeImages)
+        changed += len(representativeImages)
+
+
+class BatchClassifier:
+    '''
+    미분류 이미지를 mini-batch 단위로 분류하는 pipeline
+
+    ---
+    + reader pool(thread)에서 이미지를 병렬로 읽고 resize 합니다. (opencv는 GIL을 풀고 동작합니다.)
+    + 현재 batch를 predict 하는 동안 다음 batch의 이미지를 미리 읽어 둡니다.
+    + batch 마다 category와 대표이미지를 bulk UPDATE로 한 번에 저장합니다.
+    + 같은 파일(hash 이름)은 한 번만 읽고 predict 하며, 이미 분류된 파일이면 그 결과를 사용합니다.
+    + tensorCache(TensorCache)를 입력하면 resize 한 이미지를 저장해 두고, 다음 실행부터는 JPEG을 다시 읽지 않습니다.
+    + version : 분류 결과와 함께 저장할 모델 version
+    + reclassify : True이면 이미 분류된 이미지를 다시 분류하여 category가 바뀐 이미지만 저장합니다.
+        + 이전 모델의 결과는 사용하지 않고, 대표이미지는 저장하지 않습니다. (recomputeRepresentativeImages로 한 번에 계산)
+    '''
+
+    def __init__(self, model, baseUrl, batchSize=64, workers=4, log=print, tensorCache=None, version="",
+                 reclassify=False):
+        self.model = model
+        self.baseUrl = baseUrl
+        self.batchSize = batchSize
+        self.workers = workers
+        self.log = log
+        self.tensorCache = tensorCache
+        self.version = version
+        self.reclassify = reclassify
+
+        self.classified = 0
+        # 재분류 시 category가 바뀐 이미지 수
+        self.changed = 0
+        # predict 한 파일 수 : 같은 파일을 공유하는 이미지는 한 번만 셉니다.
+        self.predicted = 0
+        self.failed = []
+        self.elapsed = 0.
+
+    def run(self, rows):
+        '''
+        rows : (image id, restaurant id, 파일 이름)의 iterable
+        '''
+        start = time.time()
+        with ThreadPoolExecutor(self.workers) as pool:
+            for chunk, known, futures in self._prefetch(rows, pool):
+                self.classifyBatch(chunk, {name: f.result() for name, f in futures.items()}, known)
+                if self.tensorCache is not None:
+                    self.tensorCache.flush()
+
+                self.elapsed = time.time() - start
+                self.log("classified %d images (%d predicted, %d changed), %d failed, %.1f images/sec"
+                         % (self.classified, self.predicted, self.changed, len(self.failed),
+                            self.classified / max(self.elapsed, 1e-9)))
+        return self
+
+    def _prefetch(self, rows, pool):
+        # 다음 batch의 이미지 읽기를 먼저 시작해 두고 이전 batch를 넘겨줍니다.
+        # 분류 결과가 있는 파일은 읽지 않고, batch 안에서 같은 파일은 한 번만 읽습니다.
+        previous = None
+        for chunk in chunked(rows, self.batchSize):
+            known = knownLabels((name for _, _, name in chunk), self.version if self.reclassify else None)
+            futures = {}
+            for _, _, name in chunk:
+                if name not in known and name not in futures:
+                    futures[name] = pool.submit(self.loadTensor, name)
+            if previous is not None:
+                yield previous
+            previous = (chunk, known, futures)
+        if previous is not None:
+            yield previous
+
+    def loadTensor(self, name):
+        # tensor cache에 있으면 복사 없이 그대로 사용하고, 없으면 이미지를 읽어 cache에 저장합니다.
+        if self.tensorCache is not None:
+            img = self.tensorCache.get(name)
+            if img is not None:
+                return img
+        img = loadImage(name)
+        if img is not None and self.tensorCache is not None:
+            self.tensorCache.put(name, img)
+        return img
+
+    def classifyBatch(self, chunk, images, known=None):
+        '''
+        chunk : (image id, restaurant id, 파일 이름) 목록, images : {파일 이름: 읽은 이미지},
+        known : {파일 이름: (category, confidences, model version)}
+
+        ---
+        + {image id: category}를 반환합니다.
+        '''
+        labels = dict(known or {})
+        # 읽지 못한 이미지는 실패 목록에 남기고 제외합니다.
+        self.failed += [row[0] for row in chunk if row[2] not in labels and images.get(row[2]) is None]
+
+        names = [name for name, img in images.items() if img is not None and name not in labels]
+        if names:
+            # 학습된 모델에 batch로 입력하여 분류하고, 결과 벡터에서 가장 큰값의 index를 category로 사용합니다.
+            resultVectors = self.model.predict(normalize([images[name] for name in names]), batch_size=len(names))
+            for name, vector in zip(names, resultVectors):
+                labels[name] = (int(np.argmax(vector)), formatConfidences(vector), self.version)
+            self.predicted += len(names)
+
+        rows = [row for row in chunk if row[2] in labels]
+        if not rows:
+            return {}
+        self.classified += len(rows)
+        categories = {row[0]: labels[row[2]][0] for row in rows}
+
+        if self.reclassify:
+            # category가 바뀐 이미지만 저장합니다.
+            current = dict(Image.objects.filter(id__in=list(categories)).values_list("id", "category"))
+            rows = [row for row in rows if current.get(row[0]) != categories[row[0]]]
+            self.changed += len(rows)
+            if not rows:
+                return categories
+        self.save(rows, [labels[row[2]] for row in rows])
+        return categories
+
+    def save(self, rows, labels):
+        # 작업한 내용을 batch 단위로 한 번에 db에 저장합니다.
+        with transaction.atomic():
+            saveLabels({row[0]: label for row, label in zip(rows, labels)})
+            if not self.reclassify:
+                saveRepresentativeImages([row for row, label in zip(rows, labels) if label[0] == FOOD_CATEGORY],
+                                         self.baseUrl)
+
+
+class Checkpoint:
+    '''
+    incremental 분류의 진행 상태를 저장하는 JSON 파일
+
+    ---
+    + highWaterMark : 마지막으로 처리한 chunk의 가장 큰 image id
+    + failed : 이미지를 읽지 못해 미분류로 남아 있는 image id 목록
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.highWaterMark = 0
+        self.failed = []
+
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.highWaterMark = state.get("highWaterMark", 0)
+            self.failed = state.get("failed", [])
+
+    def save(self):
+        # 저장 도중 중단되어도 이전 checkpoint가 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다.
+        tmpPath = self.path + ".tmp"
+        with open(tmpPath, "w") as f:
+            json.dump({"highWaterMark": self.highWaterMark, "failed": self.failed}, f)
+        os.replace(tmpPath, self.path)
+
+
+def runIncremental(classifier, checkpoint, chunkSize=1000, retryFailed=False, rescanWindow=RESCAN_WINDOW):
+    '''
+    checkpoint 이후에 등록된 미분류 이미지만 chunk 단위로 분류하고, chunk 마다 checkpoint를 저장합니다.
+
+    ---
+    + 중간에 중단되어도 다음 실행 시 마지막으로 저장된 checkpoint부터 이어서 분류합니다.
+    + checkpoint 아래 rescanWindow 개의 id 범위도 다시 조회하여, 늦게 commit 된 미분류 이미지를 놓치지 않습니다.
+        + 이미 분류된 이미지는 조건(category=-1)에서 빠지므로 다시 분류하지 않습니다.
+    + 읽지 못한 이미지는 failed에 기록하고 다음 실행부터는 다시 시도하지 않습니다.
+    + retryFailed : True이면 failed에 기록된 이미지를 먼저 다시 분류합니다.
+    '''
+    if retryFailed and checkpoint.failed:
+        rows = list(Image.objects.filter(id__in=checkpoint.failed, category=UNCLASSIFIED).order_by("id")
+                    .values_list("id", "restaurant_id", "image"))
+        before = len(classifier.failed)
+        classifier.run(rows)
+        checkpoint.failed = sorted(classifier.failed[before:])
+        checkpoint.save()
+
+    start = max(checkpoint.highWaterMark - rescanWindow, 0)
+    # 다시 조회하는 범위의 failed 이미지만 제외하면 되므로 제외 목록은 rescanWindow 개를 넘지 않습니다.
+    for chunk in pendingChunks(start, chunkSize, exclude=[i for i in checkpoint.failed if i > start]):
+        before = len(classifier.failed)
+        classifier.run(chunk)
+
+        checkpoint.failed = sorted(set(checkpoint.failed) | set(classifier.failed[before:]))
+        checkpoint.highWaterMark = max(checkpoint.highWaterMark, chunk[-1][0])
+        checkpoint.save()
+
+    return classifier
+
+
+def runReclassify(classifier, checkpoint, chunkSize=1000):
+    '''
+    전체 이미지를 id 순 chunk 단위로 다시 분류하고, 마지막에 전체 식당의 대표이미지를 다시 계산합니다.
+
+    ---
+    + classifier는 reclassify=True로 만들어 category가 바뀐 이미지만 저장합니다.
+    + chunk 마다 checkpoint를 저장하므로 중간에 중단되어도 이어서 분류합니다. 모델 version 별로 다른 checkpoint를 사용합니다.
+    + 대표이미지는 모든 chunk를 분류한 뒤 recomputeRepresentativeImages로 한 번에 다시 계산합니다.
+    '''
+    for chunk in imageChunks(Image.objects.all(), checkpoint.highWaterMark, chunkSize):
+        before = len(classifier.failed)
+        classifier.run(chunk)
+
+        checkpoint.failed = sorted(set(checkpoint.failed) | set(classifier.failed[before:]))
+        checkpoint.highWaterMark = chunk[-1][0]
+        checkpoint.save()
+
+    changed = recomputeRepresentativeImages(classifier.baseUrl, chunkSize)
+    classifier.log("representative images of %d restaurants changed" % changed)
+    return classifier
@@ -0,0 +1,85 @@
+# dining/conditional.py
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import listcache
+
+
+class ConditionalGetMixin:
+    '''
+    list/retrieve 응답에 ETag를 붙이고 If-None-Match 조건부 요청을 처리하는 ViewSet mixin
+
+    ---
+    + ETag는 요청 경로/조회 조건과, 결과가 의존하는 범위의 version(cache에 저장, 쓰기 시 변경)으로 만듭니다.
+        + version은 DB를 조회하지 않고 cache에서 읽으므로 ETag를 만드는 데 DB 조회가 필요 없습니다.
+    + If-None-Match가 현재 ETag와 같으면 조회와 serializer 없이 304 Not Modified를 반환합니다.
+    + ViewSet에서 listScopes(params) / retrieveScopes(pk)로 결과가 의존하는 범위를 정의합니다.
+    + cache_list_responses가 True이면 list 응답을 ETag 별로 cache에 저장해 두고 재사용합니다.
+    + weak_retrieve_etag가 True이면 retrieve 응답에 weak ETag를 사용합니다.
+      (조회수처럼 version과 관계 없이 조금씩 바뀌는 값이 응답에 포함된 경우)
+    '''
+    cache_list_responses = False
+    list_cache_timeout = listcache.RESTAURANT_LIST_CACHE_TIMEOUT
+    weak_retrieve_etag = False
+
+    def listScopes(self, params):
+        return []
+
+    def retrieveScopes(self, pk):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        etag = self.makeETag(request, self.listScopes(request.query_params))
+        return self.conditionalResponse(request, etag, super().list, self.cache_list_responses, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        # If-None-Match: * 는 대상이 있을 때만 304로 응답하므로, 먼저 조회하여 없으면 404를 반환합니다.
+        if self.matchesAny(request):
+            self.get_object()
+        etag = self.makeETag(request, self.retrieveScopes(self.kwargs[self.lookup_url_kwarg or self.lookup_field]),
+                             weak=self.weak_retrieve_etag)
+        return self.conditionalResponse(request, etag, super().retrieve, False, *args, **kwargs)
+
+    def makeETag(self, request, scopes, weak=False):
+        normalized = json.dumps([request.get_host(), request.path, sorted(request.query_params.lists()),
+                                 listcache.currentVersions(scopes)])
+        etag = '"%s"' % hashlib.md5(normalized.encode("utf-8")).hexdigest()
+        return "W/" + etag if weak else etag
+
+    def conditionalResponse(self, request, etag, handler, cacheResponse, *args, **kwargs):
+        if self.notModified(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        # 같은 ETag의 응답이 cache에 있다면 조회 없이 반환합니다.
+        cacheKey = "dining:response:" + self.stripWeak(etag).strip('"')
+        if cacheResponse:
+            data = cache.get(cacheKey)
+            if data is not None:
+                return Response(data, headers={"ETag": etag})
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+            if cacheResponse:
+                cache.set(cacheKey, response.data, self.list_cache_timeout)
+        return response
+
+    def notModified(self, request, etag):
+        # If-None-Match는 weak 비교를 하므로 W/ 를 떼고 비교합니다.
+        if self.matchesAny(request):
+            return True
+        ifNoneMatch = request.META.get("HTTP_IF_NONE_MATCH", "")
+        return self.stripWeak(etag) in [self.stripWeak(e) for e in parse_etags(ifNoneMatch)]
+
+    @staticmethod
+    def matchesAny(request):
+        return request.META.get("HTTP_IF_NONE_MATCH", "").strip() == "*"
+
+    @staticmethod
+    def stripWeak(etag):
+        return etag[2:] if etag.startswith("W/") else etag
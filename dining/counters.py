@@ -0,0 +1,88 @@
+# dining/counters.py
+from django.db.models import F, Count
+from .bulk import bulkIncrementById
+from .models import Restaurant, Users, Like, Review
+from . import listcache
+
+# 사용자 점수 : 식당/좋아요/리뷰/이미지 등록 시 얻는 점수
+RESTAURANT_SCORE = 10
+LIKE_SCORE = 1
+REVIEW_SCORE = 5
+IMAGE_SCORE = 3
+
+
+def addCounters(model, pk, **deltas):
+    '''
+    pk에 해당하는 row의 카운터 field들을 UPDATE ... SET col = col + n 한 번으로 갱신합니다.
+
+    ---
+    + model : 갱신할 Model class
+    + pk : 갱신할 row의 pk
+    + deltas : {field 이름: 증감값}, 증감값이 0인 field는 제외됩니다.
+    + row를 읽어오지 않고 DB에서 바로 더하므로 동시에 요청이 들어와도 값이 유실되지 않습니다.
+    '''
+    expressions = {field: F(field) + n for field, n in deltas.items() if n}
+    if not expressions:
+        return 0
+    return model.objects.filter(pk=pk).update(**expressions)
+
+
+def addUserCounters(pk, **deltas):
+    # 사용자 정보는 리뷰 응답에 포함되므로 User의 카운터가 바뀌면 리뷰 응답의 version도 바꿉니다.
+    updated = addCounters(Users, pk, **deltas)
+    if updated:
+        listcache.bumpUsers([pk])
+    return updated
+
+
+def restaurantCreated(restaurant):
+    # 식당 등록 시 User의 Score를 +10점, createdRestaurantNum을 +1 합니다.
+    addUserCounters(restaurant.uid_id, score=RESTAURANT_SCORE, createdRestaurantNum=1)
+
+
+def restaurantDeleting(restaurant):
+    '''
+    식당을 삭제하기 전에 호출하여 User의 createdRestaurantNum을 -1 하고,
+    함께 삭제(CASCADE)되는 Like/Review를 등록한 User들의 createdLikeNum/createdReviewNum을 줄입니다.
+    '''
+    addCounters(Users, restaurant.uid_id, createdRestaurantNum=-1)
+    uids = {restaurant.uid_id}
+    for model, field in ((Like, "createdLikeNum"), (Review, "createdReviewNum")):
+        counts = dict(model.objects.filter(restaurant=restaurant).values("uid").annotate(n=Count("id"))
+                      .order_by().values_list("uid", "n"))
+        bulkIncrementById(Users, field, {uid: -n for uid, n in counts.items()})
+        uids.update(counts)
+    listcache.bumpUsers(uids)
+
+
+def likeCreated(like):
+    # Restaurant의 likeNum을 +1, searchNum을 -1 합니다.(페이지 동기화를 위해 새로고침 할 때 발생하는 +1을 방지하기 위한 목적)
+    addCounters(Restaurant, like.restaurant_id, likeNum=1, searchNum=-1)
+    # Like 등록 시 User의 Score를 +1점, createdLikeNum을 +1 합니다.
+    addUserCounters(like.uid_id, score=LIKE_SCORE, createdLikeNum=1)
+
+
+def likeDeleted(like):
+    # Restaurant의 likeNum을 -1, searchNum을 -1 합니다.
+    addCounters(Restaurant, like.restaurant_id, likeNum=-1, searchNum=-1)
+    # Like 취소 시 User의 Score를 -1점, createdLikeNum을 -1 합니다.
+    addUserCounters(like.uid_id, score=-LIKE_SCORE, createdLikeNum=-1)
+
+
+def reviewCreated(review):
+    # Restaurant의 reviewNum을 +1, searchNum을 -1 합니다.
+    addCounters(Restaurant, review.restaurant_id, reviewNum=1, searchNum=-1)
+    # Review 등록 시 User의 Score를 +5점, createdReviewNum을 +1 합니다.
+    addUserCounters(review.uid_id, score=REVIEW_SCORE, createdReviewNum=1)
+
+
+def reviewDeleted(review):
+    # Restaurant의 reviewNum을 -1 합니다.
+    addCounters(Restaurant, review.restaurant_id, reviewNum=-1)
+    # Review 삭제 시 User의 Score를 -5점, createdReviewNum을 -1 합니다.
+    addUserCounters(review.uid_id, score=-REVIEW_SCORE, createdReviewNum=-1)
+
+
+def imageCreated(image):
+    # Image 등록 시 User의 Score를 +3점 합니다.
+    addUserCounters(image.uid_id, score=IMAGE_SCORE)
@@ -0,0 +1,44 @@
+# dining/distance.py
+import numpy as np
+
+# haversine 패키지와 같은 지구 평균 반지름 (단위 : m)
+EARTH_RADIUS = 6371.0088 * 1000
+
+
+def haversineArray(lat1, lon1, lat2, lon2):
+    '''
+    두 좌표 배열 사이의 haversine 거리를 한 번의 NumPy 연산으로 구합니다.
+
+    ---
+    + 입력은 스칼라 또는 배열이며 NumPy broadcasting 규칙을 따릅니다.
+    + 단위는 m로 반환합니다.
+    '''
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def distancesFromPoint(latitude, longitude, points):
+    '''
+    한 지점에서 여러 지점까지의 거리를 구합니다.
+
+    ---
+    + points : [(위도, 경도), ...] 형태의 N x 2 배열
+    + 길이 N의 거리 배열(m)을 반환합니다.
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return haversineArray(latitude, longitude, points[:, 0], points[:, 1])
+
+
+def pairwiseDistances(pointsA, pointsB):
+    '''
+    두 지점 집합 사이의 모든 거리를 구합니다.
+
+    ---
+    + pointsA : N x 2 배열, pointsB : M x 2 배열
+    + N x M 거리 행렬(m)을 반환합니다.
+    '''
+    pointsA = np.asarray(pointsA, dtype=np.float64).reshape(-1, 2)
+    pointsB = np.asarray(pointsB, dtype=np.float64).reshape(-1, 2)
+    return haversineArray(pointsA[:, 0, None], pointsA[:, 1, None], pointsB[None, :, 0], pointsB[None, :, 1])
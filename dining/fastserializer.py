@@ -0,0 +1,152 @@
+# dining/fastserializer.py
+from operator import attrgetter
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+# field 종류별로 DRF의 to_representation과 같은 결과를 내는 변환 함수
+SIMPLE_FIELDS = (
+    (serializers.IntegerField, int),
+    (serializers.FloatField, float),
+    (serializers.CharField, str),
+)
+
+
+def compileField(field):
+    '''
+    DRF field 하나를 instance에서 값을 읽어 출력값으로 바꾸는 함수로 미리 변환합니다.
+
+    ---
+    + int/float/str field와 pk로 표시되는 ForeignKey는 DRF의 get_attribute/to_representation을 거치지 않고 바로 읽습니다.
+    + nested serializer(many=True)는 child serializer를 같은 방식으로 변환해 둡니다.
+    + 이미지 field는 파일 URL을 한 번만 계산합니다.
+    + 그 외의 field(날짜 등)는 DRF field의 to_representation을 그대로 사용합니다.
+    '''
+    if isinstance(field, serializers.ListSerializer) and field.source != "*":
+        child = CompiledSerializer(field.child)
+        getter = attrgetter(field.source)
+
+        def readList(instance):
+            related = getter(instance)
+            if isinstance(related, models.Manager):
+                related = related.all()
+            return [child.row(obj) for obj in related]
+        return readList
+
+    if len(field.source_attrs) != 1:
+        return genericField(field)
+
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # ForeignKey는 연결된 row를 읽지 않고 저장된 pk 값(uid_id 등)을 그대로 사용합니다.
+        model = field.parent.Meta.model
+        getter = attrgetter(model._meta.get_field(field.source).attname)
+        return lambda instance: getter(instance)
+
+    if isinstance(field, serializers.FileField):
+        return compileFileField(field)
+
+    for fieldClass, convert in SIMPLE_FIELDS:
+        if type(field) is fieldClass:
+            getter = attrgetter(field.source)
+
+            def readSimple(instance, getter=getter, convert=convert, required=field.required):
+                try:
+                    value = getter(instance)
+                except AttributeError:
+                    # DRF와 같이 필수가 아닌 field는 값이 없으면(annotate 되지 않은 distance 등) 출력하지 않습니다.
+                    if required:
+                        raise
+                    raise SkipField()
+                return None if value is None else convert(value)
+            return readSimple
+
+    return genericField(field)
+
+
+def compileFileField(field):
+    # DRF FileField.to_representation과 같은 값을 만들되, 파일 URL(storage.url)은 한 번만 계산합니다.
+    useUrl = getattr(field, "use_url", api_settings.UPLOADED_FILES_USE_URL)
+    request = field.context.get("request", None)
+    getter = attrgetter(field.source)
+
+    def readFile(instance):
+        value = getter(instance)
+        if not value:
+            return None
+        if not useUrl:
+            return value.name
+        url = value.url
+        if not url:
+            return None
+        return request.build_absolute_uri(url) if request is not None else url
+    return readFile
+
+
+def genericField(field):
+    # DRF Serializer.to_representation과 같은 순서로 값을 읽고 변환합니다.
+    def read(instance):
+        attribute = field.get_attribute(instance)
+        checkForNone = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if checkForNone is None else field.to_representation(attribute)
+    return read
+
+
+class CompiledSerializer:
+    '''
+    목록 조회용으로 serializer의 field 별 변환 함수를 미리 만들어 두고 row 마다 dict를 바로 만드는 serializer
+
+    ---
+    + serializer : context가 설정된 DRF serializer instance
+    + row(instance) : DRF serializer의 data와 같은 key 순서와 값을 가진 dict를 반환합니다.
+    + serializer class의 extra_representations에 정의된 값(예: 리뷰의 작성자 정보)도 같은 방식으로 덧붙입니다.
+    '''
+
+    def __init__(self, serializer):
+        self.fields = [(field.field_name, compileField(field)) for field in serializer._readable_fields]
+
+        for name, source, serializerClass in getattr(serializer, "extra_representations", ()):
+            nested = CompiledSerializer(serializerClass())
+            getter = attrgetter(source)
+            self.fields.append((name, lambda instance, nested=nested, getter=getter: nested.row(getter(instance))))
+
+    def row(self, instance):
+        data = {}
+        for name, read in self.fields:
+            try:
+                data[name] = read(instance)
+            except SkipField:
+                pass
+        return data
+
+    def many(self, instances):
+        return [self.row(instance) for instance in instances]
+
+
+class CompiledListData:
+    # ListModelMixin.list가 사용하는 serializer.data만 제공합니다.
+    def __init__(self, compiled, instances):
+        self.compiled = compiled
+        self.instances = instances
+
+    @property
+    def data(self):
+        return self.compiled.many(self.instances)
+
+
+class FastListMixin:
+    '''
+    list 응답을 CompiledSerializer로 만드는 ViewSet mixin
+
+    ---
+    + list action에서 여러 개를 serialize 할 때만 사용하며, 그 외의 action은 기존 serializer를 사용합니다.
+    + 요청마다 serializer를 한 번만 변환하고, row 마다 DRF field 처리 과정을 거치지 않습니다.
+    '''
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == "list" and kwargs.get("many") and args:
+            serializer = self.get_serializer_class()(context=self.get_serializer_context())
+            return CompiledListData(CompiledSerializer(serializer), args[0])
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,121 @@
+# dining/geosearch.py
+import math
+
+import numpy as np
+from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from .distance import EARTH_RADIUS, distancesFromPoint
+
+# 위치 검색의 기본 반경 (단위 : m)
+DEFAULT_RADIUS = 500
+
+# 위치 검색의 최대 반경 (단위 : m), bbox도 가로/세로가 이 값의 2배 이내인 범위만 허용합니다.
+# 페이지마다 범위 안의 식당 전체를 읽어 거리 순으로 정렬하므로 범위를 제한합니다.
+MAX_RADIUS = getattr(settings, "GEO_SEARCH_MAX_RADIUS", 3000)
+
+
+def boundingBox(latitude, longitude, radius):
+    '''
+    (latitude, longitude)에서 radius(m) 이내의 점을 모두 포함하는 위도/경도 범위를 반환합니다.
+
+    ---
+    + (남, 서, 북, 동) 순서로 반환합니다.
+    + 경도 1도의 거리는 위도가 높을수록 짧아지므로 cos(위도)로 나누어 넓혀 줍니다.
+    '''
+    dLat = math.degrees(radius / EARTH_RADIUS)
+    # 극지방에서 범위가 무한히 커지지 않도록 cos 값의 하한을 둡니다.
+    maxLat = min(abs(latitude) + dLat, 89.9)
+    dLon = dLat / max(math.cos(math.radians(maxLat)), 1e-6)
+    return latitude - dLat, longitude - dLon, latitude + dLat, longitude + dLon
+
+
+def parseNumber(name, value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "%s는 숫자로 입력해야 합니다." % name})
+    if not math.isfinite(number):
+        raise ValidationError({name: "%s는 숫자로 입력해야 합니다." % name})
+    return number
+
+
+def checkBoundingBox(south, west, north, east):
+    # 범위의 세로/가로 길이(m)가 MAX_RADIUS의 2배 이내인지 확인합니다.
+    height = math.radians(north - south) * EARTH_RADIUS
+    width = math.radians(east - west) * EARTH_RADIUS * math.cos(math.radians((south + north) / 2))
+    if not (0 <= height <= 2 * MAX_RADIUS and 0 <= width <= 2 * MAX_RADIUS):
+        raise ValidationError({"bbox": "bbox는 남 <= 북, 서 <= 동이고 가로/세로가 %d m 이내여야 합니다." % (2 * MAX_RADIUS)})
+
+
+class GeoQuery:
+    '''
+    위치 검색 조건
+
+    ---
+    + latitude/longitude : 거리를 잴 기준 위치
+    + radius : 기준 위치에서의 최대 거리(m), None이면 거리로 거르지 않습니다.
+    + bbox : (남, 서, 북, 동) 위도/경도 범위, None이면 radius로 만든 범위를 사용합니다.
+    '''
+
+    def __init__(self, latitude, longitude, radius=None, bbox=None):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius = radius
+        self.bbox = bbox if bbox is not None else boundingBox(latitude, longitude, radius)
+
+    @classmethod
+    def fromParams(cls, params):
+        '''
+        요청 파라미터로 검색 조건을 만듭니다. 위치 검색 파라미터가 없다면 None을 반환합니다.
+
+        ---
+        + latitude, longitude, radius(옵션, 기본값 500) : 기준 위치에서 radius 이내
+        + bbox=남,서,북,동 : 범위 안의 식당, latitude/longitude가 없다면 범위의 가운데를 기준으로 거리를 잽니다.
+        + 숫자가 아니거나 radius/bbox가 MAX_RADIUS로 정한 범위보다 크면 ValidationError(400)를 발생시킵니다.
+        '''
+        latitude, longitude = params.get("latitude"), params.get("longitude")
+        radius, bbox = params.get("radius"), params.get("bbox")
+        radius = parseNumber("radius", radius) if radius is not None else None
+        if radius is not None and not 0 <= radius <= MAX_RADIUS:
+            raise ValidationError({"radius": "radius는 0 ~ %d m 사이로 입력해야 합니다." % MAX_RADIUS})
+
+        if bbox is not None:
+            values = bbox.split(",")
+            if len(values) != 4:
+                raise ValidationError({"bbox": "bbox는 남,서,북,동 형태로 입력해야 합니다."})
+            south, west, north, east = [parseNumber("bbox", v) for v in values]
+            checkBoundingBox(south, west, north, east)
+            if latitude is None or longitude is None:
+                latitude, longitude = (south + north) / 2, (west + east) / 2
+            return cls(parseNumber("latitude", latitude), parseNumber("longitude", longitude), radius,
+                       (south, west, north, east))
+
+        if latitude is None or longitude is None:
+            return None
+        return cls(parseNumber("latitude", latitude), parseNumber("longitude", longitude),
+                   radius if radius is not None else DEFAULT_RADIUS)
+
+    def rank(self, queryset):
+        '''
+        queryset 중 검색 조건에 맞는 식당을 [(거리(m), id), ...] 형태로 가까운 순(거리가 같으면 id 순)으로 반환합니다.
+
+        ---
+        + (latitude, longitude) index로 위도/경도 범위 안의 식당만 (id, 위도, 경도)로 읽습니다.
+        + 범위 안의 식당의 거리를 NumPy로 한 번에 구하고, radius 밖의 식당을 제외한 뒤 정렬합니다.
+        '''
+        south, west, north, east = self.bbox
+        rows = list(queryset.order_by().filter(latitude__range=(south, north), longitude__range=(west, east))
+                    .values_list("id", "latitude", "longitude"))
+        if not rows:
+            return []
+
+        ids = np.array([row[0] for row in rows])
+        distances = distancesFromPoint(self.latitude, self.longitude, [(row[1], row[2]) for row in rows])
+        if self.radius is not None:
+            inside = distances <= self.radius
+            ids, distances = ids[inside], distances[inside]
+
+        # 거리, id 순으로 정렬합니다.
+        order = np.lexsort((ids, distances))
+        return list(zip(distances[order].tolist(), ids[order].tolist()))
@@ -0,0 +1,192 @@
+# dining/listcache.py
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Restaurant, Review
+
+# 식당 리스트 응답을 cache에 보관하는 시간(초)
+RESTAURANT_LIST_CACHE_TIMEOUT = getattr(settings, "RESTAURANT_LIST_CACHE_TIMEOUT", 60)
+
+
+def versionKey(scope, value):
+    # 역 이름 등 한글 값이 cache key에 그대로 들어가지 않도록 hash 합니다.
+    return "dining:version:%s:%s" % (scope, hashlib.md5(str(value).encode("utf-8")).hexdigest())
+
+
+def currentVersions(scopes):
+    '''
+    scopes에 해당하는 현재 version을 순서대로 반환합니다. version이 없다면 새로 만듭니다.
+    '''
+    keys = [versionKey(scope, value) for scope, value in scopes]
+
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+
+    return [versions[key] for key in keys]
+
+
+def bumpVersions(scopes):
+    '''
+    scopes에 해당하는 version을 새 값으로 바꾸어 이전 version으로 저장된 응답/ETag를 더 이상 사용하지 않도록 합니다.
+
+    ---
+    + transaction 안에서 호출하면 commit 된 뒤에 version을 바꿉니다.
+        + commit 전에 바꾸면 그 사이의 조회가 이전 내용을 새 version으로 cache 하여 commit 후에도 계속 사용하게 됩니다.
+    + transaction 밖에서 호출하면 바로 바꿉니다.
+    '''
+    scopes = set(scopes)
+    if scopes:
+        transaction.on_commit(
+            lambda: cache.set_many({versionKey(scope, value): uuid.uuid4().hex for scope, value in scopes}, None))
+
+
+def restaurantScopes(restaurantId, station, foodCategory, uid):
+    # 식당 하나가 바뀌었을 때 영향을 받는 범위 (식당 상세 / 역의 음식 카테고리 / 음식 카테고리 / 등록한 사용자 / 전체)
+    return [("restaurant", restaurantId), ("station", (station, foodCategory)), ("category", foodCategory),
+            ("uid", uid), ("all", "")]
+
+
+def reviewScopes(reviewId, restaurantId, uid):
+    # 리뷰 하나가 바뀌었을 때 영향을 받는 범위 (리뷰 상세 / 식당별 리뷰 / 사용자별 리뷰 / 전체 리뷰)
+    return [("review", reviewId), ("review-restaurant", restaurantId), ("review-uid", uid), ("review-all", "")]
+
+
+def imageScopes(imageId, restaurantId, reviewId):
+    # 이미지 하나가 바뀌었을 때 영향을 받는 범위 (이미지 상세 / 식당별 이미지 / 리뷰별 이미지 / 전체 이미지)
+    return [("image", imageId), ("image-restaurant", restaurantId), ("image-review", reviewId), ("image-all", "")]
+
+
+# 역 정보는 역 전체를 하나의 version으로 관리합니다.
+STATIONS_SCOPE = ("stations", "")
+
+# 식당과 가까운 역 테이블(RestaurantStation)은 테이블 전체를 하나의 version으로 관리합니다.
+NEARBY_SCOPE = ("nearby", "")
+
+
+def bumpRestaurant(restaurant):
+    bumpVersions(restaurantScopes(restaurant.pk, restaurant.station, restaurant.foodCategory, restaurant.uid_id))
+
+
+def bumpRestaurantIds(restaurantIds):
+    '''
+    Like/Review/Image 등 식당에 딸린 데이터가 바뀌었을 때 해당 식당들이 포함된 응답의 version을 바꿉니다.
+    '''
+    restaurantIds = list(restaurantIds)
+    if not restaurantIds:
+        return
+    scopes = []
+    for row in Restaurant.objects.filter(id__in=restaurantIds).values_list("id", "station", "foodCategory", "uid"):
+        scopes += restaurantScopes(*row)
+    bumpVersions(scopes)
+
+
+def bumpRestaurantDetails(restaurantIds):
+    # 식당 상세 응답의 version만 바꿉니다. (리스트에는 근사값으로 보여도 되는 조회수 등이 바뀐 경우)
+    bumpVersions([("restaurant", restaurantId) for restaurantId in restaurantIds])
+
+
+def bumpReview(review):
+    bumpVersions(reviewScopes(review.pk, review.restaurant_id, review.uid_id))
+    bumpRestaurantIds([review.restaurant_id])
+
+
+def bumpImages(images):
+    '''
+    images : (image id, restaurant id, review id)의 iterable
+
+    ---
+    + 리뷰 응답에는 리뷰 이미지(카테고리, 크기별 URL)가 포함되므로 이미지가 속한 리뷰의 version도 바꿉니다.
+    '''
+    images = list(images)
+    scopes = [scope for image in images for scope in imageScopes(*image)]
+    reviewIds = {reviewId for _, _, reviewId in images if reviewId is not None}
+    if reviewIds:
+        for row in Review.objects.filter(id__in=reviewIds).values_list("id", "restaurant", "uid"):
+            scopes += reviewScopes(*row)
+    bumpVersions(scopes)
+    bumpRestaurantIds({restaurantId for _, restaurantId, _ in images})
+
+
+def bumpUsers(uids):
+    '''
+    사용자 정보(점수, 등록 수)가 바뀌었을 때 그 사용자가 작성한 리뷰가 포함된 응답의 version을 바꿉니다.
+
+    ---
+    + 리뷰 응답에는 작성자 정보가 포함되므로, 작성한 리뷰의 상세 / 식당별 리뷰 / 사용자별 리뷰 / 전체 리뷰 version을 바꿉니다.
+    + 작성자는 쓰기 시에 uid index로 한 번 조회하므로, 조건부 요청의 ETag는 DB 조회 없이 cache만 읽고 만듭니다.
+    '''
+    uids = set(uids)
+    if not uids:
+        return
+    scopes = [("review-uid", uid) for uid in uids]
+    for reviewId, restaurantId in Review.objects.filter(uid__in=uids).values_list("id", "restaurant"):
+        scopes += [("review", reviewId), ("review-restaurant", restaurantId)]
+    bumpVersions(scopes + [("review-all", "")])
+
+
+def bumpStations():
+    bumpVersions([STATIONS_SCOPE])
+
+
+def bumpNearby():
+    bumpVersions([NEARBY_SCOPE])
+
+
+def restaurantListScopes(params):
+    # RestaurantViewSet.list의 조회 조건에 따라 결과가 의존하는 범위를 정합니다.
+    foodCategory, station = params.get("foodCategory"), params.get("station")
+    restaurantName, uid = params.get("restaurantName"), params.get("uid")
+    nearStation = params.get("nearStation")
+    geoSearch = params.get("bbox") is not None or (params.get("latitude") is not None
+                                                   and params.get("longitude") is not None)
+
+    if geoSearch:
+        # 위치 검색은 등록된 역과 관계 없이 (카테고리의) 모든 식당에 의존합니다.
+        return [("category", foodCategory)] if foodCategory is not None else [("all", "")]
+    elif nearStation is not None:
+        # 역 주변 검색은 등록된 역과 관계 없이 (카테고리의) 모든 식당과 가까운 역 테이블에 의존합니다.
+        if foodCategory is not None:
+            return [("category", foodCategory), NEARBY_SCOPE]
+        return [("all", ""), NEARBY_SCOPE]
+    elif restaurantName is not None:
+        # 이름 검색은 입력 받은 범위(역+카테고리 / 카테고리)의 식당에만 의존합니다.
+        if foodCategory is not None and station is not None:
+            return [("station", (station, foodCategory))]
+        elif foodCategory is not None:
+            return [("category", foodCategory)]
+        return [("all", "")]
+    elif foodCategory is not None and station is not None:
+        return [("station", (station, foodCategory))]
+    elif uid is not None:
+        return [("uid", uid)]
+    return [("all", "")]
+
+
+def reviewListScopes(params):
+    # ReviewViewSet.list의 조회 조건에 따라 결과가 의존하는 범위를 정합니다.
+    # 작성자 정보가 바뀌면 bumpUsers에서 작성한 리뷰의 범위를 바꾸므로 작성자 별 범위는 따로 두지 않습니다.
+    uid, restaurantId = params.get("uid"), params.get("restaurant-id")
+
+    if uid is not None:
+        return [("review-uid", uid)]
+    elif restaurantId is not None:
+        return [("review-restaurant", restaurantId)]
+    return [("review-all", "")]
+
+
+def imageListScopes(params):
+    # ImageViewSet.list의 조회 조건에 따라 결과가 의존하는 범위를 정합니다.
+    restaurantId, reviewId = params.get("restaurant-id"), params.get("review-id")
+
+    if restaurantId is not None:
+        return [("image-restaurant", restaurantId)]
+    elif reviewId is not None:
+        return [("image-review", reviewId)]
+    return [("image-all", "")]
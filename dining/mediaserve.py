@@ -0,0 +1,255 @@
+# dining/mediaserve.py
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.views.static import was_modified_since
+
+from .thumbnails import thumbnailPool, variantSource
+
+# 파일 내용의 hash(sha256)를 이름으로 사용하는 파일 : 내용이 바뀌면 이름도 바뀌므로 영구히 cache 해도 됩니다.
+# + 0123...ef.jpg, 0123...ef.thumbnail.webp
+CONTENT_ADDRESSED_PATTERN = re.compile(r"(^|/)[0-9a-f]{64}(\.[0-9a-z]+)+$")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# 그 외의 파일은 max-age 동안 cache 하고, 이후에는 If-Modified-Since로 확인합니다. (단위 : 초)
+MEDIA_CACHE_MAX_AGE = getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)
+
+# nginx의 internal location prefix (ex. "/protected-media/")
+# 설정하면 파일을 직접 읽지 않고 X-Accel-Redirect header로 nginx가 전송하게 합니다. (Range 처리도 nginx가 합니다.)
+MEDIA_ACCEL_REDIRECT = getattr(settings, "MEDIA_ACCEL_REDIRECT", None)
+
+# 없는 크기/형식 별 파일을 요청하면 thumbnailPool에서 만드는 동안 기다리는 최대 시간(초)
+# 그 안에 만들지 못하면 원본으로 redirect 하며, 곧 파일이 만들어지므로 redirect 응답은 짧게 cache 합니다.
+MEDIA_VARIANT_WAIT = getattr(settings, "MEDIA_VARIANT_WAIT", 2)
+PENDING_VARIANT_MAX_AGE = 60
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile:
+    '''
+    파일의 [start, start + length) 구간만 읽는 file 객체
+
+    ---
+    + FileResponse가 구간 밖의 내용을 보내지 않도록 read()에서 남은 길이만큼만 반환합니다.
+    + fileno/name이 없으므로 wsgi.file_wrapper가 파일 전체를 sendfile 하지 않고 read()로 읽습니다.
+    '''
+
+    def __init__(self, f, start, length):
+        self.f = f
+        self.remaining = length
+        f.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.f.close()
+
+
+def parseRange(header, size):
+    '''
+    Range header를 (start, end) 구간(end 포함)으로 바꿉니다.
+
+    ---
+    + 형식이 맞지 않거나 여러 구간을 요청하면 None을 반환합니다. (파일 전체를 전송)
+    + 만족할 수 없는 구간이면 ValueError를 발생시킵니다. (416)
+    '''
+    matches = RANGE_PATTERN.match(header.strip())
+    if matches is None:
+        return None
+    first, last = matches.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # bytes=-500 : 마지막 500 byte
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def cacheControl(path):
+    if CONTENT_ADDRESSED_PATTERN.search(path):
+        return IMMUTABLE_CACHE_CONTROL
+    return "public, max-age=%d" % MEDIA_CACHE_MAX_AGE
+
+
+def serveMedia(request, path):
+    '''
+    MEDIA_ROOT 아래의 파일을 전송하는 view
+
+    ---
+    + 파일을 한 번에 읽지 않고 FileResponse로 나누어 전송합니다. WSGI 서버가 wsgi.file_wrapper를 지원하면 sendfile로 전송합니다.
+    + MEDIA_ACCEL_REDIRECT를 설정하면 X-Accel-Redirect header만 반환하여 worker가 파일 전송에 묶이지 않습니다.
+    + If-None-Match / If-Modified-Since : 파일이 바뀌지 않았다면 304를 반환합니다.
+    + Range : 한 구간의 요청은 206으로 해당 구간만 전송합니다. If-Range가 파일과 다르면 파일 전체를 전송합니다.
+    + hash 이름의 파일은 immutable Cache-Control과 파일 이름으로 만든 ETag를 설정합니다.
+        + 같은 내용을 다시 업로드하면 파일의 수정 시각이 바뀌므로(ContentAddressedStorage) 수정 시각 대신 ETag로 확인합니다.
+    + 크기/형식 별 파일(a.thumbnail.webp 등)이 아직 없으면 thumbnailPool에서 만들고 MEDIA_VARIANT_WAIT 초까지 기다립니다.
+        + 변환은 worker process에서 하고, 같은 파일을 동시에 요청해도 한 번만 만듭니다.
+        + 그 안에 만들지 못하면 원본으로 redirect 합니다. (짧은 Cache-Control)
+    '''
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        statobj = statMedia(fullpath)
+    except VariantPending as pending:
+        return pendingVariantResponse(pending.source)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("'%s' does not exist" % path)
+    if not stat.S_ISREG(statobj.st_mode):
+        raise Http404("'%s' does not exist" % path)
+
+    lastModified = http_date(statobj.st_mtime)
+    etag = contentETag(path)
+    if notModified(request, statobj, etag):
+        response = HttpResponseNotModified()
+        response["Last-Modified"] = lastModified
+        response["Cache-Control"] = cacheControl(path)
+        if etag is not None:
+            response["ETag"] = etag
+        return response
+
+    contentType, encoding = mimetypes.guess_type(fullpath)
+    contentType = contentType or "application/octet-stream"
+
+    if MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse(content_type=contentType)
+        # header에는 ASCII만 쓸 수 있고 nginx는 URI로 해석하므로, 한글/공백 등이 들어간 파일 이름은 percent-encode 합니다.
+        response["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + quote(path)
+    else:
+        response = rangeResponse(request, fullpath, statobj, contentType, etag)
+
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Last-Modified"] = lastModified
+    response["Cache-Control"] = cacheControl(path)
+    response["Accept-Ranges"] = "bytes"
+    if etag is not None:
+        response["ETag"] = etag
+    return response
+
+
+def contentETag(path):
+    # hash 이름의 파일은 이름이 같으면 내용도 같으므로 파일 이름으로 ETag를 만듭니다. 그 외의 파일은 None을 반환합니다.
+    if CONTENT_ADDRESSED_PATTERN.search(path):
+        return '"%s"' % posixpath.basename(path)
+    return None
+
+
+def notModified(request, statobj, etag):
+    '''
+    조건부 요청(If-None-Match, If-Modified-Since)에 304로 응답할 수 있는지 확인합니다.
+
+    ---
+    + hash 이름의 파일(etag가 있는 경우)
+        + If-None-Match가 있으면 ETag로만 비교합니다.
+        + If-Modified-Since만 있으면 날짜와 관계 없이 바뀌지 않은 것으로 봅니다. (이름이 같으면 내용도 같습니다.)
+    + 그 외의 파일은 If-Modified-Since를 파일의 수정 시각과 비교합니다.
+    '''
+    if etag is None:
+        return not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), statobj.st_mtime, statobj.st_size)
+    ifNoneMatch = request.META.get("HTTP_IF_NONE_MATCH")
+    if ifNoneMatch is not None:
+        etags = [tag[2:] if tag.startswith("W/") else tag for tag in parse_etags(ifNoneMatch)]
+        return etag in etags or "*" in etags
+    return request.META.get("HTTP_IF_MODIFIED_SINCE") is not None
+
+
+class VariantPending(Exception):
+    # 크기/형식 별 파일을 기다리는 시간 안에 만들지 못한 경우, source : 원본 파일 경로
+
+    def __init__(self, source):
+        super().__init__(source)
+        self.source = source
+
+
+def statMedia(fullpath):
+    # 파일이 없고 크기/형식 별 파일 경로라면 원본으로 만드는 작업을 pool에 넘기고 기다린 뒤 다시 확인합니다.
+    try:
+        return os.stat(fullpath)
+    except FileNotFoundError:
+        source = variantSource(fullpath)
+        if source is None:
+            raise
+    future = thumbnailPool.submit(os.path.relpath(source, settings.MEDIA_ROOT))
+    if future is None:
+        raise VariantPending(source)
+    try:
+        future.result(timeout=MEDIA_VARIANT_WAIT)
+    except FutureTimeoutError:
+        raise VariantPending(source)
+    except Exception:
+        # 원본이 이미지가 아니거나 깨진 경우
+        raise FileNotFoundError(fullpath)
+    return os.stat(fullpath)
+
+
+def pendingVariantResponse(source):
+    name = os.path.relpath(source, settings.MEDIA_ROOT).replace(os.sep, "/")
+    response = HttpResponseRedirect(settings.MEDIA_URL + quote(name))
+    response["Cache-Control"] = "public, max-age=%d" % PENDING_VARIANT_MAX_AGE
+    return response
+
+
+def rangeResponse(request, fullpath, statobj, contentType, etag=None):
+    size = statobj.st_size
+    header = request.META.get("HTTP_RANGE")
+    ifRange = request.META.get("HTTP_IF_RANGE")
+    # If-Range가 현재 파일과 다르면 파일이 바뀐 것이므로 Range를 무시합니다.
+    if header and ifRange and not rangeMatches(ifRange, statobj, etag):
+        header = None
+
+    try:
+        byteRange = parseRange(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = "bytes */%d" % size
+        return response
+
+    if byteRange is None:
+        return FileResponse(open(fullpath, "rb"), content_type=contentType)
+
+    start, end = byteRange
+    length = end - start + 1
+    response = FileResponse(RangeFile(open(fullpath, "rb"), start, length), status=206, content_type=contentType)
+    response["Content-Length"] = length
+    response["Content-Range"] = "bytes %d-%d/%d" % (start, end, size)
+    return response
+
+
+def rangeMatches(ifRange, statobj, etag):
+    '''
+    If-Range(ETag 또는 날짜)가 현재 파일과 같은지 확인합니다.
+
+    ---
+    + ETag는 weak ETag가 아닌 같은 ETag일 때만 같다고 봅니다.
+    + hash 이름의 파일은 날짜와 관계 없이 같다고 봅니다. 그 외의 파일은 날짜를 파일의 수정 시각과 비교합니다.
+    '''
+    if ifRange.startswith(('"', "W/")):
+        return etag is not None and ifRange == etag
+    return etag is not None or parse_http_date_safe(ifRange) == int(statobj.st_mtime)
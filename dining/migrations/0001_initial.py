@@ -0,0 +1,114 @@
+# Generated by Django 2.1.1 on 2026-10-18 17:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Image',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='dining/%Y/%m/%d')),
+                ('category', models.IntegerField(blank=True, default=-1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Restaurant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('restaurantName', models.CharField(max_length=20)),
+                ('foodCategory', models.CharField(max_length=20)),
+                ('station', models.CharField(max_length=20)),
+                ('longitude', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('distFromStation', models.FloatField(blank=True)),
+                ('operatingHours', models.CharField(blank=True, max_length=50)),
+                ('searchNum', models.IntegerField(default=0)),
+                ('likeNum', models.IntegerField(default=0)),
+                ('reviewNum', models.IntegerField(default=0)),
+                ('representativeImage', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Review',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Restaurant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(max_length=15)),
+                ('longitude', models.FloatField()),
+                ('latitude', models.FloatField()),
+                ('distFromStation', models.FloatField(blank=True, default=-1)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Users',
+            fields=[
+                ('uid', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('nickname', models.CharField(max_length=50)),
+                ('profileImageLink', models.ImageField(blank=True, default='profile/defaultProfile.jpg', upload_to='profile/%Y/%m/%d')),
+                ('createdLikeNum', models.IntegerField(blank=True, default=0)),
+                ('createdReviewNum', models.IntegerField(blank=True, default=0)),
+                ('createdRestaurantNum', models.IntegerField(blank=True, default=0)),
+                ('score', models.IntegerField(blank=True, default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='uid',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Users'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='uid',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Users'),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='uid',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Users'),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='dining.Restaurant'),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reviewImages', to='dining.Review'),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='uid',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dining.Users'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 2.1.1 on 2026-10-18 17:10
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+# dining.counters.LIKE_SCORE : 좋아요 하나를 등록할 때 사용자가 얻은 점수 (migration은 app 코드를 import 하지 않습니다.)
+LIKE_SCORE = 1
+
+
+def removeDuplicateLikes(apps, schema_editor):
+    '''
+    (uid, restaurant) 중복 좋아요는 가장 먼저 등록된 것만 남기고 삭제합니다.
+
+    ---
+    + 삭제한 좋아요가 있던 식당의 likeNum과 사용자의 createdLikeNum은 남은 좋아요 갯수로 다시 셉니다.
+    + 사용자의 score는 다른 활동의 점수도 포함하므로, 삭제한 좋아요 하나 당 LIKE_SCORE씩 뺍니다.
+    '''
+    Like = apps.get_model('dining', 'Like')
+    Restaurant = apps.get_model('dining', 'Restaurant')
+    Users = apps.get_model('dining', 'Users')
+    duplicates = (Like.objects.values('uid', 'restaurant')
+                  .annotate(firstId=Min('id'), likeCount=Count('id'))
+                  .filter(likeCount__gt=1))
+
+    removedByUser, restaurantIds = {}, set()
+    for d in duplicates:
+        Like.objects.filter(uid=d['uid'], restaurant=d['restaurant']).exclude(id=d['firstId']).delete()
+        removedByUser[d['uid']] = removedByUser.get(d['uid'], 0) + d['likeCount'] - 1
+        restaurantIds.add(d['restaurant'])
+
+    for restaurantId in restaurantIds:
+        Restaurant.objects.filter(id=restaurantId).update(likeNum=Like.objects.filter(restaurant=restaurantId).count())
+    for uid, removed in removedByUser.items():
+        Users.objects.filter(uid=uid).update(createdLikeNum=Like.objects.filter(uid=uid).count(),
+                                             score=F('score') - removed * LIKE_SCORE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(removeDuplicateLikes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('uid', 'restaurant')},
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['restaurant', 'category'], name='image_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['foodCategory', 'station', 'likeNum'], name='restaurant_like_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['foodCategory', 'station', 'reviewNum'], name='restaurant_review_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['foodCategory', 'station', 'searchNum'], name='restaurant_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['foodCategory', 'station', 'distFromStation'], name='restaurant_dist_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['restaurant', 'created_at'], name='review_restaurant_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['uid', 'created_at'], name='review_uid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='station',
+            index=models.Index(fields=['station'], name='station_station_idx'),
+        ),
+    ]
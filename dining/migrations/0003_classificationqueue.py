@@ -0,0 +1,22 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationQueue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('image', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='dining.Image')),
+            ],
+        ),
+    ]
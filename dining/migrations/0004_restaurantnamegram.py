@@ -0,0 +1,54 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from dining.namesearch import nameGrams
+
+
+def indexRestaurantNames(apps, schema_editor, chunkSize=1000):
+    # 기존 식당 이름의 n-gram을 id 순으로 chunkSize 개씩 저장합니다. (전체 gram을 한 번에 메모리에 만들지 않습니다.)
+    Restaurant = apps.get_model('dining', 'Restaurant')
+    RestaurantNameGram = apps.get_model('dining', 'RestaurantNameGram')
+    lastId = 0
+    while True:
+        rows = list(Restaurant.objects.filter(id__gt=lastId).order_by('id')
+                    .values_list('id', 'restaurantName', 'foodCategory', 'station')[:chunkSize])
+        if not rows:
+            break
+        RestaurantNameGram.objects.bulk_create(
+            [RestaurantNameGram(gram=gram, position=position, restaurant_id=restaurantId,
+                                foodCategory=foodCategory, station=station)
+             for restaurantId, name, foodCategory, station in rows
+             for position, gram in nameGrams(name)], batch_size=2000)
+        lastId = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0003_classificationqueue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantNameGram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=2)),
+                ('position', models.SmallIntegerField()),
+                ('foodCategory', models.CharField(max_length=20)),
+                ('station', models.CharField(max_length=20)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nameGrams', to='dining.Restaurant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='restaurantnamegram',
+            index=models.Index(fields=['gram', 'foodCategory', 'station'], name='namegram_scope_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantnamegram',
+            index=models.Index(fields=['gram', 'station'], name='namegram_station_idx'),
+        ),
+        migrations.RunPython(indexRestaurantNames, migrations.RunPython.noop),
+    ]
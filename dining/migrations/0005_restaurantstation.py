@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0004_restaurantnamegram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantStation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(max_length=20)),
+                ('distance', models.FloatField()),
+                ('rank', models.SmallIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nearbyStations', to='dining.Restaurant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='restaurantstation',
+            index=models.Index(fields=['station', 'distance'], name='restaurantstation_dist_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='restaurantstation',
+            unique_together={('restaurant', 'station')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:31
+
+import dining.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0006_restaurant_location_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(storage=dining.storage.ContentAddressedStorage(), upload_to='dining/%Y/%m/%d'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['image'], name='image_name_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.1.15 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dining', '0007_image_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='confidences',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='modelVersion',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -2,6 +2,7 @@
 from django.db import models
 from .utils import dist
 from .media_directory import *
+from .storage import contentAddressedStorage
 from django.db import models
 
 
@@ -62,8 +63,71 @@ class Restaurant(models.Model):
     # 대표 사진 1장의 URL
     representativeImage = models.TextField(blank=True)
 
-    # class Meta:
-    #     ordering = ('-id',)
+    class Meta:
+        # ordering = ('-id',)
+
+        # foodCategory/station으로 조회한 뒤 각 정렬 기준(-id 포함)으로 정렬하는 목록 조회용 index
+        indexes = [
+            models.Index(fields=['foodCategory', 'station', 'likeNum'], name='restaurant_like_idx'),
+            models.Index(fields=['foodCategory', 'station', 'reviewNum'], name='restaurant_review_idx'),
+            models.Index(fields=['foodCategory', 'station', 'searchNum'], name='restaurant_search_idx'),
+            models.Index(fields=['foodCategory', 'station', 'distFromStation'], name='restaurant_dist_idx'),
+            # 위도/경도 범위로 주변 식당을 찾기 위한 index
+            models.Index(fields=['latitude', 'longitude'], name='restaurant_location_idx'),
+        ]
+
+
+# 식당과 가까운 역 테이블 : 식당마다 가장 가까운 역 K개와 거리를 저장합니다.
+class RestaurantStation(models.Model):
+    ## required field
+
+    # restaurant에 대한 foreign key
+    restaurant = models.ForeignKey(Restaurant,
+                                   related_name="nearbyStations",
+                                   on_delete=models.CASCADE)
+
+    # station : 역 이름 (Restaurant.station과 같은 형식)
+    station = models.CharField(max_length=20)
+
+    # distance : 식당과 역 사이의 직선 거리 (단위 : m)
+    distance = models.FloatField()
+
+    # rank : 식당에서 가까운 역 순위 (0이면 가장 가까운 역)
+    rank = models.SmallIntegerField()
+
+    class Meta:
+        unique_together = ('restaurant', 'station')
+        # 역에서 거리 R 이내의 식당을 찾기 위한 index
+        indexes = [
+            models.Index(fields=['station', 'distance'], name='restaurantstation_dist_idx'),
+        ]
+
+
+# 식당 이름 검색용 n-gram 테이블 : 식당 이름의 글자(1-gram)/두 글자(2-gram)마다 한 row를 저장합니다.
+class RestaurantNameGram(models.Model):
+    ## required field
+
+    # gram : 식당 이름(소문자)의 한 글자 또는 연속된 두 글자
+    gram = models.CharField(max_length=2)
+
+    # position : 식당 이름에서 gram이 시작하는 위치 (0이면 이름의 맨 앞)
+    position = models.SmallIntegerField()
+
+    # restaurant에 대한 foreign key
+    restaurant = models.ForeignKey(Restaurant,
+                                   related_name="nameGrams",
+                                   on_delete=models.CASCADE)
+
+    # foodCategory/station : 카테고리/역 범위로 검색하기 위해 식당의 값을 함께 저장합니다.
+    foodCategory = models.CharField(max_length=20)
+    station = models.CharField(max_length=20)
+
+    class Meta:
+        # gram으로 조회한 뒤 카테고리/역으로 범위를 좁히는 검색용 index
+        indexes = [
+            models.Index(fields=['gram', 'foodCategory', 'station'], name='namegram_scope_idx'),
+            models.Index(fields=['gram', 'station'], name='namegram_station_idx'),
+        ]
 
 
 # 리뷰 테이블
@@ -83,6 +147,13 @@ class Review(models.Model):
     # created_at : 리뷰를 등록한 시점
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # 식당별/사용자별 리뷰를 최신순으로 조회하기 위한 index
+        indexes = [
+            models.Index(fields=['restaurant', 'created_at'], name='review_restaurant_idx'),
+            models.Index(fields=['uid', 'created_at'], name='review_uid_idx'),
+        ]
+
 
 
 # 식당에 대한 "좋아요" 선택 유무를 저장하는 테이블
@@ -95,13 +166,17 @@ class Like(models.Model):
     # restaurant : 식당 ID
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
 
+    class Meta:
+        # 한 사용자는 한 식당에 한 번만 좋아요를 할 수 있습니다.
+        unique_together = (('uid', 'restaurant'),)
+
 
 # 이미지 테이블
 class Image(models.Model):
     ## required field
 
-    # image : 음식/메뉴/식당 사진
-    image = models.ImageField(upload_to="dining/%Y/%m/%d")
+    # image : 음식/메뉴/식당 사진, 내용의 hash를 이름으로 저장하여 같은 사진은 파일 하나를 공유합니다.
+    image = models.ImageField(upload_to="dining/%Y/%m/%d", storage=contentAddressedStorage)
 
     # restaurant에 대한 foreign key
     restaurant = models.ForeignKey(Restaurant,
@@ -122,9 +197,34 @@ class Image(models.Model):
     # category : 0이면 food, 1이면 menu, 2이면 restaurant
     category = models.IntegerField(blank=True, default=-1)
 
+    # modelVersion : 현재 category를 정한 분류 모델의 version (모델 파일 hash의 앞부분)
+    modelVersion = models.CharField(max_length=40, blank=True, default="")
+
+    # confidences : 분류 모델이 출력한 category 별 확률, JSON 배열 ex) "[0.91, 0.06, 0.03]"
+    confidences = models.TextField(blank=True, default="")
+
     # created_at : 등록한 시점
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # 식당별 카테고리(음식/메뉴/식당) 이미지 조회용 index
+        indexes = [
+            models.Index(fields=['restaurant', 'category'], name='image_restaurant_idx'),
+            # 같은 파일(hash 이름)의 분류 결과 조회용 index
+            models.Index(fields=['image'], name='image_name_idx'),
+        ]
+
+
+# 분류 대기열 테이블 : 새로 등록된 이미지를 분류 worker가 가져갈 때까지 저장합니다.
+class ClassificationQueue(models.Model):
+    ## required field
+
+    # image : 분류할 이미지
+    image = models.OneToOneField(Image, on_delete=models.CASCADE)
+
+    # created_at : 대기열에 등록된 시점
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class Station(models.Model):
     ## required fields
@@ -140,4 +240,10 @@ class Station(models.Model):
 
     ## Non required fields
     # distFromStation : 입력 받은 GPS와 역과의 거리를 저장할 필드
-    distFromStation = models.FloatField(blank=True, default=-1)
\ No newline at end of file
+    distFromStation = models.FloatField(blank=True, default=-1)
+
+    class Meta:
+        # 역 이름으로 조회하기 위한 index
+        indexes = [
+            models.Index(fields=['station'], name='station_station_idx'),
+        ]
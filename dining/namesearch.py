@@ -0,0 +1,105 @@
+# dining/namesearch.py
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Restaurant, RestaurantNameGram
+
+# 식당 이름 검색 방식 : 이름 중 일부(contains) / 이름의 앞부분(prefix)
+CONTAINS = "contains"
+PREFIX = "prefix"
+
+
+def normalize(text):
+    # 영문 대소문자를 구분하지 않고 검색하도록 소문자로 바꿉니다.
+    return text.lower()
+
+
+def nameGrams(name):
+    '''
+    식당 이름의 (위치, gram) 목록을 반환합니다.
+
+    ---
+    + 한 글자(1-gram)와 연속된 두 글자(2-gram)를 모두 저장하므로 한 글자 검색도 index로 찾을 수 있습니다.
+    '''
+    name = normalize(name)
+    return [(i, name[i:i + n]) for n in (1, 2) for i in range(len(name) - n + 1)]
+
+
+def queryGrams(query):
+    # 검색어가 두 글자 이상이면 2-gram, 한 글자이면 1-gram으로 찾습니다.
+    query = normalize(query)
+    if len(query) < 2:
+        return {query} if query else set()
+    return {query[i:i + 2] for i in range(len(query) - 1)}
+
+
+def buildGrams(restaurant):
+    return [RestaurantNameGram(gram=gram, position=position, restaurant_id=restaurant.pk,
+                               foodCategory=restaurant.foodCategory, station=restaurant.station)
+            for position, gram in nameGrams(restaurant.restaurantName)]
+
+
+def indexRestaurant(restaurant):
+    # 식당의 n-gram을 지우고 현재 이름/카테고리/역으로 다시 저장합니다.
+    with transaction.atomic():
+        RestaurantNameGram.objects.filter(restaurant_id=restaurant.pk).delete()
+        RestaurantNameGram.objects.bulk_create(buildGrams(restaurant))
+
+
+def rebuildIndex(chunkSize=1000, log=print):
+    '''
+    전체 식당의 n-gram을 id 순으로 chunkSize 개씩 다시 만듭니다.
+    '''
+    lastId, indexed = 0, 0
+    while True:
+        restaurants = list(Restaurant.objects.filter(id__gt=lastId).order_by("id")
+                           .only("id", "restaurantName", "foodCategory", "station")[:chunkSize])
+        if not restaurants:
+            break
+        ids = [restaurant.id for restaurant in restaurants]
+        with transaction.atomic():
+            RestaurantNameGram.objects.filter(restaurant_id__in=ids).delete()
+            RestaurantNameGram.objects.bulk_create(
+                [gram for restaurant in restaurants for gram in buildGrams(restaurant)], batch_size=2000)
+
+        indexed += len(restaurants)
+        lastId = ids[-1]
+        log("indexed %d restaurants" % indexed)
+    return indexed
+
+
+def searchIds(query, foodCategory=None, station=None, mode=CONTAINS):
+    '''
+    식당 이름에 검색어가 포함된(mode=prefix이면 검색어로 시작하는) 식당 id 후보를 조회하는 queryset을 반환합니다.
+
+    ---
+    + 조회하지 않은 queryset을 반환하므로 searchQuerySet에서 subquery(id IN (SELECT ...))로 사용됩니다.
+        + ETag/cache로 응답하는 요청에서는 n-gram 테이블을 조회하지 않습니다.
+    + 검색어의 모든 gram을 가진 식당만 n-gram 테이블의 index로 찾으므로 조회 비용이 전체 식당 수가 아닌 결과 수에 비례합니다.
+    + foodCategory/station을 입력하면 해당 범위 안에서만 찾습니다.
+    + gram 순서까지는 확인하지 않으므로, 최종 결과는 searchQuerySet에서 이름으로 한 번 더 확인합니다.
+    '''
+    grams = queryGrams(query)
+    if not grams:
+        return RestaurantNameGram.objects.none().values_list("restaurant", flat=True)
+
+    postings = RestaurantNameGram.objects.filter(gram__in=grams)
+    if foodCategory is not None:
+        postings = postings.filter(foodCategory=foodCategory)
+    if station is not None:
+        postings = postings.filter(station=station)
+    if mode == PREFIX:
+        # 검색어의 첫 gram이 이름의 맨 앞에 있는 식당만 찾습니다.
+        first = normalize(query)[:2]
+        postings = postings.filter(restaurant__in=postings.filter(gram=first, position=0).values("restaurant"))
+
+    return (postings.values("restaurant").annotate(n=Count("gram", distinct=True)).filter(n=len(grams))
+            .order_by().values_list("restaurant", flat=True))
+
+
+def searchQuerySet(queryset, query, foodCategory=None, station=None, mode=CONTAINS):
+    # n-gram으로 찾은 후보 중 실제로 이름이 검색어를 포함하는(검색어로 시작하는) 식당만 남깁니다.
+    queryset = queryset.filter(id__in=searchIds(query, foodCategory, station, mode))
+    if mode == PREFIX:
+        return queryset.filter(restaurantName__istartswith=query)
+    return queryset.filter(restaurantName__icontains=query)
@@ -0,0 +1,121 @@
+# dining/nearby.py
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .distance import pairwiseDistances
+from .models import Restaurant, RestaurantStation
+from .spatial import stationIndex
+from . import listcache
+
+# 식당마다 저장해 두는 가까운 역의 갯수
+NEARBY_STATION_NUM = getattr(settings, "NEARBY_STATION_NUM", 5)
+
+# 역 주변 검색의 기본 반경 (단위 : m), 역의 coverage가 더 작으면 coverage를 사용합니다.
+NEAR_STATION_RADIUS = 1000
+
+
+def nearestStations(points, stations, k=NEARBY_STATION_NUM):
+    '''
+    여러 식당 각각에서 가장 가까운 역 k개를 한 번의 행렬 연산으로 구합니다.
+
+    ---
+    + points : [(위도, 경도), ...] 형태의 N x 2 배열
+    + stations : [(id, station, latitude, longitude), ...]
+    + (N x k 역 index, N x k 거리(m)) 를 가까운 순으로 반환합니다.
+    '''
+    k = min(k, len(stations))
+    distances = pairwiseDistances(points, [(s[2], s[3]) for s in stations])
+
+    # 행마다 가장 작은 k개를 먼저 고른 뒤, 그 k개만 정렬합니다.
+    nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < len(stations) \
+        else np.tile(np.arange(k), (len(distances), 1))
+    nearestDistances = np.take_along_axis(distances, nearest, axis=1)
+    order = np.argsort(nearestDistances, axis=1)
+    return np.take_along_axis(nearest, order, axis=1), np.take_along_axis(nearestDistances, order, axis=1)
+
+
+def buildRows(restaurantIds, points, stations, k=NEARBY_STATION_NUM):
+    indices, distances = nearestStations(points, stations, k)
+    return [RestaurantStation(restaurant_id=restaurantId, station=stations[i][1], distance=distance, rank=rank)
+            for restaurantId, rowIndices, rowDistances in zip(restaurantIds, indices.tolist(), distances.tolist())
+            for rank, (i, distance) in enumerate(zip(rowIndices, rowDistances))]
+
+
+def updateNearbyStations(restaurant, k=NEARBY_STATION_NUM):
+    # 식당 하나의 가까운 역 k개를 최근접 역 인덱스로 찾아 다시 저장합니다.
+    nearest = stationIndex.nearest(restaurant.latitude, restaurant.longitude, k)
+    rows = [RestaurantStation(restaurant_id=restaurant.pk, station=station[1], distance=distance, rank=rank)
+            for rank, (distance, station) in enumerate(nearest)]
+
+    with transaction.atomic():
+        RestaurantStation.objects.filter(restaurant_id=restaurant.pk).delete()
+        RestaurantStation.objects.bulk_create(rows)
+    listcache.bumpNearby()
+
+
+def rebuildNearbyStations(chunkSize=1000, k=NEARBY_STATION_NUM, log=print):
+    '''
+    전체 식당의 가까운 역 테이블을 id 순으로 chunkSize 개씩 다시 만듭니다.
+
+    ---
+    + chunk 마다 식당 x 역 거리 행렬을 NumPy로 한 번에 구하고, bulk_create로 저장합니다.
+    + 역 정보가 바뀐 뒤(stationSetting.py 실행 등)에도 실행하여 다시 맞춥니다.
+    '''
+    stations = stationIndex.stations()
+    if not stations:
+        return 0
+
+    lastId, updated = 0, 0
+    while True:
+        rows = list(Restaurant.objects.filter(id__gt=lastId).order_by("id")
+                    .values_list("id", "latitude", "longitude")[:chunkSize])
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+
+        with transaction.atomic():
+            RestaurantStation.objects.filter(restaurant_id__in=ids).delete()
+            RestaurantStation.objects.bulk_create(
+                buildRows(ids, [(row[1], row[2]) for row in rows], stations, k), batch_size=2000)
+
+        updated += len(rows)
+        lastId = ids[-1]
+        log("updated %d restaurants" % updated)
+
+    listcache.bumpNearby()
+    return updated
+
+
+def stationCoverage(station, k=NEARBY_STATION_NUM):
+    '''
+    가까운 역 테이블로 빠짐없이 찾을 수 있는 station 주변의 최대 거리(m)를 반환합니다. 없는 역이면 None을 반환합니다.
+
+    ---
+    + 식당마다 가까운 역 k개만 저장하므로, station보다 가까운 역이 k개 이상인 식당의 row에는 station이 없습니다.
+    + station에서 r 이내에 있는 식당에서 station보다 가까운 역은 모두 station에서 2r 이내에 있습니다.
+      따라서 r이 station과 k번째로 가까운 다른 역 사이 거리의 절반 이하이면 station은 항상 식당의 가까운 역 k개에 포함됩니다.
+    + 역 사이의 거리는 별도 테이블 없이 최근접 역 인덱스(stationIndex)로 구합니다.
+    + 다른 역이 k개보다 적으면 모든 역이 저장되므로 제한이 없습니다. (inf)
+    '''
+    location = next(((s[2], s[3]) for s in stationIndex.stations() if s[1] == station), None)
+    if location is None:
+        return None
+    others = [distance for distance, s in stationIndex.nearest(location[0], location[1], k + 1) if s[1] != station]
+    return others[k - 1] / 2 if len(others) >= k else float("inf")
+
+
+def restaurantsNearStation(queryset, station, radius):
+    '''
+    station에서 radius(m) 이내에 있는 식당을 역과 가까운 순으로 반환합니다.
+
+    ---
+    + 가까운 역 테이블의 (station, distance) index로 찾으므로 식당이 등록된 역(Restaurant.station)과 관계 없이 찾습니다.
+    + radius가 stationCoverage(station)보다 크면 빠지는 식당이 있으므로, 호출하기 전에 radius를 확인합니다.
+    + 식당과 역 사이의 거리는 distance로 annotate 하여 응답에 함께 반환합니다.
+    '''
+    nearby = RestaurantStation.objects.filter(station=station, distance__lte=radius)
+    return (queryset.filter(id__in=nearby.values("restaurant"))
+            .annotate(distance=Subquery(nearby.filter(restaurant=OuterRef("pk")).values("distance")[:1]))
+            .order_by("distance", "-id"))
@@ -1,8 +1,198 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import bisect
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .geosearch import GeoQuery
+
 
 class RestaurantPageNumberPagination(PageNumberPagination):
     page_size = 20
 
 
 class ReviewPageNumberPagination(PageNumberPagination):
-    page_size = 20
\ No newline at end of file
+    page_size = 20
+
+
+class KeysetPagination(BasePagination):
+    '''
+    정렬 기준 값으로 다음 페이지의 시작 위치를 찾는 keyset(cursor) pagination
+
+    ---
+    + COUNT(*)와 OFFSET 없이 `WHERE (정렬 기준) < (마지막 row의 값) ORDER BY ... LIMIT n` 으로 조회하므로
+      뒤 페이지로 갈수록 느려지지 않습니다.
+    + queryset의 정렬 기준 마지막에 id를 붙여 정렬 기준 값이 같은 row가 있어도 순서가 고정되도록 합니다.
+    + cursor는 마지막 row의 정렬 기준 값을 base64로 인코딩한 문자열이며 다음 페이지 방향으로만 이동합니다.
+        + cursor의 값은 정렬 기준 field의 형식으로 바꾸어 사용하며, 바꿀 수 없으면 404를 반환합니다.
+    '''
+    page_size = 20
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # queryset에 정렬 기준이 없을 때 사용할 정렬 기준
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.ordering = self.getOrdering(queryset)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decodeCursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.keysetFilter(cursor))
+
+        # 다음 페이지가 있는지 확인하기 위해 한 개를 더 가져옵니다.
+        results = list(queryset[:self.page_size + 1])
+        self.hasNext = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        self.nextCursor = None
+        if self.hasNext:
+            self.nextCursor = self.encodeCursor([getattr(results[-1], field.lstrip('-')) for field in self.ordering])
+
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if self.nextCursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.nextCursor)
+
+    def getOrdering(self, queryset):
+        # queryset의 정렬 기준을 사용하고, 마지막 정렬 기준이 id가 아니라면 id를 붙여 순서를 고정합니다.
+        ordering = tuple(queryset.query.order_by) or tuple(self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id',)
+        return ordering
+
+    def keysetFilter(self, values):
+        '''
+        (f1, f2, ..., id) > (v1, v2, ..., vn) 조건을 Q로 만듭니다.
+
+        ---
+        + f1 < v1 OR (f1 = v1 AND f2 < v2) OR ... 형태이며, 내림차순 field는 <, 오름차순 field는 > 로 비교합니다.
+        '''
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = '%s__lt' % name if field.startswith('-') else '%s__gt' % name
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encodeCursor(self, values):
+        # 날짜는 microsecond까지 보존되도록 isoformat으로 저장합니다.
+        values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def decodeCursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [self.cursorValue(field, value) for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursorValue(self, field, value):
+        # cursor 값을 정렬 기준 field의 형식(int, datetime 등)으로 바꿉니다. 형식이 맞지 않으면 예외를 발생시킵니다.
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise TypeError(value)
+        name = field.lstrip('-')
+        try:
+            modelField = self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # annotate 한 값 등 model field가 아닌 정렬 기준
+            return value
+        return modelField.to_python(value)
+
+
+class RestaurantKeysetPagination(KeysetPagination):
+    page_size = 20
+    ordering = ('-likeNum', '-id')
+
+
+class ReviewKeysetPagination(KeysetPagination):
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class GeoKeysetPagination(KeysetPagination):
+    '''
+    위치 검색 결과를 거리 순으로 나누는 keyset(cursor) pagination
+
+    ---
+    + 요청의 latitude/longitude/radius/bbox 파라미터로 GeoQuery를 만들어 범위 안의 식당을 (거리, id) 순으로 정렬합니다.
+    + cursor는 마지막 식당의 (거리, id)이며, 정렬된 목록에서 cursor 다음 위치부터 page_size개를 가져옵니다.
+    + 페이지에 해당하는 식당만 id로 조회하며, 각 식당에 distance(m)를 담아 반환합니다. (serializer의 distance field)
+    + 검색 범위는 GeoQuery에서 MAX_RADIUS로 제한하므로 페이지마다 다시 정렬하는 식당 수에도 상한이 있습니다.
+    '''
+    page_size = 20
+    ordering = ('distance', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        ranked = GeoQuery.fromParams(request.query_params).rank(queryset)
+
+        cursor = self.decodeCursor(request)
+        start = bisect.bisect_right(ranked, tuple(cursor)) if cursor is not None else 0
+        page = ranked[start:start + self.page_size]
+        self.hasNext = start + self.page_size < len(ranked)
+        self.nextCursor = self.encodeCursor(list(page[-1])) if self.hasNext else None
+
+        # 페이지에 해당하는 식당만 조회하여 거리 순서대로 돌려줍니다.
+        restaurants = {r.id: r for r in queryset.filter(id__in=[pk for _, pk in page])}
+        results = []
+        for distance, pk in page:
+            if pk in restaurants:
+                restaurants[pk].distance = distance
+                results.append(restaurants[pk])
+        return results
+
+    def decodeCursor(self, request):
+        # cursor는 (거리, id)이므로 숫자가 아니면 정렬된 목록과 비교할 수 없습니다.
+        values = super().decodeCursor(request)
+        if values is not None and not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+
+class KeysetPaginationMixin:
+    '''
+    `paging=cursor` 파라미터로 요청한 경우에만 keyset_pagination_class를 사용하도록 하는 ViewSet mixin
+
+    ---
+    + 파라미터가 없는 기존 클라이언트는 pagination_class(page 번호 방식)를 그대로 사용합니다.
+    '''
+    keyset_pagination_class = None
+    paging_query_param = 'paging'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.keyset_pagination_class is not None:
+            if self.request is not None and self.request.query_params.get(self.paging_query_param) == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+        return super().paginator
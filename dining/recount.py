@@ -0,0 +1,108 @@
+# dining/recount.py
+from django.db import transaction
+from django.db.models import Count
+
+from .bulk import bulkIncrementById
+from .models import Restaurant, Like, Review, Users
+from . import listcache
+
+# Restaurant의 likeNum/reviewNum : {카운터 field: (갯수를 셀 Model, Restaurant를 가리키는 field)}
+RESTAURANT_COUNTERS = {
+    "likeNum": (Like, "restaurant_id"),
+    "reviewNum": (Review, "restaurant_id"),
+}
+
+# Users의 createdLikeNum/createdReviewNum/createdRestaurantNum
+USER_COUNTERS = {
+    "createdLikeNum": (Like, "uid_id"),
+    "createdReviewNum": (Review, "uid_id"),
+    "createdRestaurantNum": (Restaurant, "uid_id"),
+}
+
+
+def countBy(model, field, ids):
+    '''
+    field가 ids에 포함되는 row 수를 GROUP BY 한 번으로 세어 {id: 갯수} 형태로 반환합니다.
+    '''
+    return dict(model.objects.filter(**{field + "__in": ids}).values(field).annotate(n=Count("id"))
+                .order_by().values_list(field, "n"))
+
+
+def recountCounters(model, counters, chunkSize=1000, onChange=None):
+    '''
+    model의 카운터 field들을 실제 row 갯수로 다시 맞춥니다.
+
+    ---
+    + model을 pk 순으로 chunkSize 개씩 읽고, chunk에 해당하는 갯수를 카운터 별 GROUP BY 쿼리 한 번으로 구합니다.
+    + 값이 다른 row만 (실제 갯수 - 저장된 값) 만큼 bulk UPDATE로 더하므로, 실행 중에 증가/감소한 값이 유실되지 않습니다.
+    + 한 번에 chunkSize 개의 row만 메모리에 올리므로 전체 데이터 크기와 관계 없이 메모리 사용량이 일정합니다.
+    + onChange : 값이 바뀐 row가 있을 때 바뀐 pk 목록으로 호출할 함수 (옵션)
+    + drift report를 반환합니다.
+        + checked : 확인한 row 수
+        + 카운터 field 별 : 값이 달랐던 row 수(fixed), 차이의 합(total), 차이의 절대값 합(absolute), 가장 큰 차이(largest)
+    '''
+    fields = list(counters)
+    report = {"checked": 0}
+    for field in fields:
+        report[field] = {"fixed": 0, "total": 0, "absolute": 0, "largest": []}
+
+    lastPk = None
+    while True:
+        # 같은 시점의 값으로 비교하도록 chunk 단위로 transaction을 사용합니다.
+        with transaction.atomic():
+            queryset = model.objects.order_by("pk")
+            if lastPk is not None:
+                queryset = queryset.filter(pk__gt=lastPk)
+            rows = list(queryset.values_list("pk", *fields)[:chunkSize])
+            if not rows:
+                break
+            pks = [row[0] for row in rows]
+
+            deltas = {}
+            for i, field in enumerate(fields, 1):
+                countModel, countField = counters[field]
+                counts = countBy(countModel, countField, pks)
+                deltas[field] = {row[0]: counts.get(row[0], 0) - row[i] for row in rows}
+                bulkIncrementById(model, field, deltas[field])
+
+        report["checked"] += len(rows)
+        for field in fields:
+            addDrift(report[field], deltas[field])
+
+        changed = {pk for field in fields for pk, n in deltas[field].items() if n}
+        if changed and onChange is not None:
+            onChange(sorted(changed))
+        lastPk = pks[-1]
+
+    return report
+
+
+def recountLikeReviewNum(chunkSize=1000):
+    # Restaurant의 likeNum/reviewNum을 Like/Review 테이블의 실제 갯수로 다시 맞춥니다.
+    return recountCounters(Restaurant, RESTAURANT_COUNTERS, chunkSize, onChange=listcache.bumpRestaurantIds)
+
+
+def recountUserStats(chunkSize=1000):
+    # Users의 createdLikeNum/createdReviewNum/createdRestaurantNum을 실제 등록한 갯수로 다시 맞춥니다.
+    return recountCounters(Users, USER_COUNTERS, chunkSize, onChange=listcache.bumpUsers)
+
+
+def addDrift(fieldReport, deltas, largestNum=10):
+    drifted = {pk: n for pk, n in deltas.items() if n}
+    fieldReport["fixed"] += len(drifted)
+    fieldReport["total"] += sum(drifted.values())
+    fieldReport["absolute"] += sum(abs(n) for n in drifted.values())
+    # 차이가 가장 큰 row largestNum 개를 (pk, 차이) 형태로 보관합니다.
+    fieldReport["largest"] = sorted(fieldReport["largest"] + list(drifted.items()),
+                                    key=lambda item: -abs(item[1]))[:largestNum]
+
+
+def formatDriftReport(report):
+    lines = ["checked %d rows" % report["checked"]]
+    for field, drift in report.items():
+        if field == "checked":
+            continue
+        lines.append("%s : %d rows fixed, total drift %+d, absolute drift %d"
+                     % (field, drift["fixed"], drift["total"], drift["absolute"]))
+        lines += ["    %s : %+d" % (pk, delta) for pk, delta in drift["largest"]]
+    return "\n".join(lines)
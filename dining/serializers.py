@@ -1,28 +1,82 @@
 # dining/serializers.py
 
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Restaurant, Like, Image, Review, Users, Station
+from .thumbnails import variantNames
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    '''
+    이미지 field의 크기/형식 별 URL을 {"thumbnail": {"webp": URL, "jpeg": URL}, "medium": {...}} 형태로 반환하는 field
+
+    ---
+    + 파일이 있는지 확인하지 않고 항상 크기/형식 별 URL을 반환합니다.
+        + 아직 만들어지지 않은 파일은 처음 요청될 때 serveMedia에서 원본으로 만들어 전송하므로,
+          cache/ETag에 원본 URL이 남지 않고 pool의 변환이 끝났을 때 version을 바꿀 필요도 없습니다.
+    '''
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request', None)
+
+        def absoluteUrl(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        variants = {}
+        for (variant, fmt), name in variantNames(value.name).items():
+            variants.setdefault(variant, {})[fmt] = absoluteUrl(name)
+        return variants
 
 class UsersSerializer(serializers.ModelSerializer):
+    profileImageVariants = ImageVariantsField(source='profileImageLink')
+
     class Meta:
         model = Users
         fields = '__all__'
 
 class ImageSerializer(serializers.ModelSerializer):
+    imageVariants = ImageVariantsField(source='image')
+
     class Meta:
         model = Image
         fields = '__all__'
+        # 분류 결과의 출처는 분류 모델만 기록합니다.
+        read_only_fields = ('modelVersion', 'confidences')
 
 
 class RestaurantSerializer(serializers.ModelSerializer):
     images = ImageSerializer(many=True, read_only=True)
+    # 위치/역 주변 검색에서만 있는 기준 위치(역)와의 거리(m), 그 외의 응답에는 포함되지 않습니다.
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Restaurant
+        fields = ('id', 'uid', 'restaurantName', 'foodCategory',
+                  'station', 'latitude', 'longitude', 'distFromStation',
+                  'phone', 'operatingHours', 'searchNum',
+                  'likeNum', 'reviewNum', 'representativeImage', 'images', 'distance')
+
+
+class RestaurantListSerializer(serializers.ModelSerializer):
+    '''
+    식당 리스트용 간략한 serializer
+
+    ---
+    + 이미지 목록 대신 대표이미지(representativeImage)와 이미지 갯수(imageNum)만 반환합니다.
+    + imageNum은 queryset에서 annotate 한 값을 사용합니다.
+    '''
+    imageNum = serializers.IntegerField(read_only=True)
+    distance = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Restaurant
         fields = ('id', 'uid', 'restaurantName', 'foodCategory',
                   'station', 'latitude', 'longitude', 'distFromStation',
                   'phone', 'operatingHours', 'searchNum',
-                  'likeNum', 'reviewNum', 'representativeImage', 'images')
+                  'likeNum', 'reviewNum', 'representativeImage', 'imageNum', 'distance')
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -33,13 +87,17 @@ class LikeSerializer(serializers.ModelSerializer):
 class ReviewSerializer(serializers.ModelSerializer):
     reviewImages = ImageSerializer(many=True, read_only=True)
 
+    # 응답에 덧붙이는 (key, instance의 field, serializer) : 작성자 정보를 users로 덧붙입니다.
+    extra_representations = (('users', 'uid', UsersSerializer),)
+
     class Meta:
         model = Review
         fields = '__all__'
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['users'] = UsersSerializer(instance.uid).data
+        for name, source, serializerClass in self.extra_representations:
+            response[name] = serializerClass(getattr(instance, source)).data
         return response
 
 
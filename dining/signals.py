@@ -0,0 +1,93 @@
+# dining/signals.py
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from .models import Restaurant, Like, Review, Image, Station, Users
+from .spatial import stationIndex
+from .thumbnails import hasVariants, thumbnailPool
+from . import listcache, namesearch
+
+
+# Station이 추가/수정/삭제되면 최근접 역 인덱스를 다시 만들고, 역 응답의 ETag를 바꾸도록 합니다.
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def invalidateStationIndex(sender, **kwargs):
+    stationIndex.invalidate()
+    listcache.bumpStations()
+
+
+# 식당이 수정되면 수정 전 역/카테고리의 식당 리스트 cache도 사용하지 않도록 합니다.
+@receiver(pre_save, sender=Restaurant)
+def invalidateRestaurantListBeforeUpdate(sender, instance, **kwargs):
+    if instance.pk is not None:
+        listcache.bumpRestaurantIds([instance.pk])
+
+
+# 식당이 추가/수정/삭제되면 해당 역/카테고리/사용자의 식당 리스트 cache를 사용하지 않도록 합니다.
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidateRestaurantList(sender, instance, **kwargs):
+    listcache.bumpRestaurant(instance)
+
+
+# 식당이 추가되거나 이름/카테고리/역이 수정되면 이름 검색용 n-gram을 다시 저장합니다.
+@receiver(post_save, sender=Restaurant)
+def indexRestaurantName(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or {"restaurantName", "foodCategory", "station"} & set(update_fields):
+        namesearch.indexRestaurant(instance)
+
+
+# 좋아요가 추가/삭제되면 해당 식당이 포함된 식당 리스트 cache를 사용하지 않도록 합니다.
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidateRestaurantListByLike(sender, instance, **kwargs):
+    listcache.bumpRestaurantIds([instance.restaurant_id])
+
+
+# 리뷰가 추가/수정/삭제되면 해당 리뷰/식당이 포함된 응답의 ETag를 바꾸도록 합니다.
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidateReview(sender, instance, **kwargs):
+    listcache.bumpReview(instance)
+
+
+# 이미지가 추가/수정/삭제되면 해당 이미지/리뷰/식당이 포함된 응답의 ETag를 바꾸도록 합니다.
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidateImage(sender, instance, **kwargs):
+    listcache.bumpImages([(instance.pk, instance.restaurant_id, instance.review_id)])
+
+
+# 사용자 정보가 바뀌면 작성자 정보가 포함된 리뷰 응답의 ETag를 바꾸도록 합니다.
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def invalidateUsers(sender, instance, **kwargs):
+    listcache.bumpUsers([instance.pk])
+
+
+# 이미지가 등록되면 commit 이후에 크기/형식 별 파일을 process pool에서 만듭니다.
+@receiver(post_save, sender=Image)
+def makeImageVariants(sender, instance, created, **kwargs):
+    if created and instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: thumbnailPool.submit(name))
+
+
+# 사용자를 불러올 때 저장된 프로필 사진 이름을 기억해 두고, 저장할 때 바뀌었는지 비교합니다.
+# (descriptor를 거치지 않고 읽으므로 .only()로 불러온 경우에도 query 하지 않습니다.)
+@receiver(post_init, sender=Users)
+def rememberProfileImage(sender, instance, **kwargs):
+    value = instance.__dict__.get("profileImageLink")
+    instance._savedProfileImageLink = getattr(value, "name", value)
+
+
+# 프로필 사진이 바뀌었거나 크기/형식 별 파일이 아직 없으면 commit 이후에 process pool에서 만듭니다.
+@receiver(post_save, sender=Users)
+def makeProfileImageVariants(sender, instance, created, update_fields=None, **kwargs):
+    if not instance.profileImageLink or (update_fields is not None and "profileImageLink" not in update_fields):
+        return
+    name = instance.profileImageLink.name
+    changed = created or name != instance._savedProfileImageLink
+    instance._savedProfileImageLink = name
+    if changed or not hasVariants(name):
+        transaction.on_commit(lambda: thumbnailPool.submit(name))
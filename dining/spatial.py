@@ -0,0 +1,137 @@
+# dining/spatial.py
+import heapq
+import math
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Station
+from .distance import distancesFromPoint
+
+# Station 인덱스의 버전을 저장하는 cache key
+STATION_INDEX_VERSION_KEY = "dining:station-index:version"
+
+
+def toUnitVector(latitude, longitude):
+    '''
+    위도/경도를 단위 구 위의 3차원 좌표로 변환합니다.
+
+    ---
+    + 단위 구 위의 직선(chord) 거리는 구면(haversine) 거리와 순서가 같으므로 최근접 탐색에 그대로 사용할 수 있습니다.
+    '''
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon),
+            math.cos(lat) * math.sin(lon),
+            math.sin(lat))
+
+
+class KDTree:
+    '''
+    3차원 좌표에 대한 k-d tree
+
+    ---
+    + points : (좌표, payload) 의 리스트를 입력 받습니다.
+    + nearest(point, k) : point에서 가장 가까운 k개의 (제곱 거리, payload)를 가까운 순으로 반환합니다.
+    '''
+
+    def __init__(self, points):
+        self.size = len(points)
+        self.root = self._build(list(points), 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        # x -> y -> z 순서로 분할 축을 바꾸어 가며 중앙값 기준으로 분할합니다.
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        return (points[mid], axis,
+                self._build(points[:mid], depth + 1),
+                self._build(points[mid + 1:], depth + 1))
+
+    def nearest(self, point, k):
+        if k <= 0 or self.root is None:
+            return []
+
+        # (-제곱거리, 순번, payload) 형태의 max heap으로 현재까지의 k개 후보를 유지합니다.
+        heap = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            (coords, payload), axis, left, right = node
+
+            distance = sum((a - b) ** 2 for a, b in zip(coords, point))
+            if len(heap) < k:
+                heapq.heappush(heap, (-distance, id(node), payload))
+            elif distance < -heap[0][0]:
+                heapq.heapreplace(heap, (-distance, id(node), payload))
+
+            # 분할 평면 반대편은 현재 k번째 후보보다 가까울 수 있을 때만 탐색합니다.
+            diff = point[axis] - coords[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            if len(heap) < k or diff ** 2 < -heap[0][0]:
+                stack.append(far)
+            stack.append(near)
+
+        return [(-negDistance, payload) for negDistance, _, payload in sorted(heap, reverse=True)]
+
+
+class StationIndex:
+    '''
+    Station 테이블 전체를 메모리에 올려 둔 최근접 역 탐색용 인덱스
+
+    ---
+    + 최초 조회 시 Station 테이블을 한 번 읽어 k-d tree를 만듭니다.
+    + Station이 추가/수정/삭제되면 invalidate()로 cache의 버전을 바꾸고, 다음 조회 시 다시 만듭니다.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = None
+        self._stations = []
+        self._version = None
+
+    def build(self):
+        # 역 정보는 (id, station, latitude, longitude) 튜플로 보관합니다.
+        version = cache.get(STATION_INDEX_VERSION_KEY)
+        stations = list(Station.objects.values_list("id", "station", "latitude", "longitude"))
+        tree = KDTree([(toUnitVector(s[2], s[3]), s) for s in stations])
+
+        with self._lock:
+            self._stations, self._tree, self._version = stations, tree, version
+
+    def invalidate(self):
+        '''
+        cache의 버전을 바꾸어 모든 프로세스가 다음 조회 시 인덱스를 다시 만들도록 합니다.
+
+        ---
+        + transaction 안에서 호출하면 commit 된 뒤에 버전을 바꿉니다. (transaction 밖이면 바로 바꿉니다.)
+            + commit 전에 바꾸면 그 사이에 다른 프로세스가 이전 Station 테이블로 만든 인덱스를 새 버전으로 기록하여,
+              다음 Station 변경까지 이전 인덱스를 계속 사용합니다.
+        '''
+        transaction.on_commit(lambda: cache.set(STATION_INDEX_VERSION_KEY, uuid.uuid4().hex, None))
+
+    def stations(self):
+        self._ensureFresh()
+        return self._stations
+
+    def nearest(self, latitude, longitude, k=3):
+        '''
+        입력 받은 GPS에서 가장 가까운 역 k개를 [(거리(m), (id, station, latitude, longitude)), ...] 형태로 반환합니다.
+        '''
+        self._ensureFresh()
+        result = [s for _, s in self._tree.nearest(toUnitVector(latitude, longitude), k)]
+        distances = distancesFromPoint(latitude, longitude, [(s[2], s[3]) for s in result])
+        return list(zip(distances.tolist(), result))
+
+    def _ensureFresh(self):
+        if self._tree is None or self._version != cache.get(STATION_INDEX_VERSION_KEY):
+            self.build()
+
+
+# 프로세스 당 하나의 인덱스를 공유합니다.
+stationIndex = StationIndex()
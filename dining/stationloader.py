@@ -0,0 +1,105 @@
+# dining/stationloader.py
+import csv
+import json
+
+from django.db import transaction
+
+from .bulk import bulkUpdateById
+from .models import Station
+from .spatial import stationIndex
+from . import listcache
+
+
+def readStationFile(path):
+    '''
+    CSV 또는 JSON 파일에서 {역 이름: (위도, 경도)}를 읽습니다.
+
+    ---
+    + CSV : station, latitude, longitude 열을 가진 header 포함 파일
+    + JSON : stationDict와 같은 {역 이름: [위도, 경도]} 또는 [{"station", "latitude", "longitude"}, ...]
+    '''
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            return {row["station"].strip(): (float(row["latitude"]), float(row["longitude"]))
+                    for row in csv.DictReader(f)}
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return {name: (float(lat), float(long)) for name, (lat, long) in data.items()}
+    return {row["station"]: (float(row["latitude"]), float(row["longitude"])) for row in data}
+
+
+def loadStations(stations, deleteMissing=False, dryRun=False):
+    '''
+    {역 이름: (위도, 경도)}를 Station 테이블에 upsert 합니다. 몇 번을 실행해도 결과가 같습니다.
+
+    ---
+    + 없는 역은 bulk_create, 위도/경도가 다른 역은 field 별 bulk UPDATE 한 번으로 저장합니다.
+    + 같은 이름의 역이 여러 row 있다면 id가 가장 작은 row만 남기고 삭제합니다.
+    + deleteMissing : True이면 stations에 없는 역을 삭제합니다.
+    + dryRun : True이면 변경 내용만 계산하고 저장하지 않습니다.
+    + 하나의 transaction으로 처리하며, 변경된 내용을 report로 반환합니다.
+        + 최근접 역 인덱스와 역 응답의 version은 commit 된 뒤에 바꿉니다.
+        + created / updated / deleted / duplicates : 역 이름 목록, unchanged : 역 수
+    '''
+    report = {"created": [], "updated": [], "unchanged": 0, "duplicates": [], "deleted": []}
+
+    with transaction.atomic():
+        existing, duplicateIds = {}, []
+        for stationId, name, lat, long in Station.objects.order_by("id").values_list(
+                "id", "station", "latitude", "longitude").select_for_update():
+            if name in existing:
+                duplicateIds.append(stationId)
+                report["duplicates"].append(name)
+            else:
+                existing[name] = (stationId, lat, long)
+
+        newStations, latitudes, longitudes = [], {}, {}
+        for name, (lat, long) in sorted(stations.items()):
+            if name not in existing:
+                newStations.append(Station(station=name, latitude=lat, longitude=long))
+                report["created"].append(name)
+                continue
+            stationId, oldLat, oldLong = existing[name]
+            if (oldLat, oldLong) == (lat, long):
+                report["unchanged"] += 1
+                continue
+            latitudes[stationId], longitudes[stationId] = lat, long
+            report["updated"].append(name)
+
+        deleteIds = list(duplicateIds)
+        if deleteMissing:
+            missing = sorted(name for name in existing if name not in stations)
+            deleteIds += [existing[name][0] for name in missing]
+            report["deleted"] = missing
+
+        if dryRun:
+            transaction.set_rollback(True)
+            return report
+
+        Station.objects.bulk_create(newStations, batch_size=500)
+        bulkUpdateById(Station, "latitude", latitudes)
+        bulkUpdateById(Station, "longitude", longitudes)
+        if deleteIds:
+            Station.objects.filter(id__in=deleteIds).delete()
+
+        # bulk 작업은 signal이 발생하지 않으므로 최근접 역 인덱스와 역 응답의 version을 직접 바꿉니다.
+        # 둘 다 transaction.on_commit으로 등록되므로, 다른 프로세스는 commit 된 Station 테이블로 인덱스를 다시 만듭니다.
+        if newStations or latitudes or deleteIds:
+            stationIndex.invalidate()
+            listcache.bumpStations()
+
+    return report
+
+
+def formatLoadReport(report, nameNum=30):
+    lines = ["%d created, %d updated, %d unchanged, %d duplicates removed, %d deleted"
+             % (len(report["created"]), len(report["updated"]), report["unchanged"],
+                len(report["duplicates"]), len(report["deleted"]))]
+    for key in ("created", "updated", "duplicates", "deleted"):
+        if report[key]:
+            # 역 이름은 nameNum 개까지만 출력합니다.
+            more = " ... (+%d)" % (len(report[key]) - nameNum) if len(report[key]) > nameNum else ""
+            lines.append("%s : %s%s" % (key, ", ".join(report[key][:nameNum]), more))
+    return "\n".join(lines)
@@ -0,0 +1,127 @@
+# dining/storage.py
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import time
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# hash 이름 : <upload_to의 첫 폴더>/<hash 앞 2글자>/<sha256 hash><확장자>
+CONTENT_HASH_PATTERN = re.compile(r"(?:^|/)([0-9a-f]{64})\.[0-9a-z]+$")
+
+# hash 이름 파일과 그 크기/형식 별 파일(<hash>.thumbnail.webp 등)의 파일 이름
+HASHED_FILENAME_PATTERN = re.compile(r"^([0-9a-f]{64})(\.[0-9a-z]+)+$")
+
+# 같은 형식의 파일이 같은 이름을 갖도록 확장자를 맞춥니다.
+EXTENSION_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg"}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def contentHash(name):
+    # hash 이름의 파일이면 sha256 hash를, 아니면 None을 반환합니다.
+    matches = CONTENT_HASH_PATTERN.search(name or "")
+    return matches.group(1) if matches else None
+
+
+def hashedName(name, digest):
+    '''
+    업로드된 파일 이름과 내용의 hash로 저장할 파일 이름을 만듭니다.
+
+    ---
+    + dining/2019/01/01/Food.JPEG -> dining/ab/ab12...ef.jpg
+    + 날짜 폴더를 사용하지 않으므로 같은 내용의 파일은 언제 올려도 같은 이름이 됩니다.
+    '''
+    folder = name.replace("\\", "/").split("/")[0] if "/" in name else ""
+    extension = os.path.splitext(name)[1].lower()
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    return posixpath.join(folder, digest[:2], digest + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''
+    파일 내용의 sha256 hash를 이름으로 저장하는 storage
+
+    ---
+    + 업로드 파일을 chunk 단위로 임시 파일에 쓰면서 hash를 함께 계산하므로 파일을 두 번 읽지 않습니다.
+        + 큰 파일(TemporaryUploadedFile)은 이미 디스크에 있으므로 hash만 계산한 뒤 rename으로 옮깁니다.
+    + 같은 내용의 파일이 이미 있으면 새로 저장하지 않고 기존 파일 이름을 반환하므로, 여러 Image row가 하나의 파일을 공유합니다.
+        + 파일을 공유하므로 Image를 삭제해도 파일은 지우지 않습니다. 참조가 없는 파일은 batchContentAddressSweep.py로 정리합니다.
+        + 기존 파일을 다시 사용할 때 수정 시각을 갱신하므로, 정리할 때 최근에 사용된 파일은 남겨 둘 수 있습니다.
+          (serveMedia는 hash 이름의 파일을 수정 시각이 아닌 ETag로 확인하므로 client가 다시 받지 않습니다.)
+    + 임시 파일을 완성한 뒤 rename 하므로, 같은 파일이 동시에 업로드되어도 깨진 파일이 남지 않습니다. (같은 내용으로 덮어씁니다.)
+    '''
+
+    def get_available_name(self, name, max_length=None):
+        # 이름은 _save에서 내용의 hash로 정하므로 기존 파일과 겹치는지 확인하지 않습니다.
+        return name
+
+    def _save(self, name, content):
+        if hasattr(content, "temporary_file_path"):
+            return self._saveTemporaryFile(name, content)
+
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmpPath = tempfile.mkstemp(dir=self.location, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._commit(tmpPath, hashedName(name, digest.hexdigest()), move=os.replace)
+        finally:
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+
+    def _saveTemporaryFile(self, name, content):
+        digest = hashlib.sha256()
+        with open(content.temporary_file_path(), "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return self._commit(content.temporary_file_path(), hashedName(name, digest.hexdigest()),
+                            move=lambda old, new: file_move_safe(old, new, allow_overwrite=True))
+
+    def _commit(self, tmpPath, name, move):
+        # 같은 내용의 파일이 이미 있으면 임시 파일은 버리고 기존 이름을 사용합니다.
+        path = self.path(name)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        move(tmpPath, path)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        return name
+
+
+    def unreferencedNames(self, digests, minAge=0, folders=("dining",)):
+        '''
+        folders 아래의 hash 이름 파일 중 hash가 digests에 없는 파일 이름을 반환합니다. (크기/형식 별 파일 포함)
+
+        ---
+        + digests : Image 등에서 참조하는 sha256 hash의 set
+        + minAge : 수정된 지 minAge 초가 지나지 않은 파일은 제외합니다.
+            + 업로드한 파일은 Image row보다 먼저 저장되므로, 저장 중인 업로드의 파일을 지우지 않도록 합니다.
+        '''
+        now = time.time()
+        for folder in folders:
+            for root, _, files in os.walk(os.path.join(self.location, folder)):
+                for filename in files:
+                    matches = HASHED_FILENAME_PATTERN.match(filename)
+                    if matches is None or matches.group(1) in digests:
+                        continue
+                    path = os.path.join(root, filename)
+                    if now - os.path.getmtime(path) >= minAge:
+                        yield os.path.relpath(path, self.location).replace(os.sep, "/")
+
+
+contentAddressedStorage = ContentAddressedStorage()
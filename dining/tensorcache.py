@@ -0,0 +1,107 @@
+# dining/tensorcache.py
+import os
+import threading
+
+import numpy as np
+
+# 전처리된 이미지 크기 : classifier.IMAGE_SIZE와 같은 224 x 224 RGB
+TENSOR_SHAPE = (224, 224, 3)
+
+# 파일이 가득 차면 한 번에 늘리는 slot 수
+GROW_SLOTS = 1024
+
+
+class TensorCache:
+    '''
+    resize까지 마친 이미지(224 x 224 x 3 uint8)를 디스크에 보관하는 memory-mapped cache
+
+    ---
+    + tensors.u8 : slot 순서로 이어 붙인 uint8 배열로, np.memmap으로 열어 필요한 slot만 읽습니다.
+    + index.tsv : "slot<TAB>파일 이름" 행을 추가만 하는 index, 시작할 때 한 번 읽어 {파일 이름: slot}으로 보관합니다.
+        + hash 이름의 파일은 여러 Image가 공유하므로 image id 대신 파일 이름으로 찾습니다.
+    + get(name)은 memmap의 view를 반환하므로 복사 없이 OS page cache에서 바로 읽습니다.
+    + put(name, tensor)은 slot에 쓰기만 하고, flush() 때 배열을 디스크에 반영한 뒤 index 행을 추가합니다.
+        + flush 전에 중단되면 index에 없는 slot은 다음 실행에서 다시 사용하므로 깨진 tensor를 읽지 않습니다.
+    + 한 cache 폴더에는 한 process만 씁니다. (읽기/쓰기는 여러 thread에서 해도 됩니다.)
+        + put이 파일을 늘리며 memmap을 바꾸는 동안 get이 이전 memmap을 읽지 않도록 get/put 모두 lock 안에서 처리합니다.
+    '''
+
+    def __init__(self, directory, shape=TENSOR_SHAPE):
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.slotSize = int(np.prod(self.shape))
+        self.dataPath = os.path.join(directory, "tensors.u8")
+        self.indexPath = os.path.join(directory, "index.tsv")
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._data = None
+        self.capacity = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.index = self._loadIndex()
+        self._open(max(os.path.getsize(self.dataPath) // self.slotSize if os.path.exists(self.dataPath) else 0,
+                       len(self.index)))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get(self, name):
+        # 저장된 tensor의 view를 반환하고, 없으면 None을 반환합니다.
+        with self._lock:
+            slot = self.index.get(name)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[slot]
+
+    def put(self, name, tensor):
+        with self._lock:
+            if name in self.index:
+                return
+            slot = len(self.index)
+            if slot >= self.capacity:
+                self._open(self.capacity + GROW_SLOTS)
+            self._data[slot] = tensor
+            self.index[name] = slot
+            self._pending.append((slot, name))
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            # tensor를 먼저 디스크에 쓴 뒤 index 행을 추가합니다.
+            self._data.flush()
+            with open(self.indexPath, "a", encoding="utf-8") as f:
+                f.writelines("%d\t%s\n" % (slot, name) for slot, name in self._pending)
+            self._pending = []
+
+    def _loadIndex(self):
+        index = {}
+        if not os.path.exists(self.indexPath):
+            return index
+        with open(self.indexPath, encoding="utf-8") as f:
+            for line in f:
+                # 기록 도중 중단된 마지막 행은 무시합니다.
+                if not line.endswith("\n"):
+                    break
+                slot, name = line.rstrip("\n").split("\t", 1)
+                index[name] = int(slot)
+        return index
+
+    def _open(self, capacity):
+        # 파일 크기를 capacity 개의 slot만큼 늘리고(sparse file) 다시 memmap으로 엽니다.
+        # 이전 memmap에서 반환한 view는 참조가 남아 있는 동안 그대로 사용할 수 있습니다.
+        with open(self.dataPath, "ab") as f:
+            if f.tell() < capacity * self.slotSize:
+                f.truncate(capacity * self.slotSize)
+        self.capacity = capacity
+        self._data = np.memmap(self.dataPath, dtype=np.uint8, mode="r+", shape=(capacity,) + self.shape) \
+            if capacity else None
@@ -1,3 +1,1490 @@
-from django.test import TestCase
+import datetime
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from haversine import haversine
+from PIL import Image as PIL_Image
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Count
+from django.http import Http404
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .models import Restaurant, Like, Review, Users, Image, Station, RestaurantStation, RestaurantNameGram, \
+    ClassificationQueue
+from . import counters, listcache, namesearch, recount, stationloader, nearby, geosearch, thumbnails, tensorcache, worker
+from .pagination import GeoKeysetPagination, RestaurantKeysetPagination
+from .utils import distByTwoPoints, stationDict
+from .spatial import stationIndex, STATION_INDEX_VERSION_KEY
+from .distance import haversineArray, distancesFromPoint, pairwiseDistances
+from .bulk import bulkIncrementById
+from .viewcounter import BufferedCounter, searchNumCounter
+from .fastserializer import CompiledSerializer
+from .mediaserve import serveMedia
+from .storage import contentAddressedStorage, contentHash
+from .classifier import BatchClassifier, Checkpoint, pendingChunks, runIncremental, runReclassify
+from .tensorcache import TensorCache
+from .serializers import RestaurantSerializer, RestaurantListSerializer, ReviewSerializer
+
+
+# 테스트는 cache를 비우므로 실제 cache 폴더 대신 memory cache를 사용합니다.
+testCaches = override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+
+
+def setUpModule():
+    testCaches.enable()
+
+
+def tearDownModule():
+    testCaches.disable()
+
+
+class immediateTransaction:
+    # TestCase는 commit 하지 않으므로 listcache/spatial의 on_commit 함수를 바로 실행합니다.
+
+    @staticmethod
+    def on_commit(func):
+        func()
+
+
+def patchOnCommit(testCase, *modules):
+    for module in modules:
+        patcher = mock.patch("dining.%s.transaction" % module, immediateTransaction)
+        patcher.start()
+        testCase.addCleanup(patcher.stop)
+
+
+class RestaurantFixtureMixin:
+    # 식당/사용자 하나씩과 cache를 준비하는 fixture
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        patchOnCommit(self, "listcache", "spatial")
+        # 조회수는 test에서 직접 flush 하므로 background thread를 시작하지 않습니다.
+        patcher = mock.patch.object(searchNumCounter, "start")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.user = Users.objects.create(uid="user", nickname="user")
+        self.restaurant = Restaurant.objects.create(
+            restaurantName="식당", foodCategory="곱창", station="사당", uid=self.user,
+            latitude=37.47653, longitude=126.981685, distFromStation=0,
+            searchNum=10, likeNum=3, reviewNum=2,
+        )
+
+    def assertCounters(self, **expected):
+        restaurant = Restaurant.objects.get(id=self.restaurant.id)
+        user = Users.objects.get(uid=self.user.uid)
+        actual = {field: getattr(user if field == "score" else restaurant, field) for field in expected}
+        self.assertEqual(actual, expected)
+
+
+class MediaRootMixin:
+    # test 마다 비어 있는 임시 폴더를 MEDIA_ROOT로 사용하는 fixture
+
+    def setUp(self):
+        super().setUp()
+        self.mediaRoot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.mediaRoot)
+        override = self.settings(MEDIA_ROOT=self.mediaRoot)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class AddCountersTest(RestaurantFixtureMixin, TestCase):
+
+    def test_updates_only_changed_columns_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            counters.addCounters(Restaurant, self.restaurant.id, likeNum=1, searchNum=-1, reviewNum=0)
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]["sql"]
+        self.assertTrue(sql.startswith("UPDATE"))
+        self.assertIn("likeNum", sql)
+        self.assertIn("searchNum", sql)
+        self.assertNotIn("reviewNum", sql)
+        self.assertNotIn("restaurantName", sql)
+        self.assertCounters(likeNum=4, searchNum=9, reviewNum=2)
+
+    def test_no_query_without_changes(self):
+        with CaptureQueriesContext(connection) as queries:
+            counters.addCounters(Restaurant, self.restaurant.id, likeNum=0)
+        self.assertEqual(len(queries), 0)
+
+    def test_stale_instance_does_not_lose_updates(self):
+        stale = Restaurant.objects.get(id=self.restaurant.id)
+        counters.addCounters(Restaurant, self.restaurant.id, likeNum=1)
+        counters.addCounters(Restaurant, stale.id, likeNum=1)
+        self.assertCounters(likeNum=5)
+
+
+class BufferedCounterTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = Restaurant.objects.create(restaurantName="식당2", foodCategory="곱창", station="사당", uid=self.user,
+                                               latitude=37.47653, longitude=126.981685, distFromStation=0)
+
+    def test_bulk_increment_by_id(self):
+        with CaptureQueriesContext(connection) as queries:
+            updated = bulkIncrementById(Restaurant, "searchNum", {self.restaurant.id: 3, self.other.id: -1, 0: 0})
+        self.assertEqual((updated, len(queries)), (2, 1))
+        self.assertCounters(searchNum=13)
+        self.assertEqual(Restaurant.objects.get(id=self.other.id).searchNum, -1)
+
+    def test_hit_does_not_write_until_flush(self):
+        onFlush = mock.Mock()
+        counter = BufferedCounter(Restaurant, "searchNum", flushHits=2, onFlush=onFlush)
+        with mock.patch.object(counter, "start"), CaptureQueriesContext(connection) as queries:
+            for _ in range(3):
+                counter.hit(self.restaurant.id)
+            counter.hit(self.other.id, 2)
+        # flushHits가 넘어도 요청 thread에서는 DB에 쓰지 않습니다.
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(counter.pending(self.restaurant.id), 3)
+
+        self.assertEqual(counter.flush(), 2)
+        self.assertCounters(searchNum=13)
+        self.assertEqual(sorted(onFlush.call_args[0][0]), sorted([self.restaurant.id, self.other.id]))
+        self.assertEqual(counter.pending(self.restaurant.id), 0)
+        self.assertEqual(counter.flush(), 0)
+
+    def test_failed_flush_keeps_counts(self):
+        counter = BufferedCounter(Restaurant, "searchNum")
+        with mock.patch.object(counter, "start"):
+            counter.hit(self.restaurant.id)
+        with mock.patch("dining.viewcounter.bulkIncrementById", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                counter.flush()
+        self.assertEqual(counter.pending(self.restaurant.id), 1)
+        counter.flush()
+        self.assertCounters(searchNum=11)
+
+    def test_background_thread_flushes(self):
+        counter = BufferedCounter(Restaurant, "searchNum", flushInterval=60, flushHits=2)
+        flushed = threading.Event()
+        calls = []
+
+        def flush():
+            calls.append(1)
+            flushed.set()
+            # 첫 flush가 실패해도 thread는 계속 동작합니다.
+            if len(calls) == 1:
+                raise RuntimeError
+
+        with mock.patch.object(counter, "flush", side_effect=flush), \
+                mock.patch("dining.viewcounter.close_old_connections"), \
+                mock.patch("dining.viewcounter.logger") as logger:
+            counter.hit(self.restaurant.id)
+            counter.hit(self.restaurant.id)
+            self.assertTrue(flushed.wait(5))
+            flushed.clear()
+            counter.hit(self.restaurant.id)
+            counter.hit(self.restaurant.id)
+            self.assertTrue(flushed.wait(5))
+            counter.stop()
+        self.assertIsNone(counter._thread)
+        self.assertEqual(logger.exception.call_count, 1)
+        self.assertEqual(counter.flush(), 1)
+
+
+class LikeCounterTest(RestaurantFixtureMixin, TestCase):
+
+    def test_create_and_destroy(self):
+        response = self.client.post("/dining/v1/like/", {"uid": self.user.uid, "restaurant": self.restaurant.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertCounters(likeNum=4, searchNum=9, score=1)
+
+        response = self.client.delete("/dining/v1/like/%d/" % response.data["id"])
+        self.assertEqual(response.status_code, 204)
+        self.assertCounters(likeNum=3, searchNum=8, score=0)
+
+    def test_invalid_create_leaves_counters(self):
+        response = self.client.post("/dining/v1/like/", {"uid": "unknown", "restaurant": self.restaurant.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Like.objects.exists())
+        self.assertCounters(likeNum=3, searchNum=10, score=0)
+
+
+class ReviewCounterTest(RestaurantFixtureMixin, TestCase):
+
+    def test_create_and_destroy(self):
+        response = self.client.post("/dining/v1/review/", {"uid": self.user.uid, "restaurant": self.restaurant.id,
+                                                           "content": "맛있어요"})
+        self.assertEqual(response.status_code, 201)
+        self.assertCounters(reviewNum=3, searchNum=9, score=5)
+
+        response = self.client.delete("/dining/v1/review/%d/" % response.data["id"])
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Review.objects.exists())
+        self.assertCounters(reviewNum=2, searchNum=9, score=0)
+
+
+class KeysetPaginationTest(RestaurantFixtureMixin, TestCase):
+
+    def collect(self, url, params):
+        # next 링크를 따라가며 전체 결과와 요청 횟수를 모읍니다.
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, params if pages == 0 else None)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            ids += [row["id"] for row in response.data["results"]]
+            url, pages = response.data["next"], pages + 1
+        return ids, pages
+
+    def test_restaurant_cursor_pages_with_ties(self):
+        # likeNum이 같은 식당이 여러 page에 걸쳐 있어도 중복/누락 없이 조회되어야 합니다.
+        for i in range(45):
+            Restaurant.objects.create(restaurantName="식당%d" % i, foodCategory="곱창", station="사당", uid=self.user,
+                                      latitude=37.47653, longitude=126.981685, distFromStation=i % 7,
+                                      likeNum=i % 3)
+        expected = list(Restaurant.objects.filter(foodCategory="곱창", station="사당")
+                        .order_by("-likeNum", "-id").values_list("id", flat=True))
+
+        ids, pages = self.collect("/dining/v1/restaurant/", {"foodCategory": "곱창", "station": "사당",
+                                                                "paging": "cursor"})
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+        expected = list(Restaurant.objects.filter(foodCategory="곱창", station="사당")
+                        .order_by("distFromStation", "-id").values_list("id", flat=True))
+        ids, _ = self.collect("/dining/v1/restaurant/", {"foodCategory": "곱창", "station": "사당",
+                                                      "ordering": "distFromStation", "paging": "cursor"})
+        self.assertEqual(ids, expected)
+
+    def test_review_cursor_pages(self):
+        for i in range(25):
+            Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰%d" % i)
+        expected = list(Review.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+
+        ids, pages = self.collect("/dining/v1/review/", {"restaurant-id": self.restaurant.id,
+                                                            "paging": "cursor"})
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 2)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get("/dining/v1/review/?restaurant-id=%d" % self.restaurant.id)
+        self.assertIn("count", response.data)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/dining/v1/review/?paging=cursor&cursor=invalid")
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_value_types(self):
+        pagination = RestaurantKeysetPagination()
+        # 형식이 맞지 않는 값은 500이 아니라 404를 반환합니다.
+        for url, values in [("/dining/v1/restaurant/", ["many", 1]), ("/dining/v1/restaurant/", [1, None]),
+                            ("/dining/v1/restaurant/", [[1], 1]), ("/dining/v1/restaurant/", [True, 1]),
+                            ("/dining/v1/review/?restaurant-id=%d" % self.restaurant.id, ["yesterday", 1]),
+                            ("/dining/v1/review/?restaurant-id=%d" % self.restaurant.id, [1, 1])]:
+            response = self.client.get(url, {"foodCategory": "곱창", "station": "사당", "paging": "cursor",
+                                              "cursor": pagination.encodeCursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        older = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        Review.objects.filter(id=older.id).update(created_at=review.created_at - datetime.timedelta(days=1))
+        response = self.client.get("/dining/v1/review/", {
+            "restaurant-id": self.restaurant.id, "paging": "cursor",
+            "cursor": pagination.encodeCursor([review.created_at, review.id])})
+        self.assertEqual([row["id"] for row in response.data["results"]], [older.id])
+
+
+@skipUnless(connection.vendor in ("sqlite", "mysql"), "EXPLAIN 결과 형식을 아는 DB에서만 확인합니다.")
+class ListQueryPlanTest(RestaurantFixtureMixin, TestCase):
+    '''
+    각 list API가 실행하는 SELECT 문을 EXPLAIN 하여 full table scan이 없는지 확인합니다.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        Like.objects.create(restaurant=self.restaurant, uid=self.user)
+        Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user, category=0, image="a.jpg")
+        Station.objects.create(station="사당", latitude=37.47653, longitude=126.981685)
+
+    def fullScans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                # "SCAN 테이블" 은 full scan, "SCAN 테이블 USING (COVERING) INDEX" 는 index scan 입니다.
+                details = [row[-1] for row in cursor.fetchall()]
+                return [d for d in details if d.startswith("SCAN") and "USING" not in d]
+            else:
+                cursor.execute("EXPLAIN " + sql)
+                columns = [c[0] for c in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return [row["table"] for row in rows if row["type"] == "ALL"]
+
+    def assertUsesIndexes(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+
+        selects = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(self.fullScans(sql), [], sql)
+
+    def test_restaurant_list(self):
+        for ordering in ("likeNum", "reviewNum", "searchNum", "distFromStation"):
+            self.assertUsesIndexes("/dining/v1/restaurant/", {"foodCategory": "곱창", "station": "사당",
+                                                              "ordering": ordering})
+        self.assertUsesIndexes("/dining/v1/restaurant/", {"foodCategory": "곱창", "station": "사당",
+                                                          "paging": "cursor"})
+        self.assertUsesIndexes("/dining/v1/restaurant/", {"uid": self.user.uid})
+        self.assertUsesIndexes("/dining/v1/restaurant/", {"latitude": 37.47653, "longitude": 126.981685})
+
+    def test_review_list(self):
+        self.assertUsesIndexes("/dining/v1/review/", {"uid": self.user.uid})
+        self.assertUsesIndexes("/dining/v1/review/", {"restaurant-id": self.restaurant.id})
+
+    def test_image_list(self):
+        self.assertUsesIndexes("/dining/v1/image/", {"restaurant-id": self.restaurant.id})
+        self.assertUsesIndexes("/dining/v1/image/", {"restaurant-id": self.restaurant.id, "category": 0})
+        self.assertUsesIndexes("/dining/v1/image/", {"review-id": 1})
+
+    def test_like_list(self):
+        self.assertUsesIndexes("/dining/v1/like/", {"uid": self.user.uid})
+        self.assertUsesIndexes("/dining/v1/like/", {"uid": self.user.uid, "restaurant-id": self.restaurant.id})
+
+    def test_station_list(self):
+        self.assertUsesIndexes("/dining/v1/station/", {"station": "사당"})
+
+
+class UserStatsTest(RestaurantFixtureMixin, TestCase):
+
+    def test_created_counters_follow_writes(self):
+        other = Users.objects.create(uid="other", nickname="other")
+        self.client.post("/dining/v1/like/", {"uid": other.uid, "restaurant": self.restaurant.id})
+        self.client.post("/dining/v1/review/", {"uid": other.uid, "restaurant": self.restaurant.id, "content": "리뷰"})
+        response = self.client.post("/dining/v1/review/", {"uid": other.uid, "restaurant": self.restaurant.id,
+                                                           "content": "리뷰"})
+        self.client.delete("/dining/v1/review/%d/" % response.data["id"])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dining/v1/users/%s/" % other.uid)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual((response.data["createdLikeNum"], response.data["createdReviewNum"]), (1, 1))
+
+        # 식당을 삭제하면 함께 삭제되는 Like/Review를 등록한 사용자의 카운터도 줄어듭니다.
+        Users.objects.filter(uid=self.user.uid).update(createdRestaurantNum=1)
+        self.client.delete("/dining/v1/restaurant/%d/" % self.restaurant.id)
+        other.refresh_from_db()
+        self.assertEqual((other.createdLikeNum, other.createdReviewNum), (0, 0))
+        self.assertEqual(Users.objects.get(uid=self.user.uid).createdRestaurantNum, 0)
+
+    def test_recount_repairs_drift(self):
+        from .recount import recountUserStats
+
+        Like.objects.create(uid=self.user, restaurant=self.restaurant)
+        Users.objects.filter(uid=self.user.uid).update(createdLikeNum=5, createdReviewNum=2)
+
+        report = recountUserStats(chunkSize=1)
+        user = Users.objects.get(uid=self.user.uid)
+        self.assertEqual((user.createdLikeNum, user.createdReviewNum, user.createdRestaurantNum), (1, 0, 1))
+        self.assertEqual(report["createdLikeNum"]["total"], -4)
+        self.assertEqual(report["createdRestaurantNum"]["fixed"], 1)
+
+
+class RecountTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # self.restaurant는 like 1개, review 0개이지만 likeNum=3, reviewNum=2로 저장되어 있습니다.
+        Like.objects.create(uid=self.user, restaurant=self.restaurant)
+        self.other = Restaurant.objects.create(
+            restaurantName="다른 식당", foodCategory="곱창", station="사당", uid=self.user,
+            latitude=37.47653, longitude=126.981685, distFromStation=0, likeNum=0, reviewNum=1)
+        Review.objects.create(restaurant=self.other, uid=self.user, content="리뷰")
+        self.unchanged = Restaurant.objects.create(
+            restaurantName="맞는 식당", foodCategory="곱창", station="사당", uid=self.user,
+            latitude=37.47653, longitude=126.981685, distFromStation=0, likeNum=0, reviewNum=0)
+
+    def counters(self):
+        return {r[0]: r[1:] for r in Restaurant.objects.values_list("id", "likeNum", "reviewNum")}
+
+    def test_recount_like_review_num(self):
+        report = recount.recountLikeReviewNum(chunkSize=2)
+        self.assertEqual(self.counters(), {self.restaurant.id: (1, 0), self.other.id: (0, 1),
+                                           self.unchanged.id: (0, 0)})
+        self.assertEqual(report["checked"], 3)
+        self.assertEqual(report["likeNum"], {"fixed": 1, "total": -2, "absolute": 2,
+                                             "largest": [(self.restaurant.id, -2)]})
+        self.assertEqual((report["reviewNum"]["fixed"], report["reviewNum"]["total"]), (1, -2))
+        self.assertIn("likeNum : 1 rows fixed, total drift -2, absolute drift 2", recount.formatDriftReport(report))
+
+        # 값이 맞으면 UPDATE 하지 않습니다.
+        with CaptureQueriesContext(connection) as queries:
+            report = recount.recountLikeReviewNum(chunkSize=2)
+        self.assertEqual(report["likeNum"]["fixed"] + report["reviewNum"]["fixed"], 0)
+        self.assertFalse([q for q in queries if q["sql"].startswith("UPDATE")])
+
+    def test_grouped_queries_and_on_change(self):
+        onChange = mock.Mock()
+        with CaptureQueriesContext(connection) as queries:
+            recount.recountCounters(Restaurant, recount.RESTAURANT_COUNTERS, chunkSize=2, onChange=onChange)
+        # chunk 마다 식당 조회 1번과 카운터 별 GROUP BY 1번, 마지막 빈 chunk 조회 1번
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 2 * 3 + 1)
+        onChange.assert_called_once_with([self.restaurant.id])
+
+    def test_keeps_concurrent_increments(self):
+        # 갯수를 센 뒤 UPDATE 전에 증가한 값은 차이만큼 더하므로 유지됩니다.
+        countBy = recount.countBy
+
+        def countThenLike(model, field, ids):
+            counts = countBy(model, field, ids)
+            if model is Like:
+                Restaurant.objects.filter(id=self.unchanged.id).update(likeNum=1)
+            return counts
+
+        with mock.patch("dining.recount.countBy", side_effect=countThenLike):
+            recount.recountLikeReviewNum()
+        self.assertEqual(self.counters()[self.unchanged.id], (1, 0))
+
+
+class RestaurantListCacheTest(RestaurantFixtureMixin, TestCase):
+
+    def get(self):
+        return self.client.get("/dining/v1/restaurant/", {"foodCategory": "곱창", "station": "사당"})
+
+    def test_cached_until_write(self):
+        self.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.data["results"][0]["likeNum"], 3)
+
+        # 좋아요가 등록되면 해당 역/카테고리의 리스트를 다시 조회합니다.
+        self.client.post("/dining/v1/like/", {"uid": self.user.uid, "restaurant": self.restaurant.id})
+        self.assertEqual(self.get().data["results"][0]["likeNum"], 4)
+
+    def test_other_station_write_keeps_cache(self):
+        self.get()
+        Restaurant.objects.create(restaurantName="식당", foodCategory="곱창", station="강남", uid=self.user,
+                                  latitude=37.497952, longitude=127.027619, distFromStation=0)
+        with CaptureQueriesContext(connection) as queries:
+            self.get()
+        self.assertEqual(len(queries), 0)
+
+
+class VersionBumpCommitTest(TransactionTestCase):
+
+    def test_bump_after_commit(self):
+        scope = ("restaurant", 1)
+        version, = listcache.currentVersions([scope])
+        with transaction.atomic():
+            listcache.bumpVersions([scope])
+            # commit 전에는 이전 version을 그대로 사용합니다.
+            self.assertEqual(listcache.currentVersions([scope]), [version])
+        self.assertNotEqual(listcache.currentVersions([scope]), [version])
+
+        # transaction 밖에서는 바로 바꿉니다.
+        version, = listcache.currentVersions([scope])
+        listcache.bumpVersions([scope])
+        self.assertNotEqual(listcache.currentVersions([scope]), [version])
+
+    def test_station_index_after_commit(self):
+        stationIndex.invalidate()
+        version = cache.get(STATION_INDEX_VERSION_KEY)
+        with transaction.atomic():
+            Station.objects.create(station="사당", latitude=37.47653, longitude=126.981685)
+            # commit 전에 다른 프로세스가 이전 테이블로 만든 인덱스를 새 버전으로 기록하지 않도록 버전을 그대로 둡니다.
+            self.assertEqual(cache.get(STATION_INDEX_VERSION_KEY), version)
+        self.assertNotEqual(cache.get(STATION_INDEX_VERSION_KEY), version)
+        self.assertEqual(stationIndex.nearest(37.4860, 126.9820, 1)[0][1][1], "사당")
+
+    def test_station_loader_after_commit(self):
+        stationIndex.invalidate()
+        version = cache.get(STATION_INDEX_VERSION_KEY)
+        stationsVersion, = listcache.currentVersions([listcache.STATIONS_SCOPE])
+        with transaction.atomic():
+            stationloader.loadStations({"강남": (37.497952, 127.027619)})
+            self.assertEqual(cache.get(STATION_INDEX_VERSION_KEY), version)
+            self.assertEqual(listcache.currentVersions([listcache.STATIONS_SCOPE]), [stationsVersion])
+        self.assertNotEqual(cache.get(STATION_INDEX_VERSION_KEY), version)
+        self.assertNotEqual(listcache.currentVersions([listcache.STATIONS_SCOPE]), [stationsVersion])
+        self.assertEqual(stationIndex.nearest(37.5, 127.0, 1)[0][1][1], "강남")
+
+
+class ConditionalGetTest(RestaurantFixtureMixin, TestCase):
+
+    def test_list_not_modified_until_write(self):
+        params = {"foodCategory": "곱창", "station": "사당"}
+        etag = self.client.get("/dining/v1/restaurant/", params)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dining/v1/restaurant/", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        # 좋아요가 등록되면 ETag가 바뀌고 다시 200으로 응답합니다.
+        self.client.post("/dining/v1/like/", {"uid": self.user.uid, "restaurant": self.restaurant.id})
+        response = self.client.get("/dining/v1/restaurant/", params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_retrieve_weak_etag_counts_search(self):
+        searchNumCounter.flush()
+        url = "/dining/v1/restaurant/%d/" % self.restaurant.id
+        etag = self.client.get(url)["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(searchNumCounter.pending(self.restaurant.id), 2)
+        searchNumCounter.flush()
+
+    def test_review_etag_changes_with_author(self):
+        review = Review.objects.create(uid=self.user, restaurant=self.restaurant, content="맛있어요")
+        url = "/dining/v1/review/%d/" % review.id
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post("/dining/v1/like/", {"uid": self.user.uid, "restaurant": self.restaurant.id})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_review_etag_keeps_other_author(self):
+        review = Review.objects.create(uid=self.user, restaurant=self.restaurant, content="맛있어요")
+        other = Users.objects.create(uid="other", nickname="other")
+        for url in ("/dining/v1/review/%d/" % review.id, "/dining/v1/review/?restaurant-id=%d" % self.restaurant.id):
+            etag = self.client.get(url)["ETag"]
+            # 다른 사용자의 정보가 바뀌어도 이 리뷰 응답은 그대로입니다.
+            self.client.post("/dining/v1/like/", {"uid": other.uid, "restaurant": self.restaurant.id})
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_review_etag_without_queries(self):
+        review = Review.objects.create(uid=self.user, restaurant=self.restaurant, content="맛있어요")
+        urls = ["/dining/v1/review/%d/" % review.id, "/dining/v1/review/?restaurant-id=%d" % self.restaurant.id,
+                "/dining/v1/review/?uid=%s" % self.user.uid, "/dining/v1/review/"]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+        # 작성자 정보는 쓰기 시에 반영하므로 304 응답에는 DB 조회가 없습니다.
+        with CaptureQueriesContext(connection) as queries:
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        Users.objects.filter(uid=self.user.uid).update(score=10)
+        listcache.bumpUsers([self.user.uid])
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, url)
+
+    def test_review_etag_changes_with_image_category(self):
+        review = Review.objects.create(uid=self.user, restaurant=self.restaurant, content="맛있어요")
+        image = Image.objects.create(uid=self.user, restaurant=self.restaurant, review=review, image="a.jpg")
+        url = "/dining/v1/review/%d/" % review.id
+        etag = self.client.get(url)["ETag"]
+
+        # 배치 분류기처럼 bulk update 후 bumpImages를 호출하면 리뷰 응답의 ETag도 바뀝니다.
+        Image.objects.filter(id=image.id).update(category=1)
+        listcache.bumpImages([(image.id, self.restaurant.id, review.id)])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_none_match_any_requires_object(self):
+        url = "/dining/v1/restaurant/%s/"
+        self.assertEqual(self.client.get(url % self.restaurant.id, HTTP_IF_NONE_MATCH="*").status_code, 304)
+        self.assertEqual(self.client.get(url % 0, HTTP_IF_NONE_MATCH="*").status_code, 404)
+        self.assertEqual(self.client.get(url % "abc", HTTP_IF_NONE_MATCH="*").status_code, 404)
+        self.assertEqual(searchNumCounter.pending(0), 0)
+        searchNumCounter.flush()
+
+
+class CompactRestaurantListTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        for i in range(3):
+            Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user, image="%d.jpg" % i)
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/dining/v1/restaurant/", dict(foodCategory="곱창", station="사당", **params))
+        return response, len(queries)
+
+    def test_compact_list_returns_image_count_without_images(self):
+        response, queryNum = self.get(view="compact")
+        restaurant = response.data["results"][0]
+        self.assertNotIn("images", restaurant)
+        self.assertEqual(restaurant["imageNum"], 3)
+        # count + 식당 조회(이미지 갯수 포함)
+        self.assertEqual(queryNum, 2)
+
+    def test_full_list_and_retrieve_keep_images(self):
+        response, queryNum = self.get()
+        self.assertEqual(len(response.data["results"][0]["images"]), 3)
+        # count + 식당 조회 + 이미지 prefetch
+        self.assertEqual(queryNum, 3)
+
+        response = self.client.get("/dining/v1/restaurant/%d/" % self.restaurant.id)
+        self.assertEqual(len(response.data["images"]), 3)
+        searchNumCounter.flush()
+
+
+class FastSerializerTest(RestaurantFixtureMixin, TestCase):
+    '''
+    목록 조회용 CompiledSerializer의 결과가 DRF serializer와 같은 JSON인지 확인합니다.
+    '''
+
+    def setUp(self):
+        super().setUp()
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        Review.objects.create(restaurant=self.restaurant, uid=self.user, content="사진 없는 리뷰")
+        Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user, category=0, image="a.jpg")
+        Restaurant.objects.create(restaurantName="전화 없음", foodCategory="곱창", station="사당", uid=self.user,
+                                  latitude=37.47, longitude=126.98, distFromStation=12.5)
+        self.request = APIRequestFactory().get("/dining/v1/restaurant/")
+
+    def assertSameJSON(self, serializerClass, queryset):
+        context = {"request": self.request}
+        expected = serializerClass(queryset, many=True, context=context).data
+        actual = CompiledSerializer(serializerClass(context=context)).many(queryset)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_restaurant(self):
+        self.assertSameJSON(RestaurantSerializer, Restaurant.objects.prefetch_related("images"))
+
+    def test_compact_restaurant(self):
+        self.assertSameJSON(RestaurantListSerializer, Restaurant.objects.annotate(imageNum=Count("images")))
+
+    def test_review(self):
+        self.assertSameJSON(ReviewSerializer, Review.objects.select_related("uid").prefetch_related("reviewImages"))
+
+
+class NameSearchTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, station in (("무한리필 고기", "사당"), ("고기 무한리필", "사당"), ("무한리필", "강남"), ("Bar 무한", "사당")):
+            Restaurant.objects.create(restaurantName=name, foodCategory="곱창", station=station, uid=self.user,
+                                      latitude=37.47, longitude=126.98, distFromStation=0)
+
+    def search(self, query, **scope):
+        return sorted(Restaurant.objects.get(id=i).restaurantName for i in
+                      namesearch.searchQuerySet(Restaurant.objects.all(), query, **scope).values_list("id", flat=True))
+
+    def test_contains_and_prefix(self):
+        self.assertEqual(self.search("무한리필"), ["고기 무한리필", "무한리필", "무한리필 고기"])
+        self.assertEqual(self.search("무한리필", mode=namesearch.PREFIX), ["무한리필", "무한리필 고기"])
+        self.assertEqual(self.search("리"), ["고기 무한리필", "무한리필", "무한리필 고기"])
+        self.assertEqual(self.search("bar"), ["Bar 무한"])
+        # 모든 gram을 가지고 있어도 이어져 있지 않으면 제외합니다.
+        self.assertEqual(self.search("필고"), [])
+
+    def test_scoped_by_station(self):
+        self.assertEqual(self.search("무한리필", foodCategory="곱창", station="강남"), ["무한리필"])
+
+    def test_index_follows_rename_and_delete(self):
+        restaurant = Restaurant.objects.get(restaurantName="무한리필", station="강남")
+        restaurant.restaurantName = "곱창집"
+        restaurant.save()
+        self.assertEqual(self.search("곱창"), ["곱창집"])
+        restaurant.delete()
+        self.assertEqual(self.search("곱창"), [])
+
+    def test_lazy_until_evaluated(self):
+        # 후보 id는 subquery로 사용되므로 queryset을 만들 때에는 조회하지 않습니다.
+        with CaptureQueriesContext(connection) as queries:
+            queryset = namesearch.searchQuerySet(Restaurant.objects.all(), "무한리필")
+        self.assertEqual(len(queries), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(queryset.count(), 3)
+        self.assertEqual(len(queries), 1)
+
+    def test_migration_backfill_in_chunks(self):
+        migration = importlib.import_module("dining.migrations.0004_restaurantnamegram")
+        RestaurantNameGram.objects.all().delete()
+        migration.indexRestaurantNames(apps, None, chunkSize=2)
+        self.assertEqual(self.search("무한리필"), ["고기 무한리필", "무한리필", "무한리필 고기"])
+        self.assertEqual(RestaurantNameGram.objects.filter(restaurant=self.restaurant).count(),
+                         len(namesearch.nameGrams(self.restaurant.restaurantName)))
+
+    def test_list_api(self):
+        response = self.client.get("/dining/v1/restaurant/", {"restaurantName": "무한", "match": "prefix"})
+        self.assertEqual([r["restaurantName"] for r in response.data["results"]], ["무한리필", "무한리필 고기"])
+
+
+class StationIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patchOnCommit(self, "listcache", "spatial")
+        self.client = APIClient()
+        # 서울 시내의 역 일부로 인덱스를 만듭니다.
+        names = ["사당", "총신대입구(이수)", "강남", "교대", "서울", "시청", "홍대입구", "잠실", "건대입구", "왕십리",
+                 "노원", "신도림", "여의도", "고속터미널", "종로3가", "용산"]
+        for name in names:
+            Station.objects.create(station=name, latitude=stationDict[name][0], longitude=stationDict[name][1])
+
+    def test_nearest_matches_brute_force(self):
+        stations = list(Station.objects.values_list("id", "station", "latitude", "longitude"))
+        for latitude, longitude in [(37.4860, 126.9820), (37.55, 127.0), (37.65, 127.06), (37.3, 126.9)]:
+            expected = sorted((haversine((latitude, longitude), (s[2], s[3])) * 1000, s) for s in stations)[:4]
+            actual = stationIndex.nearest(latitude, longitude, 4)
+            self.assertEqual([s for _, s in actual], [s for _, s in expected])
+            self.assertTrue(np.allclose([d for d, _ in actual], [d for d, _ in expected]))
+        self.assertEqual(len(stationIndex.nearest(37.5, 127.0, 100)), len(stations))
+
+    def test_rebuilt_on_change(self):
+        self.assertEqual(stationIndex.nearest(37.4860, 126.9820, 1)[0][1][1], "총신대입구(이수)")
+        Station.objects.create(station="새 역", latitude=37.4860, longitude=126.9820)
+        self.assertEqual(stationIndex.nearest(37.4860, 126.9820, 1)[0][1][1], "새 역")
+        Station.objects.filter(station="새 역").delete()
+        # QuerySet.delete도 post_delete signal을 보내므로 인덱스를 다시 만듭니다.
+        self.assertEqual(stationIndex.nearest(37.4860, 126.9820, 1)[0][1][1], "총신대입구(이수)")
+
+    def test_list_by_location(self):
+        response = self.client.get("/dining/v1/station/", {"latitude": 37.4860, "longitude": 126.9820,
+                                                           "returnNum": 2})
+        stations = [(s["station"], s["distFromStation"]) for s in response.data["results"]]
+        self.assertEqual([name for name, _ in stations], ["총신대입구(이수)", "사당"])
+        self.assertLess(stations[0][1], stations[1][1])
+        self.assertAlmostEqual(stations[1][1], haversine((37.4860, 126.9820), stationDict["사당"]) * 1000, places=3)
+        # 거리는 응답에만 담고 DB에는 저장하지 않습니다.
+        self.assertEqual(set(Station.objects.values_list("distFromStation", flat=True)), {-1})
+
+
+class DistanceTest(TestCase):
+
+    def test_matches_haversine_package(self):
+        points = [stationDict[name] for name in ["사당", "강남", "서울", "노원", "인천", "춘천"]]
+        origin = stationDict["시청"]
+        expected = [haversine(origin, point) * 1000 for point in points]
+
+        self.assertTrue(np.allclose(distancesFromPoint(origin[0], origin[1], points), expected))
+        self.assertTrue(np.allclose(haversineArray(origin[0], origin[1], *np.array(points).T), expected))
+        self.assertAlmostEqual(distByTwoPoints(origin[0], origin[1], *points[0]), expected[0], places=6)
+        self.assertEqual(float(haversineArray(37.5, 127.0, 37.5, 127.0)), 0)
+
+    def test_shapes(self):
+        pointsA = [stationDict[name] for name in ["사당", "강남", "서울"]]
+        pointsB = [stationDict[name] for name in ["노원", "잠실"]]
+        matrix = pairwiseDistances(pointsA, pointsB)
+        self.assertEqual(matrix.shape, (3, 2))
+        self.assertTrue(np.allclose(matrix[1], distancesFromPoint(pointsA[1][0], pointsA[1][1], pointsB)))
+        self.assertTrue(np.allclose(matrix, pairwiseDistances(pointsB, pointsA).T))
+
+        # 한 지점만 입력해도 배열로 반환합니다.
+        self.assertEqual(distancesFromPoint(37.5, 127.0, (37.5, 127.0)).shape, (1,))
+        self.assertEqual(distancesFromPoint(37.5, 127.0, []).shape, (0,))
+
+
+class StationAutocompleteTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patchOnCommit(self, "listcache", "spatial")
+        self.client = APIClient()
+        Station.objects.create(station="총신대입구(이수)", latitude=37.486263, longitude=126.981989)
+        Station.objects.create(station="사당", latitude=37.47653, longitude=126.981685)
+
+    def names(self, query, **params):
+        return [s["station"] for s in
+                self.client.get("/dining/v1/station/autocomplete/", dict(q=query, **params)).data]
+
+    def test_prefix_and_choseong(self):
+        self.assertEqual(self.names("사당"), ["사당"])
+        self.assertIn("사당", self.names("ㅅㄷ"))
+        self.assertIn("사당", self.names("사ㄷ"))
+        self.assertNotIn("사당", self.names("ㅅㄱ"))
+        self.assertEqual(self.names("이수"), ["총신대입구(이수)"])
+        self.assertEqual(len(self.names("ㅅ", limit=3)), 3)
+
+    def test_limit(self):
+        for i in range(60):
+            Station.objects.create(station="사%02d" % i, latitude=37.5, longitude=127.0)
+        self.assertEqual(len(self.names("사")), 10)
+        self.assertEqual(len(self.names("사", limit="abc")), 10)
+        self.assertEqual(len(self.names("사", limit=1000)), 50)
+        self.assertEqual(len(self.names("사", limit=-5)), 1)
+
+    def test_no_queries_and_rebuilt_on_change(self):
+        self.names("사")
+        with CaptureQueriesContext(connection) as queries:
+            self.names("ㅅ")
+        self.assertEqual(len(queries), 0)
+
+        Station.objects.create(station="쌍문역테스트", latitude=37.648514, longitude=127.034719)
+        self.assertEqual(self.names("쌍문역"), ["쌍문역테스트"])
+
+
+class StationLoaderTest(TestCase):
+
+    def setUp(self):
+        patchOnCommit(self, "listcache", "spatial")
+
+    def test_idempotent_upsert(self):
+        Station.objects.create(station="사당", latitude=0, longitude=0)
+        Station.objects.create(station="사당", latitude=0, longitude=0)
+
+        stations = {"사당": (37.47653, 126.981685), "강남": (37.497952, 127.027619)}
+        report = stationloader.loadStations(stations)
+        self.assertEqual((report["created"], report["updated"], report["duplicates"]), (["강남"], ["사당"], ["사당"]))
+        self.assertEqual(sorted(Station.objects.values_list("station", "latitude", "longitude")),
+                         [("강남", 37.497952, 127.027619), ("사당", 37.47653, 126.981685)])
+
+        # 두 번째 실행에서는 바뀌는 내용이 없습니다.
+        with CaptureQueriesContext(connection) as queries:
+            report = stationloader.loadStations(stations)
+        self.assertEqual(report["unchanged"], 2)
+        self.assertFalse(report["created"] or report["updated"] or report["duplicates"])
+        self.assertFalse([q for q in queries if not q["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE"))])
+
+        report = stationloader.loadStations({"강남": (37.497952, 127.027619)}, deleteMissing=True)
+        self.assertEqual(report["deleted"], ["사당"])
+        self.assertEqual(list(Station.objects.values_list("station", flat=True)), ["강남"])
+
+
+class NearbyStationTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 사당과 이수(총신대입구)는 약 1.1km 떨어져 있습니다.
+        Station.objects.create(station="사당", latitude=37.47653, longitude=126.981685)
+        Station.objects.create(station="총신대입구(이수)", latitude=37.486263, longitude=126.981989)
+        Station.objects.create(station="강남", latitude=37.497952, longitude=127.027619)
+        # 이수역 바로 앞이지만 사당으로 등록된 식당
+        self.near = Restaurant.objects.create(restaurantName="이수 식당", foodCategory="곱창", station="사당",
+                                              uid=self.user, latitude=37.4860, longitude=126.9820, distFromStation=0)
+
+    def names(self, **params):
+        response = self.client.get("/dining/v1/restaurant/", params)
+        return [r["restaurantName"] for r in response.data["results"]]
+
+    def test_rebuild_and_radius_query(self):
+        self.assertEqual(nearby.rebuildNearbyStations(k=2, log=lambda *a: None), 2)
+        self.assertEqual(sorted(RestaurantStation.objects.filter(restaurant=self.near)
+                                .values_list("rank", "station")), [(0, "총신대입구(이수)"), (1, "사당")])
+
+        self.assertEqual(self.names(nearStation="총신대입구(이수)", radius=300), ["이수 식당"])
+        response = self.client.get("/dining/v1/restaurant/", {"nearStation": "총신대입구(이수)", "radius": 300})
+        self.assertLess(response.data["results"][0]["distance"], 50)
+        self.assertEqual(self.names(nearStation="총신대입구(이수)", radius=2000), ["이수 식당", "식당"])
+        self.assertEqual(self.names(nearStation="강남", radius=2000), [])
+
+    def test_vectorized_matches_index(self):
+        stations = list(Station.objects.values_list("id", "station", "latitude", "longitude"))
+        indices, distances = nearby.nearestStations([(37.4860, 126.9820)], stations, k=3)
+        expected = stationIndex.nearest(37.4860, 126.9820, 3)
+        self.assertEqual([stations[i][1] for i in indices[0]], [s[1] for _, s in expected])
+        self.assertTrue(np.allclose(distances[0], [d for d, _ in expected]))
+
+    def test_updated_on_create(self):
+        self.client.post("/dining/v1/restaurant/", {
+            "restaurantName": "새 식당", "foodCategory": "곱창", "station": "사당", "uid": self.user.uid,
+            "latitude": 37.4766, "longitude": 126.9817})
+        self.assertEqual(self.names(nearStation="사당", radius=100), ["새 식당"])
+
+    def test_station_coverage(self):
+        # 사당에서 두 번째로 가까운 다른 역(강남)까지 거리의 절반까지는 가까운 역 2개만으로 빠짐없이 찾습니다.
+        gangnam = stationIndex.nearest(37.47653, 126.981685, 3)[2][0]
+        self.assertAlmostEqual(nearby.stationCoverage("사당", k=2), gangnam / 2)
+        self.assertEqual(nearby.stationCoverage("사당", k=3), float("inf"))
+        self.assertIsNone(nearby.stationCoverage("없는역"))
+
+    def test_invalid_radius(self):
+        nearby.rebuildNearbyStations(k=2, log=lambda *a: None)
+        url = "/dining/v1/restaurant/"
+        self.assertEqual(self.client.get(url, {"nearStation": "사당", "radius": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"nearStation": "사당", "radius": "-1"}).status_code, 400)
+        with mock.patch("dining.nearby.stationCoverage", return_value=500.):
+            self.assertEqual(self.client.get(url, {"nearStation": "사당", "radius": "600"}).status_code, 400)
+            # radius가 없으면 coverage까지 찾습니다.
+            self.assertEqual(self.names(nearStation="사당"), ["식당"])
+
+
+class GeoSearchTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # 기준 식당(self.restaurant)에서 북쪽으로 약 100m 간격으로 식당을 등록합니다.
+        for i in range(1, 8):
+            Restaurant.objects.create(restaurantName="북%d" % i, foodCategory="회/해산물" if i % 2 else "곱창",
+                                      station="사당", uid=self.user, latitude=37.47653 + 0.0009 * i,
+                                      longitude=126.981685, distFromStation=0)
+
+    def collect(self, params):
+        names, url, params = [], "/dining/v1/restaurant/", dict(params, latitude=37.47653, longitude=126.981685)
+        while url:
+            data = self.client.get(url, params).data
+            names += [r["restaurantName"] for r in data["results"]]
+            url, params = data["next"], None
+        return names
+
+    def test_radius_sorted_by_distance_with_cursor(self):
+        with mock.patch.object(GeoKeysetPagination, "page_size", 2):
+            names = self.collect({"radius": 450})
+        self.assertEqual(names, ["식당", "북1", "북2", "북3", "북4"])
+
+    def test_bbox_and_category(self):
+        self.assertEqual(self.collect({"radius": 1000, "foodCategory": "곱창"}), ["식당", "북2", "북4", "북6"])
+
+        response = self.client.get("/dining/v1/restaurant/", {"bbox": "37.4770,126.98,37.4790,126.99"})
+        self.assertEqual(sorted(r["restaurantName"] for r in response.data["results"]), ["북1", "북2"])
+
+    def test_distance_in_response(self):
+        results = self.client.get("/dining/v1/restaurant/", {"latitude": 37.47653, "longitude": 126.981685,
+                                                             "radius": 250}).data["results"]
+        self.assertEqual([r["restaurantName"] for r in results], ["식당", "북1", "북2"])
+        self.assertEqual([round(r["distance"] / 100) for r in results], [0, 1, 2])
+        # 위치 검색이 아니면 distance를 반환하지 않습니다.
+        self.assertNotIn("distance", self.client.get("/dining/v1/restaurant/").data["results"][0])
+
+    def test_invalid_params(self):
+        url = "/dining/v1/restaurant/"
+        for params in ({"latitude": "abc", "longitude": 126.98}, {"latitude": 37.47, "longitude": 126.98, "radius": 5000},
+                       {"latitude": 37.47, "longitude": 126.98, "radius": "nan"}, {"bbox": "37.4,126.9,37.5"},
+                       {"bbox": "37.4,126.9,37.6,127.1"}, {"bbox": "37.49,126.99,37.48,126.98"}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+        # 숫자가 아닌 cursor는 404입니다.
+        pagination = GeoKeysetPagination()
+        cursor = pagination.encodeCursor(["abc", 1])
+        response = self.client.get(url, {"latitude": 37.47653, "longitude": 126.981685, "cursor": cursor})
+        self.assertEqual(response.status_code, 404)
+
+    def test_bounding_box_contains_radius(self):
+        south, west, north, east = geosearch.boundingBox(37.5, 127.0, 1000)
+        self.assertTrue(distByTwoPoints(37.5, 127.0, north, 127.0) >= 999.9)
+        self.assertTrue(distByTwoPoints(37.5, 127.0, 37.5, east) >= 999.9)
+
+
+class ImageVariantTest(RestaurantFixtureMixin, MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.mediaRoot, "dining/2019/01/01"))
+        PIL_Image.new("RGB", (1200, 900), (200, 100, 50)).save(os.path.join(self.mediaRoot, "dining/2019/01/01/a.jpg"))
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        self.image = Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user,
+                                          image="dining/2019/01/01/a.jpg")
+
+    def variants(self):
+        return self.client.get("/dining/v1/image/%d/" % self.image.id).data["imageVariants"]
+
+    def test_make_variants(self):
+        # 파일이 있는지 확인하지 않고 항상 크기/형식 별 URL을 반환합니다.
+        self.assertEqual(self.variants(), {
+            "thumbnail": {"webp": "http://testserver/media/dining/2019/01/01/a.thumbnail.webp",
+                          "jpeg": "http://testserver/media/dining/2019/01/01/a.thumbnail.jpg"},
+            "medium": {"webp": "http://testserver/media/dining/2019/01/01/a.medium.webp",
+                       "jpeg": "http://testserver/media/dining/2019/01/01/a.medium.jpg"},
+        })
+
+        created = thumbnails.makeVariants(os.path.join(self.mediaRoot, "dining/2019/01/01/a.jpg"))
+        self.assertEqual(len(created), 4)
+        with PIL_Image.open(os.path.join(self.mediaRoot, "dining/2019/01/01/a.thumbnail.webp")) as img:
+            self.assertEqual(img.size, (200, 150))
+        # 이미 만든 파일은 다시 만들지 않습니다.
+        self.assertEqual(thumbnails.makeVariants(os.path.join(self.mediaRoot, "dining/2019/01/01/a.jpg")), [])
+
+    def test_serve_makes_missing_variant(self):
+        # 변환은 thumbnailPool에서 합니다. (test에서는 process 대신 thread pool)
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        patcher = mock.patch.object(thumbnails.thumbnailPool, "_getPool", return_value=executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        response = self.client.get("/media/dining/2019/01/01/a.medium.jpg")
+        self.assertEqual(response.status_code, 200)
+        with PIL_Image.open(io.BytesIO(b"".join(response.streaming_content))) as img:
+            self.assertEqual(img.size, (640, 480))
+        self.assertTrue(os.path.exists(os.path.join(self.mediaRoot, "dining/2019/01/01/a.thumbnail.webp")))
+
+        # 원본이 없는 변환 파일과 변환 파일 이름이 아닌 경로는 404입니다.
+        self.assertEqual(self.client.get("/media/dining/2019/01/01/b.medium.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/dining/2019/01/01/a.large.jpg").status_code, 404)
+
+    def test_serve_redirects_while_variant_pending(self):
+        running = Future()
+        with mock.patch.object(thumbnails.thumbnailPool, "_submit", return_value=running) as submit, \
+                mock.patch("dining.mediaserve.MEDIA_VARIANT_WAIT", 0.01):
+            response = self.client.get("/media/dining/2019/01/01/a.thumbnail.webp")
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response["Location"], "/media/dining/2019/01/01/a.jpg")
+            self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
+            # 진행 중인 작업이 있으면 다시 넘기지 않습니다.
+            self.assertEqual(self.client.get("/media/dining/2019/01/01/a.medium.jpg").status_code, 302)
+            self.assertEqual(submit.call_count, 1)
+
+            # 끝난 작업은 목록에서 빠지므로 다음 요청은 새로 넘깁니다.
+            running.set_result([])
+            thumbnails.thumbnailPool.submit("dining/2019/01/01/a.jpg")
+            self.assertEqual(submit.call_count, 2)
+
+    def test_profile_image_variants_only_when_changed(self):
+        os.makedirs(os.path.join(self.mediaRoot, "profile"))
+        PIL_Image.new("RGB", (300, 300)).save(os.path.join(self.mediaRoot, "profile/b.jpg"))
+        patchOnCommit(self, "signals")
+        with mock.patch.object(thumbnails.thumbnailPool, "submit") as submit:
+            user = Users.objects.get(uid=self.user.uid)
+            user.profileImageLink = "profile/b.jpg"
+            user.save()
+            submit.assert_called_once_with("profile/b.jpg")
+
+            # 사진이 그대로이고 변환 파일이 있으면 다시 넘기지 않습니다.
+            thumbnails.makeVariants(os.path.join(self.mediaRoot, "profile/b.jpg"))
+            user.nickname = "다른 이름"
+            user.save()
+            Users.objects.get(uid=self.user.uid).save()
+            Users.objects.only("uid").get(uid=self.user.uid).save(update_fields=["nickname"])
+            self.assertEqual(submit.call_count, 1)
+
+            # 사진이 그대로여도 변환 파일이 없으면 다시 만듭니다.
+            os.remove(os.path.join(self.mediaRoot, "profile/b.thumbnail.webp"))
+            user.save()
+            self.assertEqual(submit.call_count, 2)
+
+    def test_exif_orientation(self):
+        path = os.path.join(self.mediaRoot, "dining/2019/01/01/rotated.jpg")
+        exif = PIL_Image.Exif()
+        # Orientation 6 : 시계 방향으로 90도 회전해서 보여야 하는 사진
+        exif[0x0112] = 6
+        PIL_Image.new("RGB", (1200, 900)).save(path, exif=exif)
+        thumbnails.makeVariants(path)
+        with PIL_Image.open(os.path.join(self.mediaRoot, "dining/2019/01/01/rotated.thumbnail.jpg")) as img:
+            self.assertEqual(img.size, (150, 200))
+
+        # ImageOps.exif_transpose가 없는 Pillow(6.0 이전)에서는 Orientation tag를 직접 읽어 회전합니다.
+        with mock.patch("dining.thumbnails.ImageOps", spec=[]):
+            thumbnails.makeVariants(path, overwrite=True)
+            # Orientation이 없는 사진은 그대로 사용합니다.
+            with PIL_Image.open(os.path.join(self.mediaRoot, "dining/2019/01/01/a.jpg")) as img:
+                self.assertIs(thumbnails.exifTranspose(img), img)
+        with PIL_Image.open(os.path.join(self.mediaRoot, "dining/2019/01/01/rotated.medium.webp")) as img:
+            self.assertEqual(img.size, (480, 640))
+
+    def test_pool_failures_are_logged(self):
+        pool = thumbnails.ThumbnailPool()
+        broken = mock.Mock()
+        broken.submit.side_effect = RuntimeError("broken pool")
+        with mock.patch.object(pool, "_getPool", return_value=broken), \
+                mock.patch("dining.thumbnails.logger") as logger:
+            # 작업을 넘기지 못해도 요청은 실패하지 않습니다.
+            self.assertIsNone(pool.submit("dining/2019/01/01/a.jpg"))
+            self.assertIsInstance(pool.map(["dining/2019/01/01/a.jpg"])[0], RuntimeError)
+        self.assertEqual(logger.exception.call_count, 2)
+        broken.shutdown.assert_called_with(wait=False)
+
+        future = mock.Mock()
+        future.cancelled.return_value = False
+        future.exception.return_value = OSError("broken image")
+        with mock.patch("dining.thumbnails.logger") as logger:
+            thumbnails.ThumbnailPool._logFailure(future, "dining/2019/01/01/a.jpg")
+        self.assertEqual(logger.error.call_count, 1)
+
+
+class MediaServeTest(MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 40
+        self.hashName = "dining/" + "ab" * 32 + ".jpg"
+        for name in ("dining/a.jpg", self.hashName):
+            os.makedirs(os.path.dirname(os.path.join(self.mediaRoot, name)), exist_ok=True)
+            with open(os.path.join(self.mediaRoot, name), "wb") as f:
+                f.write(self.content)
+
+    def test_full_and_not_modified(self):
+        response = self.client.get("/media/dining/a.jpg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+
+        response = self.client.get("/media/dining/a.jpg", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+        # hash 이름의 파일은 영구히 cache 합니다.
+        response = self.client.get("/media/" + self.hashName)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_range(self):
+        response = self.client.get("/media/dining/a.jpg", HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[100:200])
+        self.assertEqual(response["Content-Range"], "bytes 100-199/%d" % len(self.content))
+        self.assertEqual(response["Content-Length"], "100")
+
+        response = self.client.get("/media/dining/a.jpg", HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get("/media/dining/a.jpg", HTTP_RANGE="bytes=%d-" % len(self.content))
+        self.assertEqual(response.status_code, 416)
+
+        # 파일이 바뀌었다면(If-Range 불일치) 전체를 전송합니다.
+        response = self.client.get("/media/dining/a.jpg", HTTP_RANGE="bytes=0-9",
+                                   HTTP_IF_RANGE="Mon, 01 Jan 2018 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_content_addressed_etag(self):
+        url = "/media/" + self.hashName
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(etag, '"%s"' % os.path.basename(self.hashName))
+
+        # 같은 내용이 다시 업로드되어 수정 시각이 바뀌어도 다시 받지 않습니다.
+        os.utime(os.path.join(self.mediaRoot, self.hashName), (2e9, 2e9))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2018 00:00:00 GMT").status_code, 304)
+
+        # 이어받기(If-Range)도 수정 시각이 아니라 ETag로 확인합니다.
+        for ifRange, status in [(etag, 206), ("Mon, 01 Jan 2018 00:00:00 GMT", 206), ('"other"', 200),
+                                ("W/" + etag, 200)]:
+            response = self.client.get(url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=ifRange)
+            self.assertEqual(response.status_code, status, ifRange)
+
+        # hash 이름이 아닌 파일에는 ETag를 붙이지 않습니다.
+        self.assertNotIn("ETag", self.client.get("/media/dining/a.jpg"))
+
+    def test_accel_redirect_quotes_path(self):
+        name = "dining/한글 이름.jpg"
+        with open(os.path.join(self.mediaRoot, name), "wb") as f:
+            f.write(self.content)
+        with mock.patch("dining.mediaserve.MEDIA_ACCEL_REDIRECT", "/protected-media/"):
+            response = serveMedia(APIRequestFactory().get("/"), name)
+        self.assertEqual(response["X-Accel-Redirect"],
+                         "/protected-media/dining/%ED%95%9C%EA%B8%80%20%EC%9D%B4%EB%A6%84.jpg")
+
+    def test_not_found(self):
+        self.assertEqual(self.client.get("/media/dining/none.jpg").status_code, 404)
+        self.assertEqual(self.client.get("/media/dining/").status_code, 404)
+        # MEDIA_ROOT 밖의 파일은 전송하지 않습니다.
+        with self.assertRaises(Http404):
+            serveMedia(APIRequestFactory().get("/"), "../../etc/passwd")
+
+
+class ContentAddressedImageTest(RestaurantFixtureMixin, MediaRootMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+
+    def upload(self, filename, color):
+        content = io.BytesIO()
+        PIL_Image.new("RGB", (64, 64), color).save(content, "JPEG")
+        response = self.client.post("/dining/v1/image/", {
+            "image": SimpleUploadedFile(filename, content.getvalue(), content_type="image/jpeg"),
+            "restaurant": self.restaurant.id, "review": self.review.id, "uid": self.user.uid,
+        }, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        return Image.objects.get(id=response.data["id"])
+
+    def test_same_content_shares_file(self):
+        first = self.upload("a.jpg", (255, 0, 0))
+        second = self.upload("b.JPEG", (255, 0, 0))
+        third = self.upload("c.jpg", (0, 0, 255))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, third.image.name)
+        self.assertRegex(first.image.name, r"^dining/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertEqual(contentHash(first.image.name), first.image.name[10:74])
+
+        # 같은 내용의 파일은 하나만 저장되고, 임시 파일은 남지 않습니다.
+        stored = [name for _, _, files in os.walk(self.mediaRoot) for name in files]
+        self.assertEqual(sorted(stored), sorted({os.path.basename(first.image.name),
+                                                 os.path.basename(third.image.name)}))
+
+    def test_unreferenced_names(self):
+        kept = self.upload("a.jpg", (255, 0, 0))
+        deleted = self.upload("b.jpg", (0, 0, 255))
+        thumbnails.makeVariants(contentAddressedStorage.path(deleted.image.name))
+        deleted.delete()
+
+        digests = {contentHash(kept.image.name)}
+        names = sorted(contentAddressedStorage.unreferencedNames(digests))
+        self.assertEqual(names, sorted([deleted.image.name] + list(thumbnails.variantNames(deleted.image.name).values())))
+        # 최근에 저장된 파일은 업로드 중일 수 있으므로 남겨 둡니다.
+        self.assertEqual(list(contentAddressedStorage.unreferencedNames(digests, minAge=3600)), [])
+
+        # 같은 내용을 다시 올리면 기존 파일의 수정 시각을 갱신합니다.
+        os.utime(contentAddressedStorage.path(kept.image.name), (0, 0))
+        self.upload("c.jpg", (255, 0, 0))
+        self.assertGreater(os.path.getmtime(contentAddressedStorage.path(kept.image.name)), 0)
+
+    def test_classification_reused_per_hash(self):
+        first = self.upload("a.jpg", (255, 0, 0))
+        second = self.upload("b.jpg", (255, 0, 0))
+        third = self.upload("c.jpg", (0, 0, 255))
+        fourth = self.upload("d.jpg", (0, 0, 255))
+        Image.objects.filter(id=first.id).update(category=1)
+
+        model = mock.Mock()
+        model.predict.side_effect = lambda images, batch_size: np.tile([0., 0., 1.], (len(images), 1))
+        classifier = BatchClassifier(model, "", log=lambda message: None)
+        classifier.run([(image.id, self.restaurant.id, image.image.name) for image in (second, third, fourth)])
+
+        # 분류된 파일은 결과를 사용하고, 같은 파일은 한 번만 predict 합니다.
+        self.assertEqual(model.predict.call_count, 1)
+        self.assertEqual(len(model.predict.call_args[0][0]), 1)
+        self.assertEqual((classifier.classified, classifier.predicted), (3, 1))
+        self.assertEqual(dict(Image.objects.values_list("id", "category")),
+                         {first.id: 1, second.id: 1, third.id: 2, fourth.id: 2})
+
+
+class TensorCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def tensor(self, value):
+        return np.full((224, 224, 3), value, dtype=np.uint8)
+
+    def test_persist_and_grow(self):
+        with mock.patch.object(tensorcache, "GROW_SLOTS", 2):
+            cache_ = TensorCache(self.directory)
+            for i in range(5):
+                cache_.put("a%d.jpg" % i, self.tensor(i))
+            cache_.flush()
+            # flush 하지 않은 tensor는 다음 실행에서 보이지 않습니다.
+            cache_.put("pending.jpg", self.tensor(9))
+
+        reopened = TensorCache(self.directory)
+        self.assertEqual(len(reopened), 5)
+        self.assertNotIn("pending.jpg", reopened)
+        self.assertTrue((reopened.get("a3.jpg") == 3).all())
+        self.assertIsInstance(reopened.get("a3.jpg"), np.memmap)
+        self.assertIsNone(reopened.get("none.jpg"))
+        self.assertEqual((reopened.hits, reopened.misses), (2, 1))
+
+        # 비어 있는 slot을 다시 사용합니다.
+        reopened.put("b.jpg", self.tensor(7))
+        self.assertEqual(reopened.index["b.jpg"], 5)
+
+    def test_get_while_growing(self):
+        # put이 파일을 늘리며 memmap을 바꾸는 동안 다른 thread의 get도 저장된 값을 읽습니다.
+        with mock.patch.object(tensorcache, "GROW_SLOTS", 1):
+            cache_ = TensorCache(self.directory)
+            cache_.put("a0.jpg", self.tensor(0))
+            errors = []
+
+            def read():
+                for _ in range(200):
+                    if not (cache_.get("a0.jpg") == 0).all():
+                        errors.append(1)
+
+            readers = [threading.Thread(target=read) for _ in range(3)]
+            for reader in readers:
+                reader.start()
+            for i in range(1, 30):
+                cache_.put("a%d.jpg" % i, self.tensor(i))
+            for reader in readers:
+                reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache_.hits, 600)
+
+    def test_classifier_reads_cached_tensors(self):
+        model = mock.Mock()
+        model.predict.side_effect = lambda images, batch_size: np.tile([1., 0., 0.], (len(images), 1))
+        rows = [(1, 1, "dining/a.jpg"), (2, 1, "dining/b.jpg")]
+
+        with mock.patch("dining.classifier.loadImage", side_effect=lambda name: self.tensor(len(name))) as loadImage, \
+                mock.patch.object(BatchClassifier, "save"):
+            BatchClassifier(model, "", log=lambda message: None, tensorCache=TensorCache(self.directory)).run(rows)
+            self.assertEqual(loadImage.call_count, 2)
+
+            # 다음 실행에서는 이미지를 다시 읽지 않고 cache의 tensor로 predict 합니다.
+            cache_ = TensorCache(self.directory)
+            BatchClassifier(model, "", log=lambda message: None, tensorCache=cache_).run(rows)
+            self.assertEqual(loadImage.call_count, 2)
+            self.assertEqual(cache_.hits, 2)
+            self.assertTrue((model.predict.call_args[0][0] == len("dining/a.jpg") / 255.).all())
+
+
+class IncrementalClassifierTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpointPath = os.path.join(directory, "checkpoint.json")
+
+        # 파일 이름의 숫자를 category로 분류하는 모델, missing으로 시작하는 파일은 읽지 못합니다.
+        self.model = mock.Mock()
+        self.model.predict.side_effect = lambda images, batch_size: np.array(
+            [np.eye(3)[int(round(img[0, 0, 0] * 255))] for img in images])
+        patcher = mock.patch("dining.classifier.loadImage", side_effect=lambda name: None if "missing" in name
+                             else np.full((224, 224, 3), int(name.split("-")[1][0]), dtype=np.uint8))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def createImages(self, *names):
+        return [Image.objects.create(restaurant=self.restaurant, review=self.review, uid=self.user, image=name)
+                for name in names]
+
+    def classifier(self):
+        return BatchClassifier(self.model, "http://base", batchSize=2, workers=2, log=lambda message: None,
+                               version="v1")
+
+    def categories(self):
+        return dict(Image.objects.values_list("id", "category"))
+
+    def test_batch_classifier(self):
+        images = self.createImages("dining/a-1.jpg", "dining/missing-0.jpg", "dining/b-0.jpg", "dining/b-0.jpg")
+        classifier = self.classifier().run([(image.id, self.restaurant.id, image.image.name) for image in images])
+
+        # batch 안의 같은 파일은 한 번만 predict 하고, 읽지 못한 이미지는 미분류로 남깁니다.
+        self.assertEqual((classifier.classified, classifier.predicted, classifier.failed), (3, 2, [images[1].id]))
+        self.assertEqual(self.categories(), {images[0].id: 1, images[1].id: -1, images[2].id: 0, images[3].id: 0})
+        image = Image.objects.get(id=images[3].id)
+        self.assertEqual((image.modelVersion, json.loads(image.confidences)), ("v1", [1., 0., 0.]))
+        # 대표이미지가 없던 식당은 가장 먼저 등록된 음식 이미지를 대표이미지로 사용합니다.
+        self.assertEqual(Restaurant.objects.get(id=self.restaurant.id).representativeImage,
+                         "http://base/media/dining/b-0.jpg")
+
+    def test_pending_chunks(self):
+        images = self.createImages(*["dining/a-%d.jpg" % (i % 3) for i in range(5)])
+        Image.objects.filter(id=images[1].id).update(category=0)
+
+        chunks = list(pendingChunks(images[0].id, chunkSize=2, exclude=[images[3].id]))
+        self.assertEqual([[row[0] for row in chunk] for chunk in chunks], [[images[2].id, images[4].id]])
+        chunks = list(pendingChunks(chunkSize=2))
+        self.assertEqual([[row[0] for row in chunk] for chunk in chunks],
+                         [[images[0].id, images[2].id], [images[3].id, images[4].id]])
+
+    def test_checkpoint(self):
+        checkpoint = Checkpoint(self.checkpointPath)
+        self.assertEqual((checkpoint.highWaterMark, checkpoint.failed), (0, []))
+        checkpoint.highWaterMark, checkpoint.failed = 10, [3, 7]
+        checkpoint.save()
+
+        reopened = Checkpoint(self.checkpointPath)
+        self.assertEqual((reopened.highWaterMark, reopened.failed), (10, [3, 7]))
+        self.assertFalse(os.path.exists(self.checkpointPath + ".tmp"))
+
+    def test_run_incremental(self):
+        images = self.createImages("dining/a-0.jpg", "dining/missing-0.jpg", "dining/c-1.jpg")
+        checkpoint = Checkpoint(self.checkpointPath)
+        runIncremental(self.classifier(), checkpoint, chunkSize=2)
+        self.assertEqual((checkpoint.highWaterMark, checkpoint.failed), (images[2].id, [images[1].id]))
+        self.assertEqual(Checkpoint(self.checkpointPath).highWaterMark, images[2].id)
+
+        # 다음 실행에서는 새 이미지만 분류하고, 읽지 못한 이미지는 다시 시도하지 않습니다.
+        newImage, = self.createImages("dining/d-2.jpg")
+        classifier = runIncremental(self.classifier(), Checkpoint(self.checkpointPath), chunkSize=2)
+        self.assertEqual((classifier.classified, classifier.failed), (1, []))
+        self.assertEqual(self.categories()[newImage.id], 2)
+
+        # retryFailed이면 failed 이미지를 먼저 다시 분류합니다.
+        Image.objects.filter(id=images[1].id).update(image="dining/found-1.jpg")
+        checkpoint = Checkpoint(self.checkpointPath)
+        runIncremental(self.classifier(), checkpoint, chunkSize=2, retryFailed=True)
+        self.assertEqual((checkpoint.failed, self.categories()[images[1].id]), ([], 1))
+
+    def test_run_incremental_rescans_late_commits(self):
+        images = self.createImages("dining/a-0.jpg", "dining/b-1.jpg", "dining/c-2.jpg")
+        # 두 번째 이미지는 checkpoint를 저장한 뒤에 commit 된 것으로 둡니다.
+        Image.objects.filter(id=images[1].id).update(category=0)
+        checkpoint = Checkpoint(self.checkpointPath)
+        runIncremental(self.classifier(), checkpoint, chunkSize=2)
+        self.assertEqual(checkpoint.highWaterMark, images[2].id)
+
+        Image.objects.filter(id=images[1].id).update(category=-1)
+        classifier = runIncremental(self.classifier(), checkpoint, chunkSize=2)
+        self.assertEqual(classifier.classified, 1)
+        self.assertEqual(self.categories()[images[1].id], 1)
+        self.assertEqual(checkpoint.highWaterMark, images[2].id)
+
+        # rescanWindow 밖의 id는 다시 조회하지 않습니다.
+        Image.objects.filter(id=images[1].id).update(category=-1)
+        classifier = runIncremental(self.classifier(), checkpoint, chunkSize=2,
+                                    rescanWindow=images[2].id - images[1].id)
+        self.assertEqual(classifier.classified, 0)
+
+
+class ReclassifyTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        self.images = [Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user,
+                                            image="dining/%d.jpg" % i, category=category, modelVersion="old")
+                       for i, category in enumerate([0, 1, 0])]
+        Restaurant.objects.filter(id=self.restaurant.id).update(
+            representativeImage="http://old/media/" + self.images[0].image.name)
+
+    def test_updates_only_changed_rows(self):
+        # 새 모델 : 0.jpg -> menu, 1.jpg -> food, 2.jpg -> food
+        newCategories = {0: 1, 1: 0, 2: 0}
+        model = mock.Mock()
+        model.predict.side_effect = lambda images, batch_size: np.array(
+            [np.eye(3)[newCategories[int(round(img[0, 0, 0] * 255))]] * 0.9 + 0.03 for img in images])
+
+        with mock.patch("dining.classifier.loadImage",
+                        side_effect=lambda name: np.full((224, 224, 3), int(name[7]), dtype=np.uint8)):
+            classifier = BatchClassifier(model, "http://new", log=lambda message: None, version="v2", reclassify=True)
+            runReclassify(classifier, Checkpoint(os.path.join(tempfile.mkdtemp(), "checkpoint.json")), chunkSize=2)
+
+        self.assertEqual((classifier.classified, classifier.changed), (3, 2))
+        rows = {image.id: (image.category, image.modelVersion) for image in Image.objects.all()}
+        self.assertEqual(rows, {self.images[0].id: (1, "v2"), self.images[1].id: (0, "v2"),
+                                self.images[2].id: (0, "old")})
+        self.assertEqual(json.loads(Image.objects.get(id=self.images[1].id).confidences), [0.93, 0.03, 0.03])
+
+        # 대표이미지였던 0.jpg가 메뉴로 바뀌었으므로 가장 먼저 등록된 음식 이미지(1.jpg)로 바꿉니다.
+        self.assertEqual(Restaurant.objects.get(id=self.restaurant.id).representativeImage,
+                         "http://new/media/dining/1.jpg")
+
+
+class ClassificationWorkerTest(RestaurantFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        review = Review.objects.create(restaurant=self.restaurant, uid=self.user, content="리뷰")
+        self.images = [Image.objects.create(restaurant=self.restaurant, review=review, uid=self.user,
+                                            image="dining/%d.jpg" % i) for i in range(3)]
+        for image in self.images:
+            worker.enqueue(image)
+
+        # 두 번째 이미지는 읽지 못한 것으로 기록하는 classifier
+        self.classifier = mock.Mock(failed=[])
+        self.classifier.run.side_effect = lambda rows: self.classifier.failed.append(rows[1][0])
+        self.log = mock.Mock()
+        self.worker = worker.ClassificationWorker(self.classifier, batchSize=2, maxWait=0, log=self.log)
+
+    def test_run_once(self):
+        self.assertEqual(self.worker.runOnce(), 2)
+        self.classifier.run.assert_called_with([[image.id, self.restaurant.id, image.image.name]
+                                                for image in self.images[:2]])
+        self.assertEqual(list(ClassificationQueue.objects.values_list("image_id", flat=True)), [self.images[2].id])
+        self.log.assert_called_with("failed to load images : %s" % [self.images[1].id])
+
+        # 읽지 못한 이미지 목록은 batch 마다 새로 모읍니다.
+        self.classifier.run.side_effect = None
+        self.assertEqual(self.worker.runOnce(), 1)
+        self.assertEqual(self.classifier.failed, [])
+        self.assertEqual(self.worker.runOnce(), 0)
+
+    def test_run_forever_survives_errors(self):
+        # 첫 번째 분류가 실패해도 worker는 멈추지 않고, 대기열의 항목을 다시 분류합니다.
+        self.classifier.run.side_effect = [RuntimeError("connection lost"), None, None]
+        # 대기열이 비어 두 번째로 쉬려고 할 때 멈춥니다.
+        with mock.patch("dining.worker.close_old_connections"), \
+                mock.patch("dining.worker.time.sleep", side_effect=[None, SystemExit]):
+            with self.assertRaises(SystemExit):
+                self.worker.runForever()
+        self.assertIn("connection lost", self.log.call_args_list[0][0][0])
+        self.assertEqual(self.classifier.run.call_count, 3)
+        self.assertFalse(ClassificationQueue.objects.exists())
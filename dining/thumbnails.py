@@ -0,0 +1,222 @@
+# dining/thumbnails.py
+import atexit
+import glob
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image as PIL_Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# 만들어 둘 크기 : {이름: 최대 (가로, 세로)}, 비율을 유지한 채 범위 안으로 줄입니다.
+VARIANT_SIZES = getattr(settings, "IMAGE_VARIANT_SIZES", {
+    "thumbnail": (200, 200),
+    "medium": (640, 640),
+})
+
+# 저장 형식 : {형식 이름: (파일 확장자, PIL format, 저장 옵션)}
+VARIANT_FORMATS = {
+    "webp": ("webp", "WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", "JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+# 변환에 사용하는 process 수
+THUMBNAIL_WORKERS = getattr(settings, "THUMBNAIL_WORKERS", 2)
+
+# EXIF Orientation tag와 값 별로 바르게 보이도록 하는 변환
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: PIL_Image.FLIP_LEFT_RIGHT,
+    3: PIL_Image.ROTATE_180,
+    4: PIL_Image.FLIP_TOP_BOTTOM,
+    5: PIL_Image.TRANSPOSE,
+    6: PIL_Image.ROTATE_270,
+    7: PIL_Image.TRANSVERSE,
+    8: PIL_Image.ROTATE_90,
+}
+
+
+def variantName(name, variant, fmt):
+    '''
+    원본 파일 이름으로 크기/형식 별 파일 이름을 만듭니다. 원본과 같은 폴더에 저장합니다.
+
+    ---
+    + dining/2019/01/01/a.jpg -> dining/2019/01/01/a.thumbnail.webp
+    '''
+    extension = VARIANT_FORMATS[fmt][0]
+    return "%s.%s.%s" % (os.path.splitext(name)[0], variant, extension)
+
+
+def variantNames(name):
+    # {(크기 이름, 형식 이름): 파일 이름}
+    return {(variant, fmt): variantName(name, variant, fmt) for variant in VARIANT_SIZES for fmt in VARIANT_FORMATS}
+
+
+def hasVariants(name):
+    # media 기준 파일 이름(name)의 크기/형식 별 파일이 모두 있는지 확인합니다.
+    return all(default_storage.exists(variant) for variant in variantNames(name).values())
+
+
+def variantSource(path):
+    '''
+    크기/형식 별 파일 경로(path)의 원본 파일 경로를 찾습니다. 변환 파일 이름이 아니거나 원본이 없으면 None을 반환합니다.
+
+    ---
+    + dining/2019/01/01/a.thumbnail.webp -> dining/2019/01/01/a.jpg (원본의 확장자는 파일을 찾아서 정합니다.)
+    '''
+    stem, variant, extension = (path.rsplit(".", 2) + ["", ""])[:3]
+    if variant not in VARIANT_SIZES or extension not in [ext for ext, _, _ in VARIANT_FORMATS.values()]:
+        return None
+    for candidate in sorted(glob.glob(glob.escape(stem) + ".*")):
+        if candidate.count(".") == stem.count(".") + 1 and not candidate.endswith(".tmp"):
+            return candidate
+    return None
+
+
+def exifTranspose(image):
+    '''
+    사진의 EXIF Orientation에 맞게 회전/반전한 이미지를 반환합니다.
+
+    ---
+    + ImageOps.exif_transpose는 Pillow 6.0부터 있으므로, 없으면 Orientation tag를 직접 읽어 변환합니다.
+    '''
+    if hasattr(ImageOps, "exif_transpose"):
+        return ImageOps.exif_transpose(image)
+    try:
+        exif = image._getexif() if hasattr(image, "_getexif") else None
+    except Exception:
+        # EXIF가 깨진 사진은 그대로 사용합니다.
+        exif = None
+    method = ORIENTATION_TRANSPOSE.get((exif or {}).get(EXIF_ORIENTATION))
+    return image.transpose(method) if method is not None else image
+
+
+def makeVariants(path, overwrite=False):
+    '''
+    원본 이미지 파일(path)로 크기/형식 별 파일을 만들어 같은 폴더에 저장하고, 만든 파일 경로 목록을 반환합니다.
+
+    ---
+    + worker process에서 실행되므로 Django 설정 없이 파일 경로만 사용합니다.
+    + 이미 있는 파일은 overwrite가 True일 때만 다시 만듭니다.
+    + 사진의 EXIF Orientation에 맞게 회전한 뒤 줄입니다. (변환 파일에는 EXIF를 저장하지 않습니다.)
+    + 저장 도중 중단되어도 깨진 파일이 남지 않도록 임시 파일에 쓴 뒤 교체합니다.
+        + 같은 파일을 여러 곳(pool, 요청)에서 동시에 만들 수 있으므로 임시 파일 이름은 process/thread 별로 다르게 합니다.
+    '''
+    targets = variantNames(path)
+    if not overwrite:
+        targets = {key: target for key, target in targets.items() if not os.path.exists(target)}
+    if not targets:
+        return []
+
+    with PIL_Image.open(path) as original:
+        original = exifTranspose(original).convert("RGB")
+
+    created = []
+    # 큰 크기부터 줄여 가며 다음 크기의 입력으로 사용합니다.
+    for variant, size in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1][0]):
+        resized = original.copy()
+        resized.thumbnail(size, PIL_Image.LANCZOS)
+        for fmt, (_, pilFormat, options) in VARIANT_FORMATS.items():
+            target = targets.get((variant, fmt))
+            if target is None:
+                continue
+            tmpPath = "%s.%d-%d.tmp" % (target, os.getpid(), threading.get_ident())
+            resized.save(tmpPath, pilFormat, **options)
+            os.replace(tmpPath, target)
+            created.append(target)
+        original = resized
+    return created
+
+
+class ThumbnailPool:
+    '''
+    업로드된 이미지의 크기/형식 별 파일을 process pool에서 만드는 작업 대기열
+
+    ---
+    + submit(name) : media 기준 파일 이름을 받아 변환 작업을 넘기고 바로 future를 반환합니다.
+        + 같은 파일의 작업이 진행 중이면 그 future를 반환하므로, 동시에 요청되어도 한 번만 변환합니다.
+        + 변환이 실패하면 기록만 합니다. 만들어지지 않은 파일은 처음 요청될 때 serveMedia에서 다시 submit 합니다.
+        + pool이 깨져(BrokenProcessPool) 작업을 넘기지 못하면 기록하고 None을 반환하며, 다음 submit 때 pool을 새로 만듭니다.
+    + pool은 처음 submit 할 때 만들고, 프로세스가 종료될 때 남은 작업을 마친 뒤 정리합니다.
+    '''
+
+    def __init__(self, workers=THUMBNAIL_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = None
+        # 진행 중인 작업 : {원본 파일 경로: future}, 이미 done인 future의 callback은 바로 실행되므로 RLock을 사용합니다.
+        self._runningLock = threading.RLock()
+        self._running = {}
+
+    def submit(self, name):
+        # 같은 파일의 작업이 진행 중이면 새로 넘기지 않고 진행 중인 future를 반환합니다.
+        path = default_storage.path(name)
+        with self._runningLock:
+            future = self._running.get(path)
+            if future is None:
+                future = self._submit(path, name)
+                if future is not None:
+                    self._running[path] = future
+                    future.add_done_callback(lambda f: self._finish(f, path, name))
+        return future
+
+    def _submit(self, path, name):
+        pool = self._getPool()
+        try:
+            return pool.submit(makeVariants, path)
+        except Exception:
+            logger.exception("thumbnail submit failed : %s", name)
+            self._reset(pool)
+            return None
+
+    def map(self, names):
+        # 여러 이미지를 한 번에 변환합니다. 결과는 이미지 순서대로 (만든 파일 목록 또는 예외)를 반환합니다.
+        futures = [self.submit(name) for name in names]
+        results = []
+        for future in futures:
+            try:
+                if future is None:
+                    raise RuntimeError("thumbnail pool is not available")
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _finish(self, future, path, name):
+        with self._runningLock:
+            if self._running.get(path) is future:
+                del self._running[path]
+        self._logFailure(future, name)
+
+    @staticmethod
+    def _logFailure(future, name):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("thumbnail failed : %s", name, exc_info=future.exception())
+
+    def _reset(self, pool):
+        # 깨진 pool을 버리고 다음 submit 때 새로 만듭니다.
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _getPool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+                atexit.register(self.shutdown)
+            return self._pool
+
+
+# 프로세스 당 하나의 pool을 공유합니다.
+thumbnailPool = ThumbnailPool()
@@ -1,14 +1,14 @@
-from haversine import haversine
+from .distance import haversineArray
 
 # haversine 거리를 사용하여 식당과 역과의 거리를 반환
 def dist(restaurant_lat, restaurant_long, station):
-   # 단위는 m로 바꿔서 리턴
-   return haversine((restaurant_lat, restaurant_long), stationDict[station]) * 1000
+   # 단위는 m로 리턴
+   return float(haversineArray(restaurant_lat, restaurant_long, *stationDict[station]))
 
 # haversine 거리를 사용하여 식당과 역과의 거리를 반환함. 입력은 식당과
 def distByTwoPoints(resLatitude, resLongitude, stationLatitude, stationLongitude):
-   # 단위는 m로 바꿔서 리턴
-   return haversine((resLatitude, resLongitude), (stationLatitude, stationLongitude)) * 1000
+   # 단위는 m로 리턴
+   return float(haversineArray(resLatitude, resLongitude, stationLatitude, stationLongitude))
 
 # image base url
 base_url = "http://localhost:8000"
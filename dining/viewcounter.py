@@ -0,0 +1,132 @@
+# dining/viewcounter.py
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .bulk import bulkIncrementById
+from .models import Restaurant
+from . import listcache
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedCounter:
+    '''
+    조회수처럼 자주 증가하는 카운터를 메모리에 모아 두었다가 한 번에 DB에 반영하는 write-behind 카운터
+
+    ---
+    + hit(pk) : pk의 카운터를 메모리에서 증가시킵니다. 요청 thread에서는 DB에 쓰지 않습니다.
+    + background thread가 flushInterval 초마다, 또는 flushHits 번 hit이 쌓이면 바로 flush() 합니다.
+        + thread는 첫 hit 때 process마다 시작하므로 fork 된 worker process에서도 동작합니다.
+        + flush 중 오류가 나면 기록만 하고, 증가분은 버퍼에 남겨 다음 주기에 다시 반영합니다.
+    + flush() : 모인 증가분을 id 별 CASE 식을 사용한 UPDATE 한 번으로 DB에 더합니다.
+    + 프로세스가 정상 종료될 때(atexit) thread를 멈추고 남은 증가분을 flush 합니다.
+        + SIGKILL 등으로 강제 종료되면 마지막 flushInterval 초 동안의 증가분은 반영되지 않습니다.
+    + onFlush : DB에 반영한 뒤 반영된 pk 목록으로 호출할 함수 (옵션)
+    '''
+
+    def __init__(self, model, field, flushInterval=10, flushHits=100, onFlush=None):
+        self.model = model
+        self.field = field
+        self.flushInterval = flushInterval
+        self.flushHits = flushHits
+        self.onFlush = onFlush
+
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._hits = 0
+
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._threadPid = None
+
+        atexit.register(self.stop)
+
+    def hit(self, pk, n=1):
+        with self._lock:
+            self._pending[pk] += n
+            self._hits += 1
+            due = self._hits >= self.flushHits
+
+        self.start()
+        if due:
+            self._wake.set()
+
+    def start(self):
+        # flush thread가 이 process에서 실행 중이 아니면 시작합니다. (fork 된 process에는 thread가 복사되지 않습니다.)
+        if self._threadPid == os.getpid():
+            return
+        with self._lock:
+            if self._threadPid == os.getpid():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="BufferedCounter-%s" % self.field, daemon=True)
+            self._threadPid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        # flush thread를 멈추고 남은 증가분을 반영합니다.
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._threadPid == os.getpid():
+            self._thread.join()
+        self._thread = self._threadPid = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flushInterval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("%s.%s flush failed", self.model.__name__, self.field)
+            finally:
+                # thread의 DB 연결은 요청이 끝날 때 정리되지 않으므로 직접 정리합니다.
+                close_old_connections()
+
+    def pending(self, pk):
+        '''아직 DB에 반영되지 않은 pk의 증가분을 반환합니다.'''
+        with self._lock:
+            return self._pending.get(pk, 0)
+
+    def flush(self):
+        # 모인 증가분을 꺼내고 버퍼를 비웁니다.
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+            self._hits = 0
+
+        if not batch:
+            return 0
+
+        try:
+            updated = bulkIncrementById(self.model, self.field, batch)
+        except Exception:
+            # 반영에 실패한 증가분은 다음 flush 때 다시 반영하도록 버퍼에 되돌려 놓습니다.
+            with self._lock:
+                self._pending.update(batch)
+            raise
+
+        if self.onFlush is not None:
+            self.onFlush(list(batch))
+        return updated
+
+
+# Restaurant 상세 조회 시 증가하는 조회수(searchNum) 카운터
+# 조회수가 DB에 반영되면 식당 상세의 ETag만 바꿉니다.
+# 식당 리스트의 조회수는 근사값으로 보고 리스트 cache/ETag는 바꾸지 않으므로, flush 마다 많이 조회되는 리스트의 cache가 비워지지 않습니다.
+# (리스트의 조회수는 cache가 만료되거나 다른 쓰기로 version이 바뀔 때 갱신됩니다.)
+searchNumCounter = BufferedCounter(
+    Restaurant, "searchNum",
+    flushInterval=getattr(settings, "SEARCH_NUM_FLUSH_INTERVAL", 10),
+    flushHits=getattr(settings, "SEARCH_NUM_FLUSH_HITS", 100),
+    onFlush=listcache.bumpRestaurantDetails,
+)
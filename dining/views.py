@@ -1,18 +1,29 @@
 # dining/views.py
 
 from django.shortcuts import render
-from rest_framework import viewsets
+from rest_framework import viewsets, status
 from .models import Restaurant, Like, Image, Review, Users, Station
-from .serializers import RestaurantSerializer, LikeSerializer, ImageSerializer, ReviewSerializer, UsersSerializer, StationSerializer
-from .pagination import RestaurantPageNumberPagination, ReviewPageNumberPagination
+from .serializers import RestaurantSerializer, RestaurantListSerializer, LikeSerializer, ImageSerializer, ReviewSerializer, UsersSerializer, StationSerializer
+from .pagination import RestaurantPageNumberPagination, ReviewPageNumberPagination, RestaurantKeysetPagination, ReviewKeysetPagination, KeysetPaginationMixin, GeoKeysetPagination
 from rest_framework.filters import SearchFilter
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
-from .utils import dist, image_base_url, distByTwoPoints
-
-class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
+from django.db import transaction
+from django.db.models import Count
+from .utils import dist, image_base_url, stationDict
+from .distance import distancesFromPoint
+from .bulk import bulkUpdateById
+from . import counters, worker, listcache, namesearch, nearby
+from .viewcounter import searchNumCounter
+from .spatial import stationIndex
+from .autocomplete import stationAutocomplete, AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT
+from .conditional import ConditionalGetMixin
+from .fastserializer import FastListMixin
+
+class RestaurantViewSet(ConditionalGetMixin, KeysetPaginationMixin, FastListMixin, viewsets.ModelViewSet, generics.ListAPIView):
     """
     Restaurant 관련 REST API 기능 제공
     """
@@ -22,12 +33,8 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
     # Restaurant는 인증이 된 경우만 POST가 가능하고 그렇지 않으면 Read만 가능하도록 설정
     # permission_classes = [IsAuthenticatedOrReadOnly]
 
-    # Restaurant DB에서 전체 field를 가져올 때 prefetch_related로 가져온다.
-    queryset = Restaurant.objects.all().prefetch_related(
-        "like_set",
-        "review_set",
-        "images",
-    )
+    # 이미지 prefetch/이미지 갯수 annotate는 action 별로 get_queryset에서 필요한 것만 붙인다.
+    queryset = Restaurant.objects.all()
 
     # serializer class로 RestaurantSerializer 선정
     serializer_class = RestaurantSerializer
@@ -35,6 +42,53 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
     # pagination로 기본값 6 페이지 선정
     pagination_class = RestaurantPageNumberPagination
 
+    # paging=cursor로 요청한 경우 keyset pagination 사용
+    keyset_pagination_class = RestaurantKeysetPagination
+
+    # 같은 조회 조건의 리스트 응답은 cache에 저장해 두고 재사용
+    cache_list_responses = True
+
+    # 상세 조회 응답의 조회수(searchNum)는 조회할 때마다 바뀌므로 weak ETag 사용
+    weak_retrieve_etag = True
+
+    # view=compact로 요청한 경우 이미지 목록 대신 이미지 갯수만 반환
+    view_query_param = "view"
+
+    @property
+    def paginator(self):
+        # 위치 검색은 거리 순 keyset pagination을 사용합니다.
+        if not hasattr(self, '_paginator') and self.isGeoSearch():
+            self._paginator = GeoKeysetPagination()
+        return super().paginator
+
+    def isGeoSearch(self):
+        params = self.request.query_params
+        return self.action == "list" and (params.get("bbox") is not None or
+                                          (params.get("latitude") is not None and params.get("longitude") is not None))
+
+    def isCompact(self):
+        return self.action == "list" and self.request.query_params.get(self.view_query_param) == "compact"
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # 간략한 리스트는 이미지 갯수만 필요하므로 이미지 row를 읽지 않고 갯수를 함께 조회합니다.
+        if self.isCompact():
+            return queryset.annotate(imageNum=Count("images"))
+        # 전체 리스트/상세 조회는 이미지 목록을 serializer에서 사용하므로 prefetch 합니다.
+        if self.action in ("list", "retrieve"):
+            return queryset.prefetch_related("images")
+        return queryset
+
+    def get_serializer_class(self):
+        if self.isCompact():
+            return RestaurantListSerializer
+        return super().get_serializer_class()
+
+    def listScopes(self, params):
+        return listcache.restaurantListScopes(params)
+
+    def retrieveScopes(self, pk):
+        return [("restaurant", pk)]
 
     def list(self, request, *args, **kwargs):
         '''
@@ -50,26 +104,64 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
                 + `ordering`을 통하여 likeNum/reviewNum/searchNum/distFromStation 기준으로 조회합니다.
                     + **likeNum** : 좋아요 (내림차순, 기본값)
                     + **reviewNum** : 리뷰 갯수 (내림차순)
-                    + **searchNum** : 조회수 (내림차순)
+                    + **searchNum** : 조회수 (내림차순, 일정 주기로 반영되는 근사값)
                     + **distFromStation** : 식당과 역과의 거리 (오름 차순)
             + use cases :
                 + foodCategory=삼겹살, station=강남, ordering=likeNum
                 + foodCategory=곱창, station=사당, ordering=distFromStation
                 
-        + foodCategory와 station 그리고 restaurantName으로 식당을 조회
+        + restaurantName으로 식당을 검색 (foodCategory/station으로 범위를 좁힐 수 있습니다.)
             + parameters : 
-                + `foodCategory` : 아래 리스트 중 한 개를 선택해야 합니다.
-                    + 삼겹살, 소고기, 회/해산물, 족발/보쌈, 곱창, 스테이크, 이자카야, 맥주, 칵테일, 와인
-                + `station` : 지하철 역 이름을 선택해야 하고 끝에 **역은 생략** 합니다.
                 + `restaurantName` : 식당 이름을 직접 검색합니다. 이름 중 일부만 검색 가능합니다.
+                + `foodCategory` : 입력하면 해당 음식 카테고리 안에서 검색합니다. (옵션)
+                    + 삼겹살, 소고기, 회/해산물, 족발/보쌈, 곱창, 스테이크, 이자카야, 맥주, 칵테일, 와인
+                + `station` : 입력하면 해당 역 안에서 검색합니다. 끝에 **역은 생략** 합니다. (옵션)
+                + `match` : **contains** (이름 중 일부, 기본값) / **prefix** (이름의 앞부분)
+            + 식당 이름의 n-gram index로 찾으므로 전체 식당을 읽지 않습니다.
             + use cases :
                 + foodCategory=삼겹살, station=강남, restaurantName=무한리필
+                + restaurantName=무한, match=prefix
+
+        + 위치(GPS)에서 일정 거리 이내 또는 위도/경도 범위 안의 식당을 조회
+            + parameters :
+                + `latitude`, `longitude` : 기준 위치의 위도/경도를 입력합니다.
+                + `radius` : 기준 위치와의 직선 거리 (단위 : m, 기본값 500, 최대 3000)
+                + `bbox` : `남,서,북,동` 형태의 위도/경도 범위 (옵션, 가로/세로 6km 이내)
+                    + latitude/longitude 없이 입력하면 범위의 가운데를 기준 위치로 사용합니다.
+                + `foodCategory` : 입력하면 해당 음식 카테고리의 식당만 조회합니다. (옵션)
+            + 기준 위치와 가까운 순으로 보여주며, 응답의 `next` 링크(`cursor` 파라미터 포함)로 다음 페이지를 요청합니다.
+            + 식당마다 기준 위치와의 거리 `distance`(m)를 함께 반환합니다. (역 주변 검색은 역과의 거리)
+            + 파라미터가 숫자가 아니거나 최대 범위를 넘으면 400을 반환합니다.
+            + use cases :
+                + latitude=37.4765, longitude=126.9816, radius=500
+                + bbox=37.47,126.97,37.49,126.99, foodCategory=곱창
+
+        + 역에서 일정 거리 이내의 식당을 조회 (식당이 등록된 역과 관계 없이 찾습니다.)
+            + parameters :
+                + `nearStation` : 지하철 역 이름을 입력합니다. 끝에 **역은 생략** 합니다.
+                + `radius` : 역과의 직선 거리 (단위 : m, 기본값 1000과 역의 최대 거리 중 작은 값)
+                + `foodCategory` : 입력하면 해당 음식 카테고리의 식당만 조회합니다. (옵션)
+            + 식당마다 미리 구해 둔 가까운 역 목록으로 찾으며, 역과 가까운 순으로 보여줍니다.
+            + 식당마다 가까운 역 몇 개만 저장하므로 역마다 빠짐없이 찾을 수 있는 최대 거리가 있습니다. (다른 역들과의 거리로 정해집니다.)
+                + radius가 숫자가 아니거나 최대 거리보다 크면 400을 반환합니다.
+            + use cases :
+                + nearStation=사당, radius=500, foodCategory=곱창
 
         + uid로 식당을 조회
             + parameter :
                 + `uid` : 등록한 사용자의 uid를 입력합니다.
             + use cases :
                 + uid=123
+
+        + `paging=cursor`를 함께 입력하면 page 번호 대신 cursor로 다음 페이지를 조회합니다. (옵션)
+            + 응답의 `next` 링크(`cursor` 파라미터 포함)로 다음 페이지를 요청합니다.
+            + count와 previous는 반환하지 않습니다.
+
+        + `view=compact`를 함께 입력하면 식당 별 이미지 목록(images) 대신 이미지 갯수(imageNum)만 반환합니다. (옵션)
+            + 대표이미지(representativeImage)는 그대로 반환하며, 전체 이미지는 식당 상세 조회로 가져옵니다.
+
+        + 같은 조회 조건의 응답은 cache에 저장해 두고, 해당 역/카테고리의 식당/좋아요/리뷰/이미지가 바뀔 때까지 재사용합니다.
+        + 응답의 ETag를 If-None-Match로 보내면 바뀐 내용이 없을 때 304 Not Modified를 반환합니다.
         '''
 
         # foodCategory 파라미터, 조회 결과 없을 시 None 리턴
@@ -82,11 +174,27 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
         restaurantName = request.GET.get("restaurantName", None)
         # uid 파라미터, 조회 결과 없을 시 None 리턴
         uid = request.GET.get("uid", None)
-
-        # foodCategory와 station 그리고 restaurantName을 모두 받았을 경우 :
-        if foodCategory is not None and restaurantName is not None:
-            self.queryset = self.queryset.filter(foodCategory=foodCategory,
-                                                 restaurantName__contains=restaurantName)
+        # nearStation 파라미터, 조회 결과 없을 시 None 리턴
+        nearStation = request.GET.get("nearStation", None)
+
+        # 위치 검색인 경우 : 위도/경도 범위와 거리로 거르고 정렬하는 것은 GeoKeysetPagination에서 합니다.
+        if self.isGeoSearch():
+            if foodCategory is not None:
+                self.queryset = self.queryset.filter(foodCategory=foodCategory)
+
+        # nearStation을 받았을 경우 : 가까운 역 테이블로 역에서 radius 이내의 식당을 찾습니다.
+        elif nearStation is not None:
+            radius = self.nearStationRadius(nearStation, request.GET.get("radius", None))
+            if foodCategory is not None:
+                self.queryset = self.queryset.filter(foodCategory=foodCategory)
+            self.queryset = nearby.restaurantsNearStation(self.queryset, nearStation, radius)
+
+        # restaurantName을 받았을 경우 : 이름 n-gram index로 (foodCategory/station 범위 안에서) 검색합니다.
+        elif restaurantName is not None:
+            match = request.GET.get("match", namesearch.CONTAINS)
+            self.queryset = namesearch.searchQuerySet(self.queryset, restaurantName, foodCategory, station, match)
+            # 검색 결과는 좋아요 순으로 보여줍니다.
+            self.queryset = self.queryset.order_by("-likeNum", "-id")
 
         # foodCategory와 station 모두 값을 받았을 경우 :
         # foodCategory와 station을 기준으로 조회한 후 결과를 return 한다.
@@ -109,6 +217,24 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
 
         return super().list(request, *args, **kwargs)
 
+    def nearStationRadius(self, station, radius):
+        # 역 주변 검색의 radius를 확인합니다. 가까운 역 테이블로 빠짐없이 찾을 수 있는 거리까지만 허용합니다.
+        coverage = nearby.stationCoverage(station)
+        if coverage is None:
+            coverage = float("inf")
+        if radius is None:
+            return min(nearby.NEAR_STATION_RADIUS, coverage)
+
+        try:
+            radius = float(radius)
+        except ValueError:
+            raise ValidationError({"radius": "radius는 숫자(m)로 입력해야 합니다."})
+        if not radius >= 0:
+            raise ValidationError({"radius": "radius는 0 이상이어야 합니다."})
+        if radius > coverage:
+            raise ValidationError({"radius": "%s역 주변은 0 ~ %d m까지 검색할 수 있습니다." % (station, coverage)})
+        return radius
+
     def retrieve(self, request, *args, **kwargs):
         '''
         식당 id를 입력하여 식당의 상세 정보를 조회하는 API
@@ -117,19 +243,25 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
         + parameter :
             + Restaurant id
                 + id에 해당하는 식당을 조회하였을 때, 조회수가 +1이 됩니다.
+        + 응답의 ETag를 If-None-Match로 보내면 바뀐 내용이 없을 때 304 Not Modified를 반환합니다.
         '''
 
-        # pk값 가져옴
-        pk = self.kwargs['pk']
-        # pk에 해당하는 object를 가져옴
-        qs = Restaurant.objects.get(id=pk)
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            return response
 
-        # 조회되었을 때 조회수(searchNum)을 1 증가시켜준다.
+        # 조회되었을 때 조회수(searchNum)을 1 증가시켜준다. (304 Not Modified 응답도 조회로 센다.)
+        # 증가분은 메모리에 모아 두었다가 주기적으로 한 번에 DB에 반영하므로 조회 시 DB write가 발생하지 않는다.
         # 의도적인 조회수 증가를 제한하기 위해 throttling을 걸어준다.
-        qs.searchNum += 1
-        qs.save()
+        pk = int(self.kwargs['pk'])
+        pending = searchNumCounter.pending(pk)
+        searchNumCounter.hit(pk)
 
-        return super().retrieve(request, *args, **kwargs)
+        # 응답에는 아직 DB에 반영되지 않은 조회수까지 더해서 보여준다.
+        if response.data is not None:
+            response.data["searchNum"] += pending + 1
+
+        return response
 
     def create(self, request, *args, **kwargs):
         '''
@@ -174,16 +306,30 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
         # request.data에 식당과 역까지의 거리 입력합니다.
         request.POST['distFromStation'] = distFromStation
 
-        # 입력 받은 데이터에서 uid를 가져옵니다.
-        __uid = data["uid"]
-        # uid를 이용하여 식당을 등록하는 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=__uid).first()
-        # 식당 등록 시 User의 Score를 +10점 합니다.
-        registerUser.score += 10
-        registerUser.save()
-
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        # 식당 등록과 User의 Score 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            restaurant = serializer.save()
+            counters.restaurantCreated(restaurant)
+            # 식당과 가까운 역 K개를 저장합니다.
+            nearby.updateNearbyStations(restaurant)
+
+    def perform_update(self, serializer):
+        # 위치가 바뀌었다면 식당과 가까운 역 K개를 다시 저장합니다.
+        before = (serializer.instance.latitude, serializer.instance.longitude)
+        with transaction.atomic():
+            restaurant = serializer.save()
+            if (restaurant.latitude, restaurant.longitude) != before:
+                nearby.updateNearbyStations(restaurant)
+
+    def perform_destroy(self, instance):
+        # 식당 삭제와 User의 카운터 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            counters.restaurantDeleting(instance)
+            instance.delete()
+
     def saveLikeReviewNum(self, restaurnatObject, mode="all"):
         '''
         queryset에 해당하는 Restaurant의 likeNum과 ReviewNum을 갱신하는 함수
@@ -226,11 +372,18 @@ class RestaurantViewSet(viewsets.ModelViewSet, generics.ListAPIView):
                 qs.save()
 
         elif types == "query":
-            # 입력받은 station을 기준으로 restaurant와 station간의 직선 거리를 구합니다.
-            for q in qs:
-                if q.distFromStation < 0:
-                    q.distFromStation = dist(q.latitude, q.longitude, station)
-                    q.save()
+            # 거리가 아직 저장되지 않은 restaurant의 (id, 위도, 경도)를 가져옵니다.
+            rows = list(qs.filter(distFromStation__lt=0).values_list("id", "latitude", "longitude"))
+            if not rows:
+                return
+
+            # 입력받은 station을 기준으로 restaurant와 station간의 직선 거리를 한 번에 구합니다.
+            ids, points = [r[0] for r in rows], [(r[1], r[2]) for r in rows]
+            distances = distancesFromPoint(*stationDict[station], points)
+
+            # 구한 거리를 UPDATE 한 번으로 저장합니다.
+            bulkUpdateById(Restaurant, "distFromStation", dict(zip(ids, distances.tolist())))
+            listcache.bumpRestaurantIds(ids)
 
     # '''세부 API 사용 시 아래 참조'''
     # @action(detail=False)
@@ -303,27 +456,14 @@ class LikeViewSet(viewsets.ModelViewSet):
         + create 시 해당 restaurant의 likeNum을 +1 합니다.
         + create 시 해당 User의 Score를 +1 합니다.
         '''
-        # 입력 받은 데이터 접근
-        data = request.data.dict()
-        # 입력 받은 데이터 중 restaurnat(식당 id)를 이용하여 Restaurant Object 확인
-        restaurant = Restaurant.objects.get(id = data["restaurant"])
-        # 할당 받은 Restaurant의 likeNum을 +1 해줍니다.
-        restaurant.likeNum += 1
-        # 할당 받은 Restaurant의 searchNum을 -1 해줍니다.(페이지 동기화를 위해 새로고침 할 때 발생하는 +1을 방지하기 위한 목적)
-        restaurant.searchNum += -1
-        restaurant.save()
-
-
-        # 입력 받은 데이터에서 uid를 가져옵니다.
-        __uid = data["uid"]
-        # uid를 이용하여 Like를 등록하는 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=__uid).first()
-        # Like 등록 시 User의 Score를 +1점 합니다.
-        registerUser.score += 1
-        registerUser.save()
-
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        # Like 등록과 Restaurant/User의 카운터 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            like = serializer.save()
+            counters.likeCreated(like)
+
     '''
     - LikeViewSet destroy 재정의
     - 삭제 할 좋아요 instance의 pk 값을 이용하여 삭제 할 때, 해당 Restaurant의 objectdml likeNum을 -1 합니다.
@@ -339,28 +479,14 @@ class LikeViewSet(viewsets.ModelViewSet):
         + 좋아요를 취소하면 해당 식당의 likeNum이 -1 됩니다.
         + 좋아요를 취소할 때 해당 유저의 score를 -1합니다.
         '''
-        # 삭제 할 instance의 pk값을 구합니다.
-        pk = self.kwargs['pk']
-        # pk 값을 이용하여 해당 Restaurant Object를 구합니다.
-        q = Like.objects.get(id=pk)
-        # Restaurant object 를 할당합니다.
-        restaurant = q.restaurant
-        # 할당 받은 Restaurant의 likeNum을 +1 해줍니다.
-        restaurant.likeNum += -1
-        # 할당 받은 Restaurant의 searchNum을 -1 해줍니다.(페이지 동기화를 위해 새로고침 할 때 발생하는 +1을 방지하기 위한 목적)
-        restaurant.searchNum += -1
-        restaurant.save()
-
-        # 삭제할 Like의 uid를 가져옵니다.
-        __uid = q.uid.uid
-        # uid를 이용하여 Like를 취소 시 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=__uid).first()
-        # Like 취소 시 User의 Score를 +1점 합니다.
-        registerUser.score -= 1
-        registerUser.save()
-
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        # Like 삭제와 Restaurant/User의 카운터 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            instance.delete()
+            counters.likeDeleted(instance)
+
     def setRestaurantLikeNum(self, restaurant, offset):
         '''
         Like를 create/destroy 할 때, 해당하는 Restaurant의 likeNum을 update(+1/-1) 해주는 함수
@@ -370,10 +496,9 @@ class LikeViewSet(viewsets.ModelViewSet):
             + restaurant : restaurant object
             + offset : +1 / -1
         '''
-        restaurant.likeNum += offset
-        restaurant.save()
+        counters.addCounters(Restaurant, restaurant.pk, likeNum=offset)
 
-class ImageViewSet(viewsets.ModelViewSet):
+class ImageViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     '''
     Image 관련 REST API 제공
     '''
@@ -390,6 +515,11 @@ class ImageViewSet(viewsets.ModelViewSet):
     # pagination로 기본값 6 페이지 선정
     pagination_class = ReviewPageNumberPagination
 
+    def listScopes(self, params):
+        return listcache.imageListScopes(params)
+
+    def retrieveScopes(self, pk):
+        return [("image", pk)]
 
     def list(self, request, *args, **kwargs):
         '''
@@ -402,6 +532,7 @@ class ImageViewSet(viewsets.ModelViewSet):
             + restaurant-id 와 review-id 동시에 입력 시 교집합 조회
         + parameters :
             + restaurant-id 와 category 동시에 입력 시 교집합 조회
+        + 응답의 ETag를 If-None-Match로 보내면 바뀐 내용이 없을 때 304 Not Modified를 반환합니다.
         '''
         # restaurant-id 파라미터, 조회 결과 없을 시 None 리턴
         restaurant_id = request.GET.get("restaurant-id", None)
@@ -422,18 +553,16 @@ class ImageViewSet(viewsets.ModelViewSet):
 
     def create(self, request, *args, **kwargs):
 
-        # 입력 받은 데이터 접근
-        data = request.data.dict()
-        # 입력 받은 데이터에서 uid를 가져옵니다.
-        __uid = data["uid"]
-        # uid를 이용하여 Like를 취소 시 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=__uid).first()
-        # Like 취소 시 User의 Score를 +1점 합니다.
-        registerUser.score += 3
-        registerUser.save()
-
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        # Image 등록과 User의 Score 갱신, 분류 대기열 등록을 하나의 transaction으로 처리합니다.
+        # 분류는 별도의 worker(classificationWorker.py)가 처리하므로 요청이 기다리지 않습니다.
+        with transaction.atomic():
+            image = serializer.save()
+            counters.imageCreated(image)
+            worker.enqueue(image)
+
 
     def destroy(self, request, *args, **kwargs):
         '''
@@ -457,13 +586,15 @@ class ImageViewSet(viewsets.ModelViewSet):
         restaurant = Restaurant.objects.get(id=restaurant_id)
 
         # 현재 제거하려하는 이미지가 대표 이미지라면 Restaurant instance에서 대표 이미지를 삭제합니다.
-        if image_url == restaurant.representativeImage:
+        # 같은 식당의 다른 이미지가 같은 파일(hash 이름)을 공유하고 있다면 대표 이미지를 그대로 둡니다.
+        if image_url == restaurant.representativeImage and not Image.objects.filter(
+                restaurant_id=restaurant_id, image=q.image.name).exclude(id=q.id).exists():
             restaurant.representativeImage = ""
             restaurant.save()
 
         return super().destroy(request, *args, **kwargs)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, KeysetPaginationMixin, FastListMixin, viewsets.ModelViewSet):
     """
     Restaurnat의 Review를 read/create/delete 하는 API
     """
@@ -477,6 +608,16 @@ class ReviewViewSet(viewsets.ModelViewSet):
     # serializer class로 ReviewSerializer 선정
     serializer_class = ReviewSerializer
 
+    # paging=cursor로 요청한 경우 keyset pagination 사용
+    keyset_pagination_class = ReviewKeysetPagination
+
+    def listScopes(self, params):
+        return listcache.reviewListScopes(params)
+
+    def retrieveScopes(self, pk):
+        # 작성자 정보가 바뀌어도 bumpUsers에서 ("review", pk)의 version을 바꿉니다.
+        return [("review", pk)]
+
     def list(self, request, *args, **kwargs):
         '''
         리뷰 리스트를 불러오는 API
@@ -489,6 +630,8 @@ class ReviewViewSet(viewsets.ModelViewSet):
             + review 등록 시 Image가 같이 등록되어야 합니다.
             + 앱에서 review를 먼저 등록 하고 uid로 한번 조회하면 가장 최근에 등록된 review의 id를 받아옵니다.
             + 이 때 받아온 review id를 이미지를 등록할 때 사용합니다.
+        + `paging=cursor`를 함께 입력하면 page 번호 대신 cursor로 다음 페이지를 조회합니다. (옵션)
+        + 응답의 ETag를 If-None-Match로 보내면 바뀐 내용이 없을 때 304 Not Modified를 반환합니다.
         '''
 
         # uid 파라미터, 조회 결과 없을 시 None 리턴
@@ -516,26 +659,14 @@ class ReviewViewSet(viewsets.ModelViewSet):
             + `restaurant` : 식당 id를 입력합니다. (**필수**)
         + 리뷰 생성 시 해당 Restaurant의 reviewNum을 +1 합니다.
         '''
-        # 입력 받은 데이터 접근
-        data = request.data.dict()
-        # 입력 받은 데이터 중 restaurnat(식당 id)를 이용하여 Restaurant Object 확인
-        restaurant = Restaurant.objects.get(id = data["restaurant"])
-        # 할당 받은 Restaurant의 reviewNum을 +1 해줍니다.
-        restaurant.reviewNum += 1
-        # 할당 받은 Restaurant의 searchNum을 -1 해줍니다.(페이지 동기화를 위해 새로고침 할 때 발생하는 +1을 방지하기 위한 목적)
-        restaurant.searchNum += -1
-        restaurant.save()
-
-        # 입력 받은 데이터에서 uid를 가져옵니다.
-        __uid = data["uid"]
-        # uid를 이용하여 식당을 등록하는 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=__uid).first()
-        # 식당 등록 시 User의 Score를 +10점 합니다.
-        registerUser.score += 5
-        registerUser.save()
-
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        # Review 등록과 Restaurant/User의 카운터 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            review = serializer.save()
+            counters.reviewCreated(review)
+
 
     def destroy(self, request, *args, **kwargs):
         '''
@@ -546,26 +677,14 @@ class ReviewViewSet(viewsets.ModelViewSet):
             + `id` : 리뷰 id를 입력합니다.. (**필수**)
         + 리뷰 삭제 시 해당 Restaurant의 reviewNum을 -1 합니다.
         '''
-        # 삭제 할 instance의 pk값을 구합니다.
-        pk = self.kwargs['pk']
-        # pk 값을 이용하여 해당 Restaurant Object를 구합니다.
-        q = Review.objects.get(id=pk)
-        # Restaurant object 를 할당합니다.
-        restaurant = q.restaurant
-        # 할당 받은 Restaurant의 reviewNum을 -1 해줍니다.
-        restaurant.reviewNum += -1
-        restaurant.save()
-
-        # 삭제할 review의 uid를 가져옵니다.
-        uid = q.uid.uid
-        # uid를 이용하여 Review를 취소 시 사용자의 정보를 가져옵니다.
-        registerUser = Users.objects.filter(uid=uid).first()
-        # Review 취소 시 User의 Score를 -5점 합니다.
-        registerUser.score -= 5
-        registerUser.save()
-
         return super().destroy(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        # Review 삭제와 Restaurant/User의 카운터 갱신을 하나의 transaction으로 처리합니다.
+        with transaction.atomic():
+            instance.delete()
+            counters.reviewDeleted(instance)
+
 
 class UsersViewSet(viewsets.ModelViewSet):
     '''
@@ -604,27 +723,13 @@ class UsersViewSet(viewsets.ModelViewSet):
                 + 정보를 가져올 때 등록한 좋아요 수 / 리뷰 수 / 식당 수를 가져옵니다.
         '''
 
-        # pk값(=uid) 가져옵니다.
-        pk = self.kwargs['pk']
-        # pk값을 입력하여 해당하는 user의 정보를 가져옵니다.
-        qs = Users.objects.get(uid=pk)
-        # Like 테이블에서 uid에 해당하는 user가 등록한 Like 갯수를 가져 옵니다.
-        likeNum = Like.objects.filter(uid=pk).count()
-        # review 테이블에서 uid에 해당하는 user가 등록한 Review 갯수를 가져 옵니다.
-        reviewNum = Review.objects.filter(uid=pk).count()
-        # restaurant 테이블에서 uid에 해당하는 user가 등록한 Restaurant 갯수를 가져 옵니다.
-        restaurantNum = Restaurant.objects.filter(uid=pk).count()
-
-        # likeNum, reviewNum, restaurantNum을 각각 createdLikeNum/ReviewNum/RestaurantNum 에 저장합니다.
-        qs.createdLikeNum = likeNum
-        qs.createdReviewNum = reviewNum
-        qs.createdRestaurantNum = restaurantNum
-        qs.save()
-
+        # 등록한 좋아요 수 / 리뷰 수 / 식당 수(createdLikeNum/ReviewNum/RestaurantNum)는
+        # Like/Review/Restaurant를 등록/삭제할 때 갱신되므로 조회 시에는 다시 세지 않습니다.
+        # 값이 어긋난 경우 batchUserStatsSetting.py로 일괄 보정합니다.
         return super().retrieve(request, *args, **kwargs)
 
 
-class StationViewSet(viewsets.ModelViewSet):
+class StationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     '''
     역 정보 저장 및 가까운 역을 추천해주는 REST API
     '''
@@ -640,6 +745,12 @@ class StationViewSet(viewsets.ModelViewSet):
     # serializer class로 StationSerializer 선정
     serializer_class = StationSerializer
 
+    def listScopes(self, params):
+        return [listcache.STATIONS_SCOPE]
+
+    def retrieveScopes(self, pk):
+        return [listcache.STATIONS_SCOPE]
+
     def list(self, request, *args, **kwargs):
         '''
         가까운 역을 추천해주는 REST API
@@ -659,6 +770,8 @@ class StationViewSet(viewsets.ModelViewSet):
                 + 예 : 서울(O), 서울역(X). 강남(O), 강남역(X)
         + returns :
             + 입력 받은 역의 위도와 경도를 return 합니다.
+
+        + 응답의 ETag를 If-None-Match로 보내면 바뀐 내용이 없을 때 304 Not Modified를 반환합니다.
         '''
 
         # 입력 받은 latitude를 float 형으로 변환
@@ -681,42 +794,13 @@ class StationViewSet(viewsets.ModelViewSet):
 
 
         if latitude is not None and longitude is not None:
-            # 조회 결과를 저장할 빈 쿼리셋
-            queryset = Station.objects.filter(station="")
-            # (식당과의 거리, 역 이름) 형태로 리스트에 저장합니다.
-            stationListWithDistance = []
-
-            # 모든 역을 대상으로 식당과 역 사이의 거리를 구하되 식당과 역 사이의 거리가 5,000m 이하인 식당만 저장합니다.
-            for q in self.queryset:
-                distance = distByTwoPoints(latitude, longitude, q.latitude, q.longitude)
-                # 거리가 5,000m가 넘는 식당은 제외합니다.
-                # if distance < 5000:
-                stationListWithDistance.append((distance, q.station))
-
-            # distance 오름 차순으로 정렬
-            stationListWithDistance = sorted(stationListWithDistance)
-            # returnNum 갯수 만큼만 저장합니다.
-            stationListWithDistance = stationListWithDistance[:returnNum]
-
-            # returnNum 갯수 내에 해당하는 station을 QuerySet에 저장하여 반환합니다.
-            # 이 때 distance도 갱신합니다.
-            for stationWithDistance in stationListWithDistance:
-                distance = stationWithDistance[0]
-                __station = stationWithDistance[1]
-
-                # station으로 조회된 Queryset을 가져옵니다.
-                filteredQueryset = self.queryset.filter(station=__station)
-
-                # 조회한 station의 distance를 업데이트 하고 저장합니다.
-                q = filteredQueryset.first()
-                q.distFromStation = distance
-                q.save()
-
-                # queryset에 대상 station을 저장합니다.
-                queryset |= filteredQueryset
-
-            # 식당과 역과의 거리를 오름차순으로 정렬하여 반환합니다.
-            self.queryset = queryset.order_by("distFromStation")
+            # 최근접 역 인덱스에서 가까운 역 returnNum개를 (역과의 거리, 역 정보) 형태로 가져옵니다.
+            nearestStations = stationIndex.nearest(latitude, longitude, returnNum)
+
+            # 거리는 DB에 저장하지 않고 응답용 Station 객체에만 담아 반환합니다.
+            self.queryset = [Station(id=stationId, station=stationName, latitude=lat, longitude=long,
+                                     distFromStation=distance)
+                             for distance, (stationId, stationName, lat, long) in nearestStations]
 
         # station을 입력 받은 경우 station을 기준으로 리턴해줍니다.
         elif station is not None:
@@ -725,6 +809,33 @@ class StationViewSet(viewsets.ModelViewSet):
 
         return super().list(request, *args, **kwargs)
 
+    @action(detail=False)
+    def autocomplete(self, request):
+        '''
+        역 이름 자동완성 API
+
+        ---
+        + parameters :
+            + `q` : 역 이름의 앞부분을 입력합니다. (**필수**)
+                + 초성으로도 검색할 수 있습니다. 예 : ㅅㄷ, 사ㄷ, 사당 -> 사당
+                + 괄호 안의 이름으로도 검색할 수 있습니다. 예 : 이수 -> 총신대입구(이수)
+            + `limit` : 리턴해 줄 역의 최대 갯수. (기본값 = 10, 최대 = 50)
+                + 숫자가 아니면 기본값을, 범위를 벗어나면 1 ~ 50 사이의 값을 사용합니다.
+        + returns :
+            + 입력 받은 q로 시작하는 역의 이름, 위도, 경도를 역 이름 순으로 return 합니다.
+        + 메모리에 올려 둔 역 이름 trie에서 찾으므로 DB를 조회하지 않습니다.
+        '''
+
+        query = request.GET.get("q", "")
+        try:
+            limit = int(request.GET.get("limit", AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = AUTOCOMPLETE_LIMIT
+        limit = min(max(limit, 1), AUTOCOMPLETE_MAX_LIMIT)
+
+        stations = stationAutocomplete.search(query, limit)
+        return Response([{"station": name, "latitude": lat, "longitude": long} for name, lat, long in stations])
+
 
 
 
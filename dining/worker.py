@@ -0,0 +1,74 @@
+# dining/worker.py
+import time
+import traceback
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ClassificationQueue
+
+
+def enqueue(image):
+    # 등록된 이미지를 분류 대기열에 추가합니다.
+    ClassificationQueue.objects.create(image=image)
+
+
+class ClassificationWorker:
+    '''
+    분류 대기열(ClassificationQueue)의 이미지를 mini-batch로 분류하는 long-lived worker
+
+    ---
+    + 모델은 worker 시작 시 한 번만 불러오고, classifier(BatchClassifier)를 계속 재사용합니다.
+    + 대기열에 batchSize 만큼 쌓이거나 가장 오래된 항목이 maxWait 초를 기다렸으면 분류합니다.
+    + 대기열이 비어 있으면 pollInterval 초마다 다시 확인합니다.
+    + 분류한 항목(읽지 못한 이미지 포함)은 대기열에서 삭제합니다. 읽지 못한 이미지는 미분류로 남습니다.
+    + 분류 중 오류(DB 연결 끊김 등)가 나면 기록하고 pollInterval 초 뒤에 같은 항목을 다시 분류합니다.
+    + 한 대기열에는 worker를 하나만 실행합니다.
+    '''
+
+    def __init__(self, classifier, batchSize=32, maxWait=1.0, pollInterval=0.5, log=print):
+        self.classifier = classifier
+        self.batchSize = batchSize
+        self.maxWait = maxWait
+        self.pollInterval = pollInterval
+        self.log = log
+
+    def runForever(self):
+        while True:
+            # 오래 실행되는 process이므로 끊어진 DB 연결을 정리합니다.
+            close_old_connections()
+            try:
+                processed = self.runOnce()
+            except Exception:
+                # 대기열의 항목은 삭제되지 않았으므로 다음 반복에서 다시 분류합니다.
+                self.log("classification failed :\n%s" % traceback.format_exc())
+                processed = 0
+            if not processed:
+                time.sleep(self.pollInterval)
+
+    def runOnce(self):
+        entries = self.fetch()
+        if not entries:
+            return 0
+
+        # batch가 다 차지 않았다면 가장 오래된 항목이 maxWait 초를 기다릴 때까지 더 모읍니다.
+        waited = (timezone.now() - entries[0][1]).total_seconds()
+        if len(entries) < self.batchSize and waited < self.maxWait:
+            time.sleep(self.maxWait - waited)
+            entries = self.fetch()
+
+        # 읽지 못한 이미지 목록은 batch 마다 새로 모읍니다. (계속 실행되는 동안 쌓이지 않도록)
+        self.classifier.failed = []
+        self.classifier.run([row for _, _, *row in entries])
+        ClassificationQueue.objects.filter(id__in=[e[0] for e in entries]).delete()
+
+        failed = self.classifier.failed
+        if failed:
+            self.log("failed to load images : %s" % failed)
+        return len(entries)
+
+    def fetch(self):
+        # (대기열 id, 등록 시점, image id, restaurant id, 파일 이름)을 등록 순으로 가져옵니다.
+        return list(ClassificationQueue.objects.order_by("id")
+                    .values_list("id", "created_at", "image_id", "image__restaurant_id", "image__image")
+                    [:self.batchSize])
@@ -148,8 +148,32 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# 식당 리스트 응답과 version 정보를 여러 worker process가 함께 사용하도록 파일 기반 cache를 사용합니다.
+# MAX_ENTRIES를 넘으면 set 할 때마다 일부 항목을 지우며, 지워진 version key는 새 값으로 다시 만들어져 그 아래의 응답/ETag를 버리게 됩니다.
+# 식당/리뷰/이미지/사용자 별 version key와 ETag 별 응답이 모두 들어가므로 기본값(300)보다 충분히 크게 잡고,
+# 넘었을 때도 한 번에 1/10만 지웁니다.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 200000,
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+
+# 식당 리스트 응답을 cache에 보관하는 최대 시간(초)
+RESTAURANT_LIST_CACHE_TIMEOUT = 60
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# hash 이름이 아닌 media 파일의 cache 시간(초)
+MEDIA_CACHE_MAX_AGE = 3600
+# nginx 뒤에서 실행할 때 internal location prefix(ex. '/protected-media/')를 설정하면 파일 전송을 nginx에 맡깁니다.
+MEDIA_ACCEL_REDIRECT = None
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':'rest_framework.pagination.PageNumberPagination',
@@ -185,4 +209,14 @@ SITE_ID = 1 # django-allauth에서 multi-site를 지원하므로 SITE_ID = 1로
 REST_USE_JWT = True # rest-framework가 Token 값을 기본적으로 JWT를 사용하도록 명시함
 
 # The Debug Toolbar is shown only if your IP is listed in the INTERNAL_IPS setting.
-INTERNAL_IPS = ['127.0.0.1']
\ No newline at end of file
+INTERNAL_IPS = ['127.0.0.1']
+
+# Restaurant 조회수(searchNum)는 메모리에 모아 두었다가 아래 주기(초) 또는 조회 횟수마다 DB에 반영합니다.
+SEARCH_NUM_FLUSH_INTERVAL = 10
+SEARCH_NUM_FLUSH_HITS = 100
+
+# 식당마다 저장해 두는 가까운 역의 갯수
+NEARBY_STATION_NUM = 5
+
+# 위치 검색(latitude/longitude/radius, bbox)의 최대 반경(m), bbox는 가로/세로가 이 값의 2배 이내여야 합니다.
+GEO_SEARCH_MAX_RADIUS = 3000
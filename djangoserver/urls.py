@@ -13,13 +13,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
 from django.urls import path
 from django.conf.urls import url, include
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_jwt.views import obtain_jwt_token, refresh_jwt_token, verify_jwt_token
+from dining.mediaserve import serveMedia
 from .schema import *
 
 urlpatterns = [
@@ -39,7 +41,10 @@ urlpatterns = [
     url(r'^dining/v1/', include('dining.urls', namespace='dining/v1')),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# media 파일은 DEBUG 여부와 관계없이 Range/If-Modified-Since/Cache-Control을 지원하는 view로 전송합니다.
+urlpatterns += [
+    url(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serveMedia),
+]
 
 if settings.DEBUG:
     import debug_toolbar
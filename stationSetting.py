@@ -1,37 +1,28 @@
 import os
+import argparse
 import django
 import sys
 import time
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djangoserver.settings')
 django.setup()
 
-# django_extensions의 shell_plus 실행 시 참조되는 전체 library 호출
-from allauth.account.models import EmailAddress, EmailConfirmation
-from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
-from dining.models import Image, Like, Restaurant, Review
-from django.contrib.auth.models import Group, Permission, User
-from django.contrib.admin.models import LogEntry
-from django.contrib.contenttypes.models import ContentType
-from django.contrib.sessions.models import Session
-from django.contrib.sites.models import Site
-from rest_framework.authtoken.models import Token
-# Shell Plus Django Imports
-from django.core.cache import cache
-from django.conf import settings
-from django.contrib.auth import get_user_model
-from django.db import transaction
-from django.db.models import Avg, Case, Count, F, Max, Min, Prefetch, Q, Sum, When, Exists, OuterRef, Subquery
-from django.utils import timezone
-from django.urls import reverse
+from dining.utils import stationDict
+from dining.stationloader import readStationFile, loadStations, formatLoadReport
 
-from dining.utils import *
-import requests
+# 실행 옵션
+parser = argparse.ArgumentParser(description="역 이름과 GPS 정보를 Station 테이블에 저장합니다.")
+parser.add_argument("--file", default=None,
+                    help="역 정보를 읽을 CSV(station,latitude,longitude) 또는 JSON 파일. 없으면 stationDict를 사용합니다.")
+parser.add_argument("--delete-missing", action="store_true", help="입력에 없는 역을 Station 테이블에서 삭제합니다.")
+parser.add_argument("--dry-run", action="store_true", help="변경 내용만 출력하고 저장하지 않습니다.")
+args = parser.parse_args()
 
-diningBaseUrl = "http://bluemen.pythonanywhere.com/dining/v1/"
+# stationDict(또는 입력 파일)를 통하여 역 이름과 GPS 정보를 가져 옵니다.
+stations = readStationFile(args.file) if args.file else stationDict
 
-# stationDict를 통하여 역 이름과 GPS 정보를 가져 옵니다.
-for item in stationDict.items():
-    data = {"station":item[0],
-            "latitude":item[1][0],
-            "longitude" :item[1][1]}
-    requests.post(diningBaseUrl + "station/", data = data)
+# 한 번의 transaction 안에서 없는 역은 추가, 위도/경도가 바뀐 역은 수정합니다. 여러 번 실행해도 중복 row가 생기지 않습니다.
+start = time.time()
+report = loadStations(stations, deleteMissing=args.delete_missing, dryRun=args.dry_run)
+
+print(formatLoadReport(report))
+print("%sdone in %.1f ms" % ("(dry run) " if args.dry_run else "", (time.time() - start) * 1000))